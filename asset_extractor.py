@@ -1,110 +1,777 @@
 import UnityPy
-import os
+import os, io, re, json, time, hashlib, ntpath, tempfile, threading, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator
 from PIL import Image  # UnityPy отдаёт pillow-объект для текстур
+import instrument
+
+# Источник бандла: путь к дешифрованному файлу или буфер из
+# dat_decrypt.decrypt_to_bytes — UnityPy.load принимает и то, и другое
+Bundle = str | bytes | bytearray
+# Адрес объекта в бандле: (имя SerializedFile-а, path_id). path_id уникален
+# только внутри одного CAB, а в бандлах сцен и sharedAssets их несколько
+AssetKey = tuple[str, int]
+
+# ------------------------------------------------------------------
+# Кэш загруженных окружений UnityPy
+# ------------------------------------------------------------------
+class _Entry:
+    """Запись кэша: окружение, оценка размера, индекс и замок чтения."""
+    __slots__ = ("bundle", "env", "size", "index", "lock")
+
+    def __init__(self, bundle: Bundle, env, size: int):
+        self.bundle = bundle   # буфер держится, пока жива запись (ключ — его id)
+        self.env = env
+        self.size = size
+        self.index: dict[AssetKey, object] | None = None
+        # Все объекты окружения читают через общий reader со своей позицией:
+        # два потока, читающие одно окружение, портят друг другу данные
+        self.lock = threading.RLock()
+
+class BundleCache:
+    """
+    LRU-кэш окружений UnityPy.load с ограничением по памяти.
+    Размер окружения оценивается как размер бандла × overhead
+    (распакованные блоки и разобранные объекты). Последний загруженный
+    бандл остаётся в кэше даже если один превышает бюджет.
+    Окружение не потокобезопасно: чтение объектов — только внутри use().
+    """
+    def __init__(self, budget_bytes: int = 1024 ** 3, overhead: float = 3.0):
+        self.budget_bytes = budget_bytes
+        self.overhead = overhead
+        self._entries: OrderedDict[object, _Entry] = OrderedDict()
+        self._used = 0
+        # Защищает только словарь записей; чтение окружения — замок записи
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(bundle: Bundle):
+        # Путь: учитываем mtime, чтобы перезаписанный файл перечитался.
+        # Буфер: по id — сам буфер хранится в записи, id не переиспользуется
+        if isinstance(bundle, str):
+            path = os.path.abspath(bundle)
+            return ("path", path, os.path.getmtime(path))
+        return ("buf", id(bundle))
+
+    def _entry(self, bundle: Bundle) -> _Entry:
+        key = self._key(bundle)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            raw = os.path.getsize(bundle) if isinstance(bundle, str) else len(bundle)
+            with instrument.span("bundle.load", bytes=raw):
+                env = UnityPy.load(bundle)
+            entry = self._entries[key] = _Entry(bundle, env, int(raw * self.overhead))
+            self._used += entry.size
+            self._evict()
+            return entry
+
+    @contextmanager
+    def use(self, bundle: Bundle):
+        """
+        with cache.use(bundle) as entry: ... — окружение (entry.env) и индекс
+        (entry.index) под замком записи: листинг и экспорт одного бандла
+        из разных задач читают объекты по очереди. Запись, вытесненная
+        из кэша во время работы, остаётся рабочей до выхода из блока.
+        """
+        entry = self._entry(bundle)
+        with entry.lock:
+            if entry.index is None:
+                # env.objects собирает список заново при каждом обращении,
+                # поэтому поиск по позиции в нём обходится в O(N)
+                entry.index = build_index(entry.env)
+            yield entry
+
+    def get(self, bundle: Bundle):
+        """Возвращает окружение UnityPy для bundle, загружая его при промахе."""
+        return self._entry(bundle).env
+
+    def index(self, bundle: Bundle) -> dict[AssetKey, object]:
+        """Индекс (CAB, path_id) → объект, строится один раз на бандл."""
+        with self.use(bundle) as entry:
+            return entry.index
+
+    def _evict(self) -> None:
+        while self._used > self.budget_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._used -= entry.size
+
+    def discard(self, bundle: Bundle) -> None:
+        """Убирает bundle из кэша (например, при закрытии диалога)."""
+        with self._lock:
+            entry = self._entries.pop(self._key(bundle), None)
+            if entry:
+                self._used -= entry.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._used = 0
+
+# Общий кэш модуля: list_assets / extract_all / extract_asset разделяют его
+BUNDLE_CACHE = BundleCache()
+
+def load_env(bundle_path: Bundle):
+    """Окружение UnityPy для бандла из общего BUNDLE_CACHE."""
+    return BUNDLE_CACHE.get(bundle_path)
+
+def load_index(bundle_path: Bundle) -> dict[AssetKey, object]:
+    """Индекс (CAB, path_id) → объект для бандла из общего BUNDLE_CACHE."""
+    return BUNDLE_CACHE.index(bundle_path)
+
+def use_bundle(bundle_path: Bundle):
+    """Запись BUNDLE_CACHE под замком чтения (см. BundleCache.use)."""
+    return BUNDLE_CACHE.use(bundle_path)
+
+def build_index(env) -> dict[AssetKey, object]:
+    """Индекс (CAB, path_id) → объект по всем SerializedFile-ам окружения."""
+    return {(obj.assets_file.name, obj.path_id): obj for obj in env.objects}
+
+def shared_path_ids(index: dict[AssetKey, object]) -> set[int]:
+    """path_id, которые встречаются больше чем в одном CAB бандла."""
+    seen, shared = set(), set()
+    for _, path_id in index:
+        (shared if path_id in seen else seen).add(path_id)
+    return shared
+
+def resolve_key(index: dict[AssetKey, object], asset: AssetKey | int) -> AssetKey | None:
+    """
+    Ключ индекса по ключу или по голому path_id. path_id, который есть
+    в нескольких CAB, неоднозначен — ValueError со списком CAB.
+    """
+    if isinstance(asset, tuple):
+        return asset if asset in index else None
+    cabs = [cab for cab, path_id in index if path_id == asset]
+    if len(cabs) > 1:
+        raise ValueError(f"path_id {asset} есть в нескольких CAB: {', '.join(sorted(cabs))}")
+    return (cabs[0], asset) if cabs else None
+
+# ------------------------------------------------------------------
+# Имена выходных файлов
+# ------------------------------------------------------------------
+_UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+def asset_filename(name: str, path_id: int, ext: str, cab: str | None = None) -> str:
+    """
+    Детерминированное имя файла без коллизий: <имя>_<path_id>.<ext>.
+    path_id уникален внутри CAB, поэтому одноимённые ассеты не
+    перезаписывают друг друга; если тот же path_id есть и в другом CAB
+    бандла, в имя добавляется CAB: <имя>_<CAB>_<path_id>.<ext>.
+    Недопустимые символы заменяются на "_".
+    """
+    safe = _UNSAFE_CHARS.sub("_", name).strip(" .")[:120] or "asset"
+    if cab:
+        safe += "_" + _UNSAFE_CHARS.sub("_", cab)
+    return f"{safe}_{path_id}.{ext}"
 
 # ------------------------------------------------------------------
 # Получение списка ассетов из Unity AssetBundle (.dat)
 # ------------------------------------------------------------------
-def list_assets(bundle_path: str) -> list[tuple[int, str, str]]:
+def _peek_name(obj) -> str | None:
+    """
+    Имя объекта без полной десериализации: UnityPy читает только
+    начало typetree (m_Name), не трогая пиксели, меши и семплы.
+    """
+    try:
+        return obj.peek_name() or None
+    except Exception:
+        return None
+
+def iter_assets(bundle_path: Bundle) -> Iterator[tuple[AssetKey, str, str]]:
     """
-    Возвращает список кортежей (index, тип_ассета, имя_ассета)
+    Быстрый ленивый листинг: отдаёт ((CAB, path_id), тип_ассета, имя_ассета)
+    по одному, используя obj.type и лёгкое чтение имени. Если имени нет,
+    берётся путь из контейнера бандла, затем path_id.
+    Замок бандла берётся на каждое чтение, а не на весь обход:
+    генератор могут бросить недочитанным в другом потоке.
+    """
+    with use_bundle(bundle_path) as entry:
+        lock, index = entry.lock, entry.index
+        container_paths = {}
+        try:
+            for cpath, cobj in entry.env.container.items():
+                container_paths[(cobj.assets_file.name, cobj.path_id)] = cpath
+        except Exception:
+            pass
+    for key, obj in index.items():
+        with lock:
+            name = _peek_name(obj)
+        yield key, obj.type.name, name or container_paths.get(key) or f"path_id_{key[1]}"
+
+def list_assets(bundle_path: Bundle, fast: bool = True) -> list[tuple[AssetKey, str, str]]:
+    """
+    Возвращает список кортежей ((CAB, path_id), тип_ассета, имя_ассета)
     из Unity AssetBundle.
-    index — порядковый номер объекта в env.objects.
+    (CAB, path_id) — стабильный адрес объекта внутри бандла (см. extract_asset).
+    fast=True — метаданные без декодирования (см. iter_assets),
+    fast=False — полное obj.read() каждого объекта.
     """
-    env = UnityPy.load(bundle_path)
+    if fast:
+        return list(iter_assets(bundle_path))
     assets = []
-    for idx, obj in enumerate(env.objects):
+    with use_bundle(bundle_path) as entry:
+        for key, obj in entry.index.items():
+            try:
+                container = obj.read()
+                name = getattr(container, 'name', None) or getattr(container, 'original_path', None)
+                if not name:
+                    name = f"path_id_{key[1]}"
+                typ = container.__class__.__name__
+                assets.append((key, typ, name))
+            except Exception:
+                continue
+    return assets
+
+# ------------------------------------------------------------------
+# Экспорт одного объекта
+# ------------------------------------------------------------------
+# Запись крупных блобов ведётся кусками без копирования (memoryview),
+# сырые данные объектов читаются из reader-а бандла такими же кусками
+WRITE_CHUNK = 1024 * 1024
+# Предел объёма данных, ожидающих фоновой записи (на весь экспорт);
+# потоковые данные больше предела пишутся сразу, минуя очередь
+MEMORY_CAP = 256 * 1024 * 1024
+
+def _raw_chunks(obj) -> Iterator[bytes]:
+    """Сырые сериализованные байты объекта кусками по WRITE_CHUNK (как get_raw_data)."""
+    reader = obj.reader
+    reader.Position = obj.byte_start
+    left = obj.byte_size
+    while left > 0:
+        chunk = reader.read_bytes(min(WRITE_CHUNK, left))
+        if not chunk:
+            break
+        left -= len(chunk)
+        yield chunk
+
+def _write_file(out_path: str, data) -> int:
+    """
+    data — байты (пишутся кусками через memoryview) или fill(f),
+    который сам пишет в открытый файл. Возвращает число байт.
+    Недописанный при ошибке файл удаляется.
+    """
+    try:
+        with open(out_path, "wb") as f:
+            if callable(data):
+                data(f)
+            else:
+                view = memoryview(data)
+                for pos in range(0, len(view), WRITE_CHUNK):
+                    f.write(view[pos:pos + WRITE_CHUNK])
+            return f.tell()
+    except Exception:
         try:
-            container = obj.read()
-            name = getattr(container, 'name', None) or getattr(container, 'original_path', None)
-            if not name:
-                name = f"path_id_{obj.path_id}"
-            typ = container.__class__.__name__
-            assets.append((idx, typ, name))
+            os.remove(out_path)
+        except OSError:
+            pass
+        raise
+
+class _FileWriter:
+    """
+    Синхронная запись в вызывающем потоке: потоковые данные идут в файл
+    кусками, так что в памяти не бывает больше одного декодированного объекта.
+    times — секунды записи по путям, blocked — сколько вызывающий поток
+    провёл в записи (вычитается из времени декодирования), failed — пути,
+    запись которых не удалась (у синхронной записи ошибка сразу выходит
+    к вызывающему).
+    """
+    def __init__(self):
+        self.times: dict[str, float] = {}
+        self.blocked = 0.0
+        self.failed: set[str] = set()
+
+    def _timed(self, out_path: str, data) -> int:
+        t0 = time.perf_counter()
+        size = _write_file(out_path, data)
+        self.times[out_path] = time.perf_counter() - t0
+        return size
+
+    def __call__(self, out_path: str, data, size: int | None = None) -> int:
+        t0 = time.perf_counter()
+        try:
+            return self._timed(out_path, data)
+        finally:
+            self.blocked += time.perf_counter() - t0
+
+    def seconds(self, result: tuple[str, int, list[str]] | None) -> float:
+        return sum(self.times.get(f, 0.0) for f in result[2]) if result else 0.0
+
+    def checked(self, result: tuple[str, int, list[str]] | None) -> tuple[str, int, list[str]] | None:
+        """result или None, если хоть один его файл не записался."""
+        return None if result and self.failed.intersection(result[2]) else result
+
+    def close(self) -> None:
+        pass
+
+class _BoundedWriter(_FileWriter):
+    """
+    Фоновая запись файлов с ограничением памяти: вызов write(path, data)
+    блокируется, пока в очереди лежит больше cap байт. Один блоб больше
+    cap пропускается, только когда очередь пуста. Потоковые данные
+    (fill) с ожидаемым размером больше cap пишутся сразу в вызывающем
+    потоке, остальные собираются в буфер и встают в очередь.
+    Ошибка фоновой записи не прерывает экспорт: путь попадает в failed,
+    а объект — в неудачные (см. checked).
+    """
+    def __init__(self, cap: int = MEMORY_CAP):
+        super().__init__()
+        self.cap = cap
+        self.pending = 0
+        self.cond = threading.Condition()
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.futures = []
+
+    def __call__(self, out_path: str, data, size: int | None = None) -> int:
+        if callable(data):
+            if size is not None and size > self.cap:
+                return super().__call__(out_path, data)
+            buf = io.BytesIO()
+            data(buf)
+            data = buf.getbuffer()
+        size = len(data)
+        t0 = time.perf_counter()
+        with self.cond:
+            while self.pending and self.pending + size > self.cap:
+                self.cond.wait()
+            self.pending += size
+        self.blocked += time.perf_counter() - t0
+        self.futures.append(self.pool.submit(self._write, out_path, data, size))
+        return size
+
+    def _write(self, out_path: str, data, size: int) -> None:
+        try:
+            self._timed(out_path, data)
         except Exception:
-            continue
-    return assets
+            self.failed.add(out_path)
+        finally:
+            with self.cond:
+                self.pending -= size
+                self.cond.notify_all()
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=True)
+
+def _export_object(obj, output_dir: str, write: _FileWriter,
+                   cab: str | None = None) -> tuple[str, int, list[str]] | None:
+    """
+    Декодирует объект и отдаёт данные в write(out_path, data, size).
+    cab — добавить имя CAB в имена файлов (path_id есть в нескольких CAB).
+    Сырые данные прочих типов читаются из бандла кусками и в память
+    целиком не попадают. PNG кодируется в буфер (пиксели текстуры
+    UnityPy всё равно держит целиком). AudioClip выгружается по файлу
+    на каждый семпл банка; сами семплы UnityPy декодирует все сразу,
+    но каждый освобождается сразу после записи. Возвращает
+    (тип, число байт, пути файлов) или None, если экспортировать нечего.
+    """
+    container = obj.read()
+    name = getattr(container, 'name', None) or getattr(container, 'original_path', None)
+    if not name:
+        name = f"path_id_{obj.path_id}"
+    typ = container.type.name
+    files: list[str] = []
+    total = 0
+
+    def _emit(out_name: str, data, size: int | None = None) -> None:
+        nonlocal total
+        out_path = os.path.join(output_dir, out_name)
+        total += write(out_path, data, size)
+        files.append(out_path)
+
+    # Texture2D → PNG
+    if typ == "Texture2D":
+        buf = io.BytesIO()
+        container.image.save(buf, format="PNG")
+        _emit(asset_filename(name, obj.path_id, "png", cab), buf.getbuffer())
+    # AudioClip → WAV, по файлу на каждый семпл банка
+    elif typ == "AudioClip":
+        samples = container.samples
+        if len(samples) == 1:
+            _emit(asset_filename(name, obj.path_id, "wav", cab), samples.popitem()[1])
+        else:
+            for i, sample_name in enumerate(list(samples)):
+                # pop — семпл освобождается сразу после передачи в запись
+                _emit(asset_filename(f"{name}-{i}", obj.path_id, "wav", cab), samples.pop(sample_name))
+        if not files:
+            return None
+    # TextAsset → .bytes (m_Script без промежуточных копий)
+    elif typ == "TextAsset":
+        script = container.m_Script
+        if isinstance(script, str):
+            script = script.encode("utf-8", "surrogateescape")
+        if not script:
+            return None
+        _emit(asset_filename(name, obj.path_id, "bytes", cab), script)
+    # Всё остальное → .bytes: сырые данные объекта потоком из бандла
+    else:
+        if not obj.byte_size:
+            return None
+
+        def _fill(f):
+            for chunk in _raw_chunks(obj):
+                f.write(chunk)
+        _emit(asset_filename(name, obj.path_id, "bytes", cab), _fill, obj.byte_size)
+    return typ, total, files
+
+# ------------------------------------------------------------------
+# Прогресс экспорта
+# ------------------------------------------------------------------
+class ExportProgress:
+    """
+    Счётчики экспорта для callback-а progress(dict):
+    done/total — обработано объектов, exported — записано файлов,
+    skipped — пропущено как неизменившиеся, removed — ключи манифеста,
+    исчезнувшие из бандла, bytes — записано байт,
+    rates — объектов в секунду по типам, workers — процессов экспорта
+    (после ограничения бюджетом памяти).
+    """
+    def __init__(self, total: int, callback=None, workers: int = 1):
+        self.total = total
+        self.callback = callback
+        self.workers = workers
+        self.done = 0
+        self.exported = 0
+        self.skipped = 0
+        self.removed: list[str] = []
+        self.bytes = 0
+        self.by_type: dict[str, int] = {}
+        self.started = time.perf_counter()
+
+    def add(self, result: tuple[str, int, list[str]] | None) -> None:
+        self.done += 1
+        if result:
+            typ, nbytes, _ = result
+            self.exported += 1
+            self.bytes += nbytes
+            self.by_type[typ] = self.by_type.get(typ, 0) + 1
+
+    def report(self) -> None:
+        if self.callback:
+            self.callback(self.snapshot())
+
+    def snapshot(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "done": self.done, "total": self.total, "exported": self.exported,
+            "skipped": self.skipped, "removed": self.removed,
+            "bytes": self.bytes, "elapsed": elapsed, "workers": self.workers,
+            "rates": {t: n / elapsed for t, n in self.by_type.items()} if elapsed else {},
+        }
+
+# ------------------------------------------------------------------
+# Параллельный экспорт: воркеры процессов
+# ------------------------------------------------------------------
+def _physical_memory() -> int | None:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+# Бюджет памяти воркеров экспорта: каждый держит своё окружение UnityPy
+# (бандл × BUNDLE_CACHE.overhead). По умолчанию — половина ОЗУ
+# (4 ГиБ, если объём ОЗУ не узнать); меняется аргументом memory_budget
+EXPORT_MEMORY_BUDGET = (_physical_memory() or 8 * 1024 ** 3) // 2
+
+_worker_index: dict[AssetKey, object] = {}
+_worker_shared: set[int] = set()
+_worker_cap = MEMORY_CAP
+
+# Результат экспорта объекта и его времена: (результат, декодирование, запись), секунды
+ExportTiming = tuple[tuple[str, int, list[str]] | None, float, float]
+
+def _init_export_worker(bundle_file: str, memory_cap: int) -> None:
+    """
+    Инициализатор процесса: бандл загружается и индексируется один раз
+    на воркер. Передаётся путь к файлу, а не буфер — иначе буфер
+    сериализовался бы в каждый процесс целиком.
+    """
+    global _worker_index, _worker_shared, _worker_cap
+    _worker_index = build_index(UnityPy.load(bundle_file))
+    _worker_shared = shared_path_ids(_worker_index)
+    _worker_cap = memory_cap
+
+def _export_timed(obj, output_dir: str, writer: _FileWriter,
+                  cab: str | None = None) -> tuple[tuple[str, int, list[str]] | None, float]:
+    """_export_object и время декодирования без времени, проведённого в записи."""
+    t0, blocked = time.perf_counter(), writer.blocked
+    try:
+        result = _export_object(obj, output_dir, writer, cab)
+    except Exception:
+        result = None
+    return result, time.perf_counter() - t0 - (writer.blocked - blocked)
+
+def _export_chunk(keys: list[AssetKey], output_dir: str) -> list[ExportTiming]:
+    """
+    Экспорт пачки объектов в воркере. Декодирование идёт в этом потоке,
+    запись файлов — в фоновом (_BoundedWriter), так что диск и CPU
+    работают одновременно, а очередь записи не превышает _worker_cap.
+    Время записи и ошибки записи известны только после close(): объект,
+    чей файл не записался, получает результат None, как и при ошибке декодирования.
+    """
+    decoded = []
+    writer = _BoundedWriter(_worker_cap)
+    try:
+        for cab, path_id in keys:
+            decoded.append(_export_timed(_worker_index[cab, path_id], output_dir, writer,
+                                         cab if path_id in _worker_shared else None))
+    finally:
+        writer.close()
+    return [(writer.checked(result), seconds, writer.seconds(result)) for result, seconds in decoded]
+
+def _pool_size(workers: int, bundle_bytes: int, budget: int = EXPORT_MEMORY_BUDGET) -> int:
+    """
+    Каждый воркер разбирает бандл заново, поэтому воркеров не больше,
+    чем окружений помещается в бюджет памяти экспорта budget.
+    """
+    per_worker = max(1, int(bundle_bytes * BUNDLE_CACHE.overhead))
+    return max(1, min(workers, budget // per_worker))
+
+@contextmanager
+def _bundle_file(bundle: Bundle):
+    """Путь к бандлу для воркеров: файл как есть, буфер — во временный файл."""
+    if isinstance(bundle, str):
+        yield bundle
+        return
+    fd, path = tempfile.mkstemp(suffix=".bundle")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(bundle)
+        yield path
+    finally:
+        os.remove(path)
+
+# ------------------------------------------------------------------
+# Манифест инкрементального экспорта
+# ------------------------------------------------------------------
+MANIFEST_FILE = ".export_manifest.json"
+
+def _bundle_name(bundle_path: Bundle) -> str:
+    return os.path.basename(bundle_path) if isinstance(bundle_path, str) else "bundle"
+
+# Типы, чьи пиксели, вершины или семплы могут лежать не в самом объекте,
+# а во внешнем потоке бандла (.resS / .resource): поле → (путь, смещение, размер)
+_STREAM_FIELDS = {
+    "Texture2D": ("m_StreamData", "path", "offset", "size"),
+    "Texture2DArray": ("m_StreamData", "path", "offset", "size"),
+    "Texture3D": ("m_StreamData", "path", "offset", "size"),
+    "Cubemap": ("m_StreamData", "path", "offset", "size"),
+    "Mesh": ("m_StreamData", "path", "offset", "size"),
+    "AudioClip": ("m_Resource", "m_Source", "m_Offset", "m_Size"),
+    "VideoClip": ("m_ExternalResources", "m_Source", "m_Offset", "m_Size"),
+}
+
+def _stream_info(obj) -> tuple[str, int, int] | None:
+    """(путь, смещение, размер) внешних данных объекта или None."""
+    spec = _STREAM_FIELDS.get(obj.type.name)
+    if spec is None:
+        return None
+    field, path_key, offset_key, size_key = spec
+    try:
+        info = obj.read_typetree().get(field)
+        if isinstance(info, dict) and info.get(path_key) and info.get(size_key):
+            return info[path_key], int(info[offset_key]), int(info[size_key])
+    except Exception:
+        pass
+    return None
+
+def _resource_reader(obj, res_path: str):
+    """
+    Reader внешнего потока внутри бандла — теми же именами, что перебирает
+    UnityPy (helpers.ResourceReader); None, если поток в другом бандле.
+    """
+    name = ntpath.basename(res_path)
+    stem = ntpath.splitext(name)[0]
+    env = obj.assets_file.environment
+    for candidate in (name, f"{stem}.resource", f"{stem}.assets.resS", f"{stem}.resS"):
+        reader = env.get_cab(candidate)
+        if reader is not None:
+            return reader
+    return None
+
+def payload_hash(obj) -> str:
+    """
+    Хэш сырых сериализованных байт объекта — без декодирования и без
+    копии целиком. Для текстур, мешей и звука со внешним потоком хэшируется
+    и их срез потока: в самом объекте лежат только путь, смещение и размер,
+    и замена пикселей или семплов того же размера его не меняет.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for chunk in _raw_chunks(obj):
+        h.update(chunk)
+    stream = _stream_info(obj)
+    if stream is not None:
+        res_path, offset, size = stream
+        h.update(f"\0{res_path}\0{offset}\0{size}".encode("utf-8", "surrogateescape"))
+        reader = _resource_reader(obj, res_path)
+        if reader is not None:
+            reader.Position = offset
+            while size > 0:
+                chunk = reader.read_bytes(min(WRITE_CHUNK, size))
+                if not chunk:
+                    break
+                size -= len(chunk)
+                h.update(chunk)
+    return h.hexdigest()
+
+def manifest_key(bundle_name: str, key: AssetKey) -> str:
+    return f"{bundle_name}:{key[0]}:{key[1]}"
+
+def load_manifest(output_dir: str) -> dict[str, dict]:
+    """Манифест: "<бандл>:<CAB>:<path_id>" → {bundle, cab, path_id, type, hash, files}."""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+def save_manifest(output_dir: str, manifest: dict[str, dict]) -> None:
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(path + ".tmp", path)
+
+def _up_to_date(entry, digest: str, output_dir: str) -> bool:
+    """
+    Запись манифеста совпадает с объектом и все её файлы на месте.
+    Записи старого формата (без "files") и повреждённые считаются устаревшими.
+    """
+    if not (digest and isinstance(entry, dict) and entry.get("hash") == digest):
+        return False
+    files = entry.get("files")
+    return bool(files) and isinstance(files, list) and \
+        all(os.path.exists(os.path.join(output_dir, f)) for f in files)
 
 # ------------------------------------------------------------------
 # Экспорт всех ассетов
 # ------------------------------------------------------------------
-def extract_all(bundle_path: str, output_dir: str) -> int:
+def extract_all(bundle_path: Bundle, output_dir: str, workers: int = 1,
+                progress=None, chunk_size: int = 32, incremental: bool = True,
+                bundle_name: str | None = None, memory_cap: int = MEMORY_CAP,
+                cancel=None, memory_budget: int | None = None) -> int:
     """
     Экспортирует все ассеты из AssetBundle в указанную папку.
+    workers > 1 — декодирование и кодирование в пуле процессов
+    (пачками по chunk_size объектов); воркеры читают бандл из файла
+    (буфер предварительно пишется во временный), а их число ограничено
+    бюджетом памяти memory_budget (по умолчанию EXPORT_MEMORY_BUDGET,
+    см. _pool_size); итоговое число — в snapshot()["workers"].
+    incremental — объекты, чей хэш совпал с MANIFEST_FILE в output_dir
+    и чей файл на месте, пропускаются; исчезнувшие из бандла попадают
+    в snapshot()["removed"]. bundle_name — имя бандла в манифесте
+    (по умолчанию имя файла; для буфера в памяти лучше задать явно).
+    memory_cap — предел байт, ожидающих фоновой записи, делится между
+    воркерами; при workers <= 1 запись синхронная и потоковая.
+    progress(dict) получает снимки ExportProgress по ходу работы.
+    cancel — threading.Event: при установке оставшиеся объекты не
+    экспортируются, манифест сохраняется по уже записанным. Манифест
+    сохраняется и когда экспорт прерван исключением.
     Возвращает количество успешно экспортированных файлов.
     """
-    env = UnityPy.load(bundle_path)
     os.makedirs(output_dir, exist_ok=True)
-    count = 0
-    for idx, obj in enumerate(env.objects):
-        try:
-            container = obj.read()
-            name = getattr(container, 'name', None) or getattr(container, 'original_path', None)
-            if not name:
-                name = f"path_id_{obj.path_id}"
-
-            # Texture2D → PNG
-            if container.type.name == "Texture2D":
-                img = container.image
-                out_path = os.path.join(output_dir, f"{name}.png")
-                img.save(out_path)
-                count += 1
-            # AudioClip → WAV
-            elif container.type.name == "AudioClip":
-                data = container.read()
-                out_path = os.path.join(output_dir, f"{name}.wav")
-                with open(out_path, "wb") as f:
-                    f.write(data)
-                count += 1
-            # Всё остальное → .bytes
-            else:
-                data = container.read()
-                if isinstance(data, (bytes, bytearray)) and data:
-                    out_path = os.path.join(output_dir, f"{name}.bytes")
-                    with open(out_path, "wb") as f:
-                        f.write(data)
-                    count += 1
-        except Exception:
-            continue
-    return count
+    bundle_name = bundle_name or _bundle_name(bundle_path)
+    manifest = load_manifest(output_dir) if incremental else {}
+    size = os.path.getsize(bundle_path) if isinstance(bundle_path, str) else len(bundle_path)
+    workers = _pool_size(workers, size, memory_budget or EXPORT_MEMORY_BUDGET)
+    hashes: dict[AssetKey, str] = {}
+
+    def _record(key: AssetKey, result, decode: float, write: float) -> None:
+        tracker.add(result)
+        instrument.record("export.decode", decode, type=result[0] if result else None)
+        if result:
+            instrument.record("export.write", write, bytes=result[1], files=len(result[2]))
+            manifest[manifest_key(bundle_name, key)] = {
+                "bundle": bundle_name, "cab": key[0], "path_id": key[1], "type": result[0],
+                "hash": hashes[key],
+                "files": [os.path.relpath(f, output_dir) for f in result[2]],
+            }
+
+    try:
+        # Чтение объектов общего окружения — под замком бандла
+        with use_bundle(bundle_path) as entry:
+            index = entry.index
+            shared = shared_path_ids(index)
+            tracker = ExportProgress(len(index), progress, workers)
+            # Отбор изменившихся объектов по хэшу сырых данных
+            todo: list[AssetKey] = []
+            for key, obj in index.items():
+                try:
+                    hashes[key] = payload_hash(obj)
+                except Exception:
+                    hashes[key] = ""
+                if incremental and _up_to_date(manifest.get(manifest_key(bundle_name, key)), hashes[key], output_dir):
+                    tracker.done += 1
+                    tracker.skipped += 1
+                else:
+                    todo.append(key)
+            for mkey, old in list(manifest.items()):
+                if not isinstance(old, dict):
+                    del manifest[mkey]
+                elif old.get("bundle") != bundle_name:
+                    continue
+                elif "cab" not in old:
+                    # Запись старого формата (ключ без CAB): объект экспортируется заново
+                    del manifest[mkey]
+                elif (old["cab"], old.get("path_id")) not in index:
+                    tracker.removed.append(mkey)
+                    del manifest[mkey]
+
+            if workers <= 1:
+                writer = _FileWriter()
+                for key in todo:
+                    result, seconds = _export_timed(index[key], output_dir, writer,
+                                                    key[0] if key[1] in shared else None)
+                    _record(key, result, seconds, writer.seconds(result))
+                    if tracker.done % chunk_size == 0:
+                        tracker.report()
+                    if cancel is not None and cancel.is_set():
+                        break
+
+        if workers > 1 and todo:
+            chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+            # spawn, а не fork: экспорт идёт из фонового потока (GUI), и
+            # дочерний процесс не должен наследовать чужие захваченные замки
+            with _bundle_file(bundle_path) as bundle_file, \
+                    ProcessPoolExecutor(max_workers=workers, initializer=_init_export_worker,
+                                        initargs=(bundle_file, max(memory_cap // workers, 1)),
+                                        mp_context=multiprocessing.get_context("spawn")) as pool:
+                futures = {pool.submit(_export_chunk, c, output_dir): c for c in chunks}
+                for fut in as_completed(futures):
+                    for key, (result, decode, write) in zip(futures[fut], fut.result()):
+                        _record(key, result, decode, write)
+                    tracker.report()
+                    if cancel is not None and cancel.is_set():
+                        for f in futures:
+                            f.cancel()
+                        break
+    finally:
+        # Уже записанные файлы не придётся экспортировать заново
+        if incremental:
+            save_manifest(output_dir, manifest)
+    tracker.report()
+    return tracker.exported
 
 # ------------------------------------------------------------------
 # Экспорт одного ассета
 # ------------------------------------------------------------------
-def extract_asset(bundle_path: str, asset_index: int, output_dir: str) -> bool:
+def extract_asset(bundle_path: Bundle, asset: AssetKey | int, output_dir: str) -> bool:
     """
-    Экспорт одного ассета по его индексу asset_index в output_dir.
+    Экспорт одного ассета по ключу (CAB, path_id) в output_dir (поиск за
+    O(1) по индексу бандла). Голый path_id годится, если он есть только
+    в одном CAB, иначе ValueError (см. resolve_key).
     Возвращает True, если файл успешно записан.
     """
-    env = UnityPy.load(bundle_path)
-    if asset_index < 0 or asset_index >= len(env.objects):
-        return False
-    os.makedirs(output_dir, exist_ok=True)
-    try:
-        obj = env.objects[asset_index]
-        container = obj.read()
-        name = getattr(container, 'name', None) or getattr(container, 'original_path', None)
-        if not name:
-            name = f"path_id_{obj.path_id}"
-
-        # Texture2D → PNG
-        if container.type.name == "Texture2D":
-            img = container.image
-            out_path = os.path.join(output_dir, f"{name}.png")
-            img.save(out_path)
-        # AudioClip → WAV
-        elif container.type.name == "AudioClip":
-            data = container.read()
-            out_path = os.path.join(output_dir, f"{name}.wav")
-            with open(out_path, "wb") as f:
-                f.write(data)
-        # Всё остальное → .bytes
-        else:
-            data = container.read()
-            if isinstance(data, (bytes, bytearray)) and data:
-                out_path = os.path.join(output_dir, f"{name}.bytes")
-                with open(out_path, "wb") as f:
-                    f.write(data)
-        return True
-    except Exception:
-        return False
+    with use_bundle(bundle_path) as entry:
+        key = resolve_key(entry.index, asset)
+        if key is None:
+            return False
+        os.makedirs(output_dir, exist_ok=True)
+        writer = _FileWriter()
+        shared = key[1] in shared_path_ids(entry.index)
+        result, seconds = _export_timed(entry.index[key], output_dir, writer, key[0] if shared else None)
+    instrument.record("export.decode", seconds, type=result[0] if result else None)
+    if result:
+        instrument.record("export.write", writer.seconds(result), bytes=result[1], files=len(result[2]))
+    return result is not None
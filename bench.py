@@ -0,0 +1,397 @@
+import os, sys, json, time, random, shutil, argparse, tempfile, tracemalloc, statistics
+
+import dat_decrypt
+
+# ------------------------------------------------------------------
+# Бенчмарки горячих путей: дешифровка, загрузка/сохранение CSV,
+# индексы дерева, проверка тегов, глоссарий, поиск, экспорт ассетов.
+# Данные синтетические и воспроизводимые (фиксированный seed).
+#   python bench.py --rows 100000 --terms 3000 --save-baseline bench_baseline.json
+#   python bench.py --rows 100000 --terms 3000 --baseline bench_baseline.json
+# ------------------------------------------------------------------
+BASELINE_FILE = "bench_baseline.json"
+# Во сколько раз можно быть медленнее / прожорливее базовой линии
+TOLERANCE = 1.25
+
+_WORDS = ("the", "of", "light", "storm", "time", "rain", "memory", "door", "city", "old",
+          "silver", "song", "train", "clock", "letter", "shadow", "river", "stone",
+          "child", "arcane", "foundation", "vertin", "sonetto", "regulus", "window",
+          "before", "after", "never", "again", "quiet", "broken", "golden", "night")
+_TAG_PAIRS = (("<color=#d6a546>", "</color>"), ("<b>", "</b>"), ("<i>", "</i>"))
+_NAMES = [f"Char{i:02d}" for i in range(40)]
+
+# ------------------------------------------------------------------
+# Синтетические данные
+# ------------------------------------------------------------------
+def make_bundle(path: str, size_mb: float, key: int = 0x5A, seed: int = 1) -> None:
+    """Файл «UnityFS»-заголовок + псевдослучайные данные, XOR с key."""
+    rnd = random.Random(seed)
+    table = dat_decrypt.xor_table(key)
+    total = int(size_mb * 1024 * 1024)
+    block = 1 << 20
+    with open(path, "wb") as f:
+        head = b"UnityFS\x00\x00\x00\x00\x08" + rnd.randbytes(52)
+        f.write(head.translate(table))
+        written = len(head)
+        while written < total:
+            n = min(block, total - written)
+            f.write(rnd.randbytes(n).translate(table))
+            written += n
+
+def _sentence(rnd: random.Random, tagged: bool) -> str:
+    words = rnd.choices(_WORDS, k=rnd.randint(4, 18))
+    if tagged:
+        i = rnd.randrange(len(words))
+        open_tag, close_tag = rnd.choice(_TAG_PAIRS)
+        words[i] = open_tag + words[i] + close_tag
+        if rnd.random() < 0.3:
+            words.append(rnd.choice(("{0}", "\\n")))
+    return " ".join(words).capitalize() + "."
+
+def make_csv(path: str, rows: int, seed: int = 2) -> None:
+    """
+    CSV формата редактора: сцены по ~60 реплик, треть с тегами, половина
+    переведена, у ~4 % переводов потерян тег (для проверки тегов).
+    """
+    import pandas as pd
+    rnd = random.Random(seed)
+    files, steps, chars, en, ru = [], [], [], [], []
+    scene, step = 0, 0
+    for _ in range(rows):
+        if step == 0 or rnd.random() < 1 / 60:
+            scene, step = scene + 1, 0
+        step += 1
+        text = _sentence(rnd, rnd.random() < 0.33)
+        files.append(f"story_{scene:05d}")
+        steps.append(step)
+        chars.append(rnd.choice(_NAMES))
+        en.append(text)
+        if rnd.random() < 0.5:
+            ru.append("")
+        elif rnd.random() < 0.04:
+            ru.append("RU " + text.replace("<b>", ""))
+        else:
+            ru.append("RU " + text)
+    pd.DataFrame({"File": files, "StepID": steps, "Character": chars,
+                  "EnglishText": en, "RussianTranslation": ru}).to_csv(path, index=False, encoding="utf-8")
+
+def make_glossary(terms: int, seed: int = 3) -> dict[str, str]:
+    """terms терминов: слова словаря, пары слов и выдуманные имена."""
+    rnd = random.Random(seed)
+    glossary = {w: w.upper() for w in _WORDS}
+    while len(glossary) < terms:
+        if rnd.random() < 0.5:
+            term = " ".join(rnd.sample(_WORDS, 2))
+        else:
+            term = "".join(rnd.choices("bcdfghklmnprstvz", k=2)).capitalize() + rnd.choice(("ara", "eth", "ion", "ux"))
+        glossary[term] = term.upper()
+    return dict(list(glossary.items())[:terms])
+
+# ------------------------------------------------------------------
+# Замеры
+# ------------------------------------------------------------------
+def measure(fn, setup=None, repeat: int = 3, memory: bool = True) -> dict:
+    """
+    Лучшее и медианное время fn(setup()) из repeat запусков; пик памяти —
+    отдельным запуском под tracemalloc (он замедляет код и не должен
+    попадать во время). setup не входит в замер.
+    """
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        t0 = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - t0)
+    peak = None
+    if memory:
+        arg = setup() if setup else None
+        tracemalloc.start()
+        try:
+            fn(arg)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {"seconds": min(times), "median": statistics.median(times), "peak_bytes": peak}
+
+class Workload:
+    """Каталог с синтетическими файлами; всё создаётся при первом обращении."""
+    def __init__(self, workdir: str, rows: int, terms: int, bundle_mb: float,
+                 bundle: str | None = None):
+        self.workdir = workdir
+        self.bundle = bundle    # настоящий бандл для list_assets / extract_all
+        self.rows = rows
+        self.terms = terms
+        self.bundle_mb = bundle_mb
+        self._cache = {}
+
+    def _get(self, name, make):
+        if name not in self._cache:
+            self._cache[name] = make()
+        return self._cache[name]
+
+    @property
+    def dat(self) -> str:
+        def _make():
+            path = os.path.join(self.workdir, f"bundle_{self.bundle_mb:g}mb.dat")
+            make_bundle(path, self.bundle_mb)
+            return path
+        return self._get("dat", _make)
+
+    @property
+    def csv(self) -> str:
+        def _make():
+            path = os.path.join(self.workdir, f"lines_{self.rows}.csv")
+            make_csv(path, self.rows)
+            return path
+        return self._get("csv", _make)
+
+    @property
+    def df(self):
+        import file_loader
+        return self._get("df", lambda: file_loader.load_csv(self.csv, use_cache=False))
+
+    @property
+    def glossary(self) -> dict[str, str]:
+        return self._get("glossary", lambda: make_glossary(self.terms))
+
+# Каждый бенчмарк: (workload, repeat) → результат measure() + единицы объёма
+def bench_find_xor_key(w: Workload, repeat: int) -> dict:
+    with open(w.dat, "rb") as f:
+        header = f.read(dat_decrypt.HEADER_SIZE)
+    calls = 20000
+    res = measure(lambda _: [dat_decrypt.find_xor_key(header) for _ in range(calls)], repeat=repeat)
+    return {**res, "units": calls, "unit": "calls"}
+
+def bench_decrypt_dat(w: Workload, repeat: int) -> dict:
+    out = os.path.join(w.workdir, "out_DEC.dat")
+    res = measure(lambda _: dat_decrypt.decrypt_dat(w.dat, out), repeat=repeat)
+    return {**res, "units": os.path.getsize(w.dat), "unit": "bytes"}
+
+def bench_decrypt_to_bytes(w: Workload, repeat: int) -> dict:
+    res = measure(lambda _: dat_decrypt.decrypt_to_bytes(w.dat), repeat=repeat)
+    return {**res, "units": os.path.getsize(w.dat), "unit": "bytes"}
+
+def bench_load_csv(w: Workload, repeat: int) -> dict:
+    import file_loader
+    res = measure(lambda _: file_loader.load_csv(w.csv, use_cache=False), repeat=repeat)
+    return {**res, "units": w.rows, "unit": "rows"}
+
+def bench_load_cached(w: Workload, repeat: int) -> dict:
+    import file_loader
+    file_loader.save_project(w.df, w.csv)
+    res = measure(lambda _: file_loader.load_csv(w.csv), repeat=repeat)
+    return {**res, "units": w.rows, "unit": "rows"}
+
+def bench_save_csv(w: Workload, repeat: int) -> dict:
+    import file_loader
+    out = os.path.join(w.workdir, "saved.csv")
+    res = measure(lambda _: file_loader.save_csv(w.df, out), repeat=repeat)
+    return {**res, "units": w.rows, "unit": "rows"}
+
+def bench_tree_index(w: Workload, repeat: int) -> dict:
+    """Подготовка populate_tree без Qt: RowIndex, ProgressTracker, TagQA."""
+    from localization import RowIndex, ProgressTracker
+    from tag_qa import TagQA
+
+    def _run(_):
+        index = RowIndex(w.df)
+        ProgressTracker(w.df, index)
+        TagQA(w.df)
+    res = measure(_run, repeat=repeat)
+    return {**res, "units": w.rows, "unit": "rows"}
+
+def bench_tree_model(w: Workload, repeat: int) -> dict | None:
+    """DialogueModel целиком (нужен PyQt6; платформа offscreen)."""
+    try:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from dialogue_model import DialogueModel
+    except ImportError:
+        return None
+    from localization import RowIndex, ProgressTracker
+    from tag_qa import TagQA
+    index = RowIndex(w.df)
+    progress = ProgressTracker(w.df, index)
+    qa = TagQA(w.df)
+    res = measure(lambda _: DialogueModel(w.df, index, progress, qa=qa), repeat=repeat)
+    return {**res, "units": w.rows, "unit": "rows"}
+
+def bench_tag_check(w: Workload, repeat: int) -> dict:
+    """Ядро mark_edited: TagQA.check на случайных строках."""
+    from tag_qa import TagQA
+    qa = TagQA(w.df)
+    rnd = random.Random(4)
+    en = w.df["EnglishText"].astype(str)
+    sample = [(pos, en.iat[pos]) for pos in (rnd.randrange(w.rows) for _ in range(10000))]
+    res = measure(lambda _: [qa.check(pos, text) for pos, text in sample], repeat=repeat)
+    return {**res, "units": len(sample), "unit": "checks"}
+
+def bench_glossary(w: Workload, repeat: int) -> dict:
+    from glossary_engine import GlossaryEngine
+    # apply() меняет DataFrame — каждому запуску своя копия (вне замера)
+    res = measure(lambda df: GlossaryEngine(w.glossary).apply(df),
+                  setup=lambda: w.df.copy(), repeat=repeat)
+    return {**res, "units": w.rows, "unit": "rows", "terms": len(w.glossary)}
+
+def bench_search(w: Workload, repeat: int) -> dict:
+    """Ядро search_next: построение индекса и три режима поиска."""
+    from search_index import SearchIndex
+
+    def _run(_):
+        index = SearchIndex(w.df)
+        index.search("silver", "substring")
+        index.search("rain", "word")
+        index.search(r"sto\w+ \w+", "regex")
+    res = measure(_run, repeat=repeat)
+    return {**res, "units": w.rows, "unit": "rows"}
+
+def _real_bundle(w: Workload):
+    import asset_extractor
+    asset_extractor.BUNDLE_CACHE.clear()
+    return dat_decrypt.decrypt_to_bytes(w.bundle)
+
+def bench_list_assets(w: Workload, repeat: int) -> dict | None:
+    if not w.bundle:
+        return None
+    import asset_extractor
+    res = measure(lambda b: asset_extractor.list_assets(b), setup=lambda: _real_bundle(w), repeat=repeat)
+    return {**res, "units": len(asset_extractor.list_assets(_real_bundle(w))), "unit": "assets"}
+
+def bench_extract_all(w: Workload, repeat: int) -> dict | None:
+    if not w.bundle:
+        return None
+    import asset_extractor
+    out = os.path.join(w.workdir, "assets")
+
+    def _setup():
+        shutil.rmtree(out, ignore_errors=True)
+        return _real_bundle(w)
+    res = measure(lambda b: asset_extractor.extract_all(b, out, workers=1, incremental=False),
+                  setup=_setup, repeat=repeat)
+    return {**res, "units": len(asset_extractor.load_index(_real_bundle(w))), "unit": "assets"}
+
+BENCHMARKS = {
+    "find_xor_key": bench_find_xor_key,
+    "decrypt_dat": bench_decrypt_dat,
+    "decrypt_to_bytes": bench_decrypt_to_bytes,
+    "load_csv": bench_load_csv,
+    "load_cached": bench_load_cached,
+    "save_csv": bench_save_csv,
+    "tree_index": bench_tree_index,
+    "tree_model": bench_tree_model,
+    "tag_check": bench_tag_check,
+    "glossary": bench_glossary,
+    "search": bench_search,
+    "list_assets": bench_list_assets,
+    "extract_all": bench_extract_all,
+}
+
+# ------------------------------------------------------------------
+# Сравнение с базовой линией
+# ------------------------------------------------------------------
+# Параметры нагрузки: время сравнимо только при совпадении всех
+WORKLOAD_KEYS = ("rows", "terms", "bundle_mb", "bundle")
+
+def workload_mismatch(meta: dict, baseline: dict) -> list[str]:
+    """Параметры нагрузки, которыми прогон отличается от базовой линии («rows: 10000 → 50000»)."""
+    base = baseline.get("meta", {})
+    return [f"{key}: {base.get(key)} → {meta.get(key)}"
+            for key in WORKLOAD_KEYS if base.get(key) != meta.get(key)]
+
+def compare(results: dict, baseline: dict, tolerance: float = TOLERANCE) -> list[str]:
+    """Названия бенчмарков, ставших медленнее или прожорливее базовой линии."""
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base or "seconds" not in res:
+            continue
+        res["time_ratio"] = res["seconds"] / base["seconds"] if base["seconds"] else None
+        if res.get("peak_bytes") and base.get("peak_bytes"):
+            res["memory_ratio"] = res["peak_bytes"] / base["peak_bytes"]
+        if (res["time_ratio"] or 0) > tolerance or res.get("memory_ratio", 0) > tolerance:
+            regressions.append(name)
+    return regressions
+
+def _rate(res: dict) -> str:
+    if not res["seconds"]:
+        return "-"
+    rate = res["units"] / res["seconds"]
+    if res["unit"] == "bytes":
+        return f"{rate / 1e6:.1f} MB/s"
+    return f"{rate:,.0f} {res['unit']}/s"
+
+def print_table(results: dict) -> None:
+    print(f"{'benchmark':<18}{'best, s':>10}{'median, s':>11}{'throughput':>22}{'peak MB':>10}{'vs base':>9}")
+    for name, res in results.items():
+        if "skipped" in res:
+            print(f"{name:<18}  skipped: {res['skipped']}")
+            continue
+        peak = f"{res['peak_bytes'] / 1e6:.1f}" if res.get("peak_bytes") is not None else "-"
+        ratio = f"{res['time_ratio']:.2f}x" if res.get("time_ratio") else "-"
+        print(f"{name:<18}{res['seconds']:>10.4f}{res['median']:>11.4f}{_rate(res):>22}{peak:>10}{ratio:>9}")
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарки горячих путей REVERSE1999")
+    parser.add_argument("--rows", type=int, default=10000, help="строк в синтетическом CSV (10k–1M)")
+    parser.add_argument("--terms", type=int, default=2000, help="терминов глоссария")
+    parser.add_argument("--bundle-mb", type=float, default=64, help="размер синтетического .dat")
+    parser.add_argument("--bundle", help="настоящий бандл (.dat или _DEC) для list_assets/extract_all")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", help="через запятую: " + ",".join(BENCHMARKS))
+    parser.add_argument("--workdir", help="каталог для данных (по умолчанию временный)")
+    parser.add_argument("--baseline", help="сравнить с сохранённой базовой линией")
+    parser.add_argument("--save-baseline", nargs="?", const=BASELINE_FILE, help="сохранить результаты")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--json", action="store_true", help="вывод JSON Lines вместо таблицы")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error("неизвестные бенчмарки: " + ", ".join(unknown))
+    meta = {"rows": args.rows, "terms": args.terms, "bundle_mb": args.bundle_mb,
+            "bundle": os.path.basename(args.bundle) if args.bundle else None,
+            "python": sys.version.split()[0], "platform": sys.platform,
+            "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        # Другой объём данных — другое время; сравнивать такие прогоны бессмысленно
+        mismatch = workload_mismatch(meta, baseline)
+        if mismatch:
+            parser.error("нагрузка не совпадает с базовой линией (" + "; ".join(mismatch)
+                         + "), запустите с её параметрами или сохраните новую")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="r1999_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    work = Workload(workdir, args.rows, args.terms, args.bundle_mb, args.bundle)
+    results: dict[str, dict] = {}
+    try:
+        for name in names:
+            try:
+                res = BENCHMARKS[name](work, args.repeat)
+            except ImportError as e:
+                res = {"skipped": f"нет модуля {e.name}"}
+            if res is None:
+                res = {"skipped": "нет входных данных или PyQt6"}
+            results[name] = res
+            if args.json:
+                print(json.dumps({"event": "result", "name": name, **res}, ensure_ascii=False), flush=True)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    regressions = compare(results, baseline, args.tolerance) if baseline else []
+    if args.json:
+        print(json.dumps({"event": "summary", **meta, "regressions": regressions}, ensure_ascii=False))
+    else:
+        print_table(results)
+        if args.baseline:
+            print("регрессии: " + (", ".join(regressions) if regressions else "нет"))
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, ensure_ascii=False, indent=2)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
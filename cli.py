@@ -0,0 +1,322 @@
+import os, sys, json, glob, time, argparse, threading
+
+import dat_decrypt
+
+# ------------------------------------------------------------------
+# Консольный режим без GUI: дешифровка → листинг → экспорт → перевод
+# Каждое событие — одна строка JSON в stdout (JSON Lines).
+# PyQt6 здесь не импортируется, тяжёлые модули — только в своих командах.
+# ------------------------------------------------------------------
+_out_lock = threading.Lock()
+
+def emit(event: str, **fields) -> None:
+    """Печатает событие одной строкой JSON."""
+    line = json.dumps({"event": event, **fields}, ensure_ascii=False, default=str)
+    with _out_lock:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+def expand_inputs(inputs: list[str], pattern: str) -> list[tuple[str, str]]:
+    """
+    Пути, маски (включая **) и каталоги (рекурсивно по pattern) →
+    список (файл, базовый каталог) без повторов, в исходном порядке.
+    Базовый каталог нужен для зеркального дерева в выходной папке.
+    """
+    seen, files = set(), []
+
+    def _add(path, base):
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            files.append((path, base))
+
+    for arg in inputs:
+        if os.path.isdir(arg):
+            for path in sorted(glob.glob(os.path.join(arg, "**", pattern), recursive=True)):
+                if os.path.isfile(path):
+                    _add(path, arg)
+        elif glob.has_magic(arg):
+            # База маски — её начало без подстановочных символов
+            base = arg
+            while glob.has_magic(base):
+                base = os.path.dirname(base)
+            for path in sorted(glob.glob(arg, recursive=True)):
+                if os.path.isfile(path):
+                    _add(path, base or ".")
+        elif os.path.isfile(arg):
+            _add(arg, os.path.dirname(arg) or ".")
+        else:
+            emit("error", path=arg, error="нет такого файла или каталога")
+    return files
+
+def _stem(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+def _megabytes(mb: int | None) -> int | None:
+    return mb * 1024 * 1024 if mb else None
+
+def _load_bundle(path: str):
+    """Бандл в памяти: .dat дешифруется, уже открытый бандл читается как есть (ключ 0)."""
+    bundle = dat_decrypt.decrypt_to_bytes(path)
+    if bundle is None:
+        emit("error", path=path, error="ключ дешифрования не найден")
+    return bundle
+
+# ------------------------------------------------------------------
+# Команды
+# ------------------------------------------------------------------
+def cmd_decrypt(args) -> int:
+    failed = 0
+    groups: dict[str, list[str]] = {}
+    for path, base in expand_inputs(args.inputs, args.pattern):
+        if _stem(path).endswith("_DEC"):
+            continue
+        groups.setdefault(base, []).append(path)
+    for base, paths in groups.items():
+        out = os.path.join(args.output, os.path.basename(os.path.abspath(base))) \
+            if args.output and len(groups) > 1 else args.output
+        summary = dat_decrypt.decrypt_files(
+            paths, base, out, workers=args.workers, check=args.check,
+            on_result=lambda res: emit("file", **res))
+        summary.pop("results")
+        failed += summary["failed"]
+        emit("summary", source=base, output=out, **summary)
+    return 1 if failed else 0
+
+def cmd_list(args) -> int:
+    import asset_extractor
+    status = 0
+    for path, _ in expand_inputs(args.inputs, args.pattern):
+        bundle = _load_bundle(path)
+        if bundle is None:
+            status = 1
+            continue
+        n = 0
+        try:
+            for n, ((cab, path_id), typ, name) in enumerate(asset_extractor.iter_assets(bundle), 1):
+                emit("asset", bundle=path, cab=cab, path_id=path_id, type=typ, name=name)
+        except Exception as e:
+            emit("error", path=path, error=str(e))
+            status = 1
+        emit("summary", bundle=path, assets=n)
+        asset_extractor.BUNDLE_CACHE.discard(bundle)
+    return status
+
+def cmd_export(args) -> int:
+    import asset_extractor
+    status = 0
+    for path, _ in expand_inputs(args.inputs, args.pattern):
+        bundle = _load_bundle(path)
+        if bundle is None:
+            status = 1
+            continue
+        out_dir = os.path.join(args.output, _stem(path))
+        last = {}
+
+        def _progress(p, path=path):
+            last.update(p)
+            emit("progress", bundle=path, done=p["done"], total=p["total"], bytes=p["bytes"],
+                 workers=p["workers"])
+
+        try:
+            if args.path_id is not None:
+                asset = (args.cab, args.path_id) if args.cab else args.path_id
+                ok = asset_extractor.extract_asset(bundle, asset, out_dir)
+                emit("summary", bundle=path, output=out_dir, cab=args.cab, path_id=args.path_id, ok=ok)
+                status |= 0 if ok else 1
+            else:
+                asset_extractor.extract_all(bundle, out_dir, workers=args.workers,
+                                            progress=_progress, incremental=not args.full,
+                                            bundle_name=os.path.basename(path),
+                                            memory_budget=_megabytes(args.memory_budget),
+                                            memory_cap=_megabytes(args.memory_cap) or asset_extractor.MEMORY_CAP)
+                emit("summary", bundle=path, output=out_dir,
+                     **{k: last.get(k) for k in ("total", "exported", "skipped", "removed", "bytes",
+                                                 "elapsed", "workers")})
+        except Exception as e:
+            emit("error", path=path, error=str(e))
+            status = 1
+        asset_extractor.BUNDLE_CACHE.discard(bundle)
+    return status
+
+def _load_table(path: str):
+    """CSV (через файл проекта) с колонкой RussianTranslation; None — ошибка."""
+    import file_loader
+    try:
+        df = file_loader.load_csv(path, on_merge=lambda info: emit("merged", path=path, **info))
+    except Exception as e:
+        emit("error", path=path, error=str(e))
+        return None
+    if "RussianTranslation" not in df.columns:
+        df["RussianTranslation"] = ""
+    return df
+
+def _save_table(df, path: str, write_csv: bool) -> None:
+    import file_loader
+    if write_csv:
+        file_loader.save_csv(df, path)
+    else:
+        file_loader.save_project(df, path)
+
+def cmd_csv(args) -> int:
+    import file_loader
+    status = 0
+    for path, _ in expand_inputs(args.inputs, "*.csv"):
+        t0 = time.perf_counter()
+        df = _load_table(path)
+        if df is None:
+            status = 1
+            continue
+        done = int((df["RussianTranslation"].astype(str) != "").sum())
+        info = {"rows": len(df), "translated": done, "scenes": int(df["File"].nunique()),
+                "memory": int(df.memory_usage(deep=True).sum()),
+                "seconds": round(time.perf_counter() - t0, 3)}
+        if args.export_dir:
+            out = os.path.join(args.export_dir, os.path.basename(path))
+            os.makedirs(args.export_dir, exist_ok=True)
+            file_loader.save_csv(df, out)
+            info["output"] = out
+        emit("summary", path=path, **info)
+    return status
+
+def cmd_glossary(args) -> int:
+    from glossary_engine import GlossaryEngine
+    with open(args.glossary, encoding="utf-8") as f:
+        engine = GlossaryEngine(json.load(f), whole_words=not args.substrings)
+    status = 0
+    for path, _ in expand_inputs(args.inputs, "*.csv"):
+        df = _load_table(path)
+        if df is None:
+            status = 1
+            continue
+        changed = engine.apply(df)
+        if changed and not args.dry_run:
+            _save_table(df, path, args.write_csv)
+        emit("summary", path=path, changed=len(changed), saved=bool(changed) and not args.dry_run)
+    return status
+
+def cmd_translate(args) -> int:
+    import translator
+    from tag_qa import TagQA
+    from translation_memory import TranslationMemory
+    tm = None if args.no_tm else TranslationMemory()
+    status = 0
+    for path, _ in expand_inputs(args.inputs, "*.csv"):
+        df = _load_table(path)
+        if df is None:
+            status = 1
+            continue
+        ru = df["RussianTranslation"].astype(str)
+        todo = ru == ""
+        if args.scene:
+            todo &= df["File"].astype(str).isin(args.scene)
+        en = df["EnglishText"].astype(str)
+        items = [(int(pos), en.iat[pos]) for pos in todo.to_numpy().nonzero()[0]]
+        if args.limit:
+            items = items[:args.limit]
+        total = len(items)
+        hits, items = tm.prefill(items) if tm else ({}, items)
+        qa = TagQA(df)
+        col = df.columns.get_loc("RussianTranslation")
+        rejected: list[int] = []
+        written = [0]
+
+        def _write(got: dict, source: str, path=path, total=total):
+            ok = {}
+            for pos, text in got.items():
+                if qa.check(pos, text):
+                    rejected.append(pos)
+                else:
+                    ok[pos] = text
+            for pos, text in ok.items():
+                df.iat[pos, col] = text
+            if tm and source == "api":
+                tm.add_many((en.iat[pos], text) for pos, text in ok.items())
+            written[0] += len(ok)
+            emit("progress", path=path, source=source, done=written[0] + len(rejected), total=total)
+
+        _write(hits, "memory")
+        tr = translator.Translator(model=args.model or translator.DEFAULT_MODEL, token_budget=args.budget,
+                                   concurrency=args.concurrency)
+        failed = []
+        if items:
+            _, failed = tr.translate(items, on_batch=lambda got: _write(got, "api"))
+        if written[0]:
+            _save_table(df, path, args.write_csv)
+        emit("summary", path=path, total=total, translated=written[0], from_memory=len(hits),
+             rejected=sorted(rejected), failed=len(failed), usage=tr.usage,
+             error=str(tr.last_error) if tr.last_error else None)
+        if failed:
+            status = 1
+    if tm:
+        emit("memory", **tm.stats())
+        tm.close()
+    return status
+
+# ------------------------------------------------------------------
+# Разбор аргументов
+# ------------------------------------------------------------------
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="REVERSE1999: пакетная обработка без GUI (вывод — JSON Lines)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("decrypt", help="дешифровать .dat")
+    p.add_argument("inputs", nargs="+", help="файлы, маски или каталоги")
+    p.add_argument("-o", "--output", help="каталог результатов (по умолчанию <name>_DEC рядом)")
+    p.add_argument("--pattern", default="*.dat", help="маска файлов в каталогах")
+    p.add_argument("--check", choices=("mtime", "hash", "none"), default="mtime")
+    p.add_argument("-j", "--workers", type=int, default=None)
+    p.set_defaults(func=cmd_decrypt)
+
+    p = sub.add_parser("list", help="список ассетов бандла")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("--pattern", default="*.dat")
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser("export", help="экспорт ассетов (в <output>/<имя бандла>)")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("-o", "--output", required=True)
+    p.add_argument("--pattern", default="*.dat")
+    p.add_argument("--path-id", type=int, default=None, help="экспортировать один ассет")
+    p.add_argument("--cab", help="CAB ассета, если его path_id есть в нескольких CAB бандла")
+    p.add_argument("--full", action="store_true", help="без пропуска неизменившихся")
+    p.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--memory-budget", type=int, metavar="MB",
+                   help="память на воркеры экспорта (по умолчанию половина ОЗУ); "
+                        "воркеров не больше, чем копий бандла в неё помещается")
+    p.add_argument("--memory-cap", type=int, metavar="MB",
+                   help="предел данных в очереди записи на весь экспорт (по умолчанию 256)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("csv", help="загрузить CSV (обновить файл проекта), сводка, экспорт")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("--export-dir", help="записать CSV из файла проекта в этот каталог")
+    p.set_defaults(func=cmd_csv)
+
+    p = sub.add_parser("glossary", help="подставить глоссарий")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("-g", "--glossary", default="glossary.json")
+    p.add_argument("--substrings", action="store_true", help="совпадения и внутри слов")
+    p.add_argument("--dry-run", action="store_true")
+    p.add_argument("--write-csv", action="store_true", help="перезаписать CSV, а не только файл проекта")
+    p.set_defaults(func=cmd_glossary)
+
+    p = sub.add_parser("translate", help="авто-перевод пустых строк")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("--scene", action="append", help="только эта сцена (File), можно несколько")
+    p.add_argument("--limit", type=int, default=0, help="не больше N строк на файл")
+    p.add_argument("--model", default=None)
+    p.add_argument("--budget", type=int, default=1500, help="токенов на запрос")
+    p.add_argument("--concurrency", type=int, default=4)
+    p.add_argument("--no-tm", action="store_true", help="без памяти переводов")
+    p.add_argument("--write-csv", action="store_true", help="перезаписать CSV, а не только файл проекта")
+    p.set_defaults(func=cmd_translate)
+    return parser
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
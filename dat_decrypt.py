@@ -1,25 +1,235 @@
 # dat_decrypt.py
-def find_xor_key(data: bytes, signature: bytes = b"UnityFS") -> int | None:
+import os, json, time, hashlib, fnmatch, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import instrument
+
+# Размер блока потоковой дешифровки: память ограничена ~2× этим значением
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# Известные сигнатуры заголовков Unity-бандлов. Нешифрованный бандл
+# распознаётся автоматически — для него ключ получается равным 0
+SIGNATURES: tuple[bytes, ...] = (b"UnityFS", b"UnityWeb", b"UnityRaw", b"UnityArchive")
+# Сколько байт заголовка читать для поиска ключа
+HEADER_SIZE = 64
+
+def find_xor_key(data: bytes, signatures: bytes | tuple[bytes, ...] = SIGNATURES) -> int | None:
     """
-    Пробуем все 0–255, возвращаем ключ, при котором первые len(signature)
-    байт после XOR совпадают с signature.
+    Ключ вычисляется из первого байта (k = data[0] ^ sig[0]) и затем
+    проверяется на всей сигнатуре. Перебираются все signatures по порядку;
+    возвращается первый подошедший ключ или None.
     """
-    for k in range(256):
-        if all((data[i] ^ k) == signature[i] for i in range(len(signature))):
+    if isinstance(signatures, bytes):
+        signatures = (signatures,)
+    for sig in signatures:
+        if len(data) < len(sig):
+            continue
+        k = data[0] ^ sig[0]
+        if data[:len(sig)].translate(xor_table(k)) == sig:
             return k
     return None
 
-def decrypt_dat(input_path: str, output_path: str) -> bool:
+def detect_key(input_path: str) -> int | None:
+    """
+    Определяет ключ файла по заголовку. Решение за O(1) (find_xor_key)
+    дешевле любого кэша, а сам файл при дешифровке читается всё равно.
+    """
+    with open(input_path, "rb") as f:
+        return find_xor_key(f.read(HEADER_SIZE))
+
+def xor_table(key: int) -> bytes:
+    """Таблица для bytes.translate: байт b → b ^ key."""
+    return bytes(b ^ key for b in range(256))
+
+def decrypt_stream(src, dst, key: int, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Дешифрует поток src в поток dst блоками по chunk_size байт.
+    XOR выполняется через bytes.translate (на стороне C), поэтому
+    скорость упирается в диск, а не в интерпретатор.
+    Возвращает число записанных байт.
+    """
+    table = xor_table(key)
+    total = 0
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        dst.write(chunk.translate(table))
+        total += len(chunk)
+    return total
+
+def decrypt_dat(input_path: str, output_path: str, chunk_size: int = CHUNK_SIZE,
+                key: int | None = None) -> bool:
     """
     Дешифрует файл input_path одно-байтовым XOR, сохраняет в output_path.
+    Если key не задан, он определяется по заголовку,
+    сам файл обрабатывается потоково.
     Возвращает True, если ключ найден и файл записан, иначе False.
     """
-    with open(input_path, "rb") as f:
-        raw = f.read()
-    key = find_xor_key(raw)
+    if key is None:
+        key = detect_key(input_path)
     if key is None:
         return False
-    dec = bytes(b ^ key for b in raw)
-    with open(output_path, "wb") as f:
-        f.write(dec)
-    return True
\ No newline at end of file
+    with instrument.span("decrypt.file", bytes=os.path.getsize(input_path)):
+        with open(input_path, "rb") as src:
+            with open(output_path, "wb") as dst:
+                decrypt_stream(src, dst, key, chunk_size)
+    return True
+
+def decrypt_to_bytes(input_path: str, chunk_size: int = CHUNK_SIZE,
+                     key: int | None = None) -> bytearray | None:
+    """
+    Дешифрует файл в память без промежуточного _DEC-файла.
+    Буфер выделяется один раз под размер файла и XOR-ится блоками
+    на месте, так что пик памяти ≈ размер файла + chunk_size.
+    Результат можно сразу передать в UnityPy.load.
+    Возвращает None, если ключ не найден.
+    """
+    if key is None:
+        key = detect_key(input_path)
+    if key is None:
+        return None
+    with open(input_path, "rb") as src, instrument.span("decrypt.memory") as sp:
+        buf = bytearray(os.fstat(src.fileno()).st_size)
+        sp["bytes"] = len(buf)
+        view = memoryview(buf)
+        table = xor_table(key)
+        pos = 0
+        while pos < len(buf):
+            n = src.readinto(view[pos:pos + chunk_size])
+            if not n:
+                break
+            view[pos:pos + n] = view[pos:pos + n].tobytes().translate(table)
+            pos += n
+        view.release()
+    del buf[pos:]
+    return buf
+
+# ------------------------------------------------------------------
+# Пакетная дешифровка каталога
+# ------------------------------------------------------------------
+STATE_FILE = ".dat_decrypt_state.json"
+
+def file_hash(path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    """blake2b-хэш содержимого файла (читается блоками)."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _output_path(src: str, src_dir: str, out_dir: str | None) -> str:
+    """Путь результата: зеркальное дерево в out_dir или <name>_DEC рядом с исходником."""
+    if out_dir:
+        return os.path.join(out_dir, os.path.relpath(src, src_dir))
+    base, ext = os.path.splitext(src)
+    return base + "_DEC" + ext
+
+def _is_up_to_date(src: str, dst: str) -> bool:
+    """XOR не меняет размер: совпадение размера и более свежий mtime → пропуск."""
+    try:
+        s, d = os.stat(src), os.stat(dst)
+    except OSError:
+        return False
+    return s.st_size == d.st_size and d.st_mtime >= s.st_mtime
+
+def _decrypt_job(job: tuple[str, str, str, str | None]) -> dict:
+    """Задача для пула процессов: одна пара (src → dst)."""
+    src, dst, check, known_hash = job
+    res = {"path": src, "output": dst, "status": "ok", "bytes": 0, "error": None,
+           "hash": None, "key": None}
+    t0 = time.perf_counter()
+    try:
+        if check == "hash":
+            res["hash"] = file_hash(src)
+            if res["hash"] == known_hash and os.path.exists(dst):
+                res["status"] = "skipped"
+        elif check == "mtime" and _is_up_to_date(src, dst):
+            res["status"] = "skipped"
+        if res["status"] != "skipped":
+            res["key"] = key = detect_key(src)
+            os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+            if key is not None and decrypt_dat(src, dst, key=key):
+                res["bytes"] = os.path.getsize(src)
+            else:
+                res["status"] = "failed"
+                res["error"] = "ключ не найден"
+    except Exception as e:
+        res["status"] = "failed"
+        res["error"] = str(e)
+    res["seconds"] = time.perf_counter() - t0
+    return res
+
+def decrypt_tree(src_dir: str, out_dir: str | None = None, workers: int | None = None,
+                 check: str = "mtime", pattern: str = "*.dat", on_result=None,
+                 cancel=None) -> dict:
+    """
+    Рекурсивно дешифрует все файлы src_dir, подходящие под pattern
+    (подробности и параметры — decrypt_files).
+    """
+    paths = []
+    for root, _, names in os.walk(src_dir):
+        for name in sorted(names):
+            if not fnmatch.fnmatch(name, pattern):
+                continue
+            if not out_dir and os.path.splitext(name)[0].endswith("_DEC"):
+                continue
+            paths.append(os.path.join(root, name))
+    return decrypt_files(paths, src_dir, out_dir, workers, check, on_result, cancel)
+
+def decrypt_files(paths: list[str], src_dir: str, out_dir: str | None = None,
+                  workers: int | None = None, check: str = "mtime", on_result=None,
+                  cancel=None) -> dict:
+    """
+    Дешифрует файлы paths (лежащие внутри src_dir) в пуле из workers
+    процессов (None — по числу ядер). Результаты — зеркальным деревом
+    в out_dir или <name>_DEC рядом с исходником.
+    check: "mtime" — пропуск по размеру и времени изменения,
+           "hash"  — пропуск по хэшу исходника (хранится в STATE_FILE),
+           "none"  — дешифровать всё.
+    on_result(dict) вызывается для каждого файла по мере готовности.
+    cancel — threading.Event: если установлен, ещё не начатые файлы
+    отменяются, а сводка и состояние сохраняются по уже готовым.
+    Возвращает сводку со счётчиками, скоростью и списком результатов.
+    """
+    state_root = out_dir or src_dir
+    state_path = os.path.join(state_root, STATE_FILE)
+    state: dict[str, str] = {}
+    if check == "hash" and os.path.exists(state_path):
+        with open(state_path, encoding="utf-8") as f:
+            state = json.load(f)
+
+    jobs = []
+    for src in paths:
+        rel = os.path.relpath(src, src_dir)
+        jobs.append((src, _output_path(src, src_dir, out_dir), check, state.get(rel)))
+
+    summary = {"files": len(jobs), "ok": 0, "skipped": 0, "failed": 0, "bytes": 0, "results": []}
+    t0 = time.perf_counter()
+    # GUI запускает пул из потока QThreadPool: fork многопоточного процесса
+    # может унаследовать замок, захваченный другим потоком, и повиснуть
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(_decrypt_job, job) for job in jobs]
+        for fut in as_completed(futures):
+            res = fut.result()
+            # Воркеры — отдельные процессы: время файла записываем здесь
+            instrument.record("decrypt.file", res["seconds"], bytes=res["bytes"], status=res["status"])
+            summary[res["status"]] += 1
+            summary["bytes"] += res["bytes"]
+            summary["results"].append(res)
+            if res["hash"] and res["status"] != "failed":
+                state[os.path.relpath(res["path"], src_dir)] = res["hash"]
+            if on_result:
+                on_result(res)
+            if cancel is not None and cancel.is_set():
+                for f in futures:
+                    f.cancel()
+                break
+    summary["cancelled"] = cancel is not None and cancel.is_set()
+    summary["seconds"] = time.perf_counter() - t0
+    summary["mb_per_s"] = summary["bytes"] / 1e6 / summary["seconds"] if summary["seconds"] else 0.0
+
+    if check == "hash":
+        os.makedirs(state_root, exist_ok=True)
+        with open(state_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+    return summary
@@ -0,0 +1,245 @@
+import numpy as np
+from PyQt6.QtCore import Qt, QAbstractItemModel, QModelIndex, QSortFilterProxyModel
+from PyQt6.QtGui import QColor, QBrush
+from localization import TAG_REGEX, RowIndex, ProgressTracker
+from tag_qa import TagQA
+
+# Колонки дерева реплик: сцена (File) → строки сцены
+COLUMNS = ["File", "StepID", "Character", "EnglishText", "RussianTranslation"]
+COLOR_MAP = {"empty": "#FFCCCC", "partial": "#FFF4CC", "done": "#CCFFCC"}
+TAG_COLOR = "#FFFACD"
+ISSUE_COLOR = "#FFB0B0"
+RU_COL = 4
+
+class _Scene:
+    """Узел сцены: позиции её строк в DataFrame и сколько из них уже выдано виду."""
+    __slots__ = ("name", "rows", "row", "fetched")
+
+    def __init__(self, name: str, rows: np.ndarray, row: int):
+        self.name = name
+        self.rows = rows
+        self.row = row
+        self.fetched = 0
+
+# ------------------------------------------------------------------
+# Модель: читает значения прямо из колонок DataFrame
+# ------------------------------------------------------------------
+class DialogueModel(QAbstractItemModel):
+    """
+    Двухуровневая модель «сцена → реплики» поверх DataFrame без копирования
+    данных в элементы. Сцены и строки выдаются виду порциями
+    (canFetchMore/fetchMore), так что открытие файла стоит столько,
+    сколько видно на экране.
+    validator(pos, new_text) -> bool вызывается перед записью перевода;
+    False отменяет правку. Если передан qa (TagQA), подсветка тегов берётся
+    из его кэша, а строки с расхождениями тегов выделяются с подсказкой.
+    """
+    SCENE_BATCH = 200
+    LINE_BATCH = 500
+
+    def __init__(self, df, row_index: RowIndex, progress: ProgressTracker,
+                 parent=None, qa: TagQA | None = None):
+        super().__init__(parent)
+        self.df = df
+        self.row_index = row_index
+        self.progress = progress
+        self.qa = qa
+        self.validator = None
+        self._cols = [df.columns.get_loc(c) for c in COLUMNS]
+        # Один проход: подсветка тегов для всех строк
+        if qa is not None:
+            self._has_tags = qa.has_tags
+        else:
+            self._has_tags = df["EnglishText"].astype(str).map(lambda t: TAG_REGEX.search(t) is not None).to_numpy()
+        self._scenes = [_Scene(name, rows, i)
+                        for i, (name, rows) in enumerate(zip(row_index.names, row_index.rows))]
+        self._scene_of = row_index.scene_of
+        self._offset_of = row_index.offset_of
+        self._fetched = 0
+        # Позиции строк в порядке отображения (сцена за сценой)
+        self.order = np.concatenate(row_index.rows) if row_index.rows \
+            else np.empty(0, dtype=np.int64)
+        # Обратная перестановка: позиция в DataFrame → номер в порядке отображения
+        self.display_rank = np.empty(len(df), dtype=np.int64)
+        self.display_rank[self.order] = np.arange(len(self.order))
+
+    # --- структура ---------------------------------------------------
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, None)
+        return self.createIndex(row, column, self._scenes[parent.row()])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        scene = index.internalPointer()
+        if scene is None:
+            return QModelIndex()
+        return self.createIndex(scene.row, 0, None)
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return self._fetched
+        if parent.internalPointer() is None and parent.column() == 0:
+            return self._scenes[parent.row()].fetched
+        return 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(COLUMNS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return bool(self._scenes)
+        return parent.internalPointer() is None and parent.column() == 0
+
+    # --- ленивая подгрузка --------------------------------------------
+    def canFetchMore(self, parent):
+        if not parent.isValid():
+            return self._fetched < len(self._scenes)
+        if parent.internalPointer() is None:
+            scene = self._scenes[parent.row()]
+            return scene.fetched < len(scene.rows)
+        return False
+
+    def fetchMore(self, parent):
+        if not parent.isValid():
+            end = min(self._fetched + self.SCENE_BATCH, len(self._scenes))
+            if end > self._fetched:
+                self.beginInsertRows(parent, self._fetched, end - 1)
+                self._fetched = end
+                self.endInsertRows()
+        elif parent.internalPointer() is None:
+            scene = self._scenes[parent.row()]
+            end = min(scene.fetched + self.LINE_BATCH, len(scene.rows))
+            if end > scene.fetched:
+                self.beginInsertRows(parent, scene.fetched, end - 1)
+                scene.fetched = end
+                self.endInsertRows()
+
+    # --- данные ------------------------------------------------------
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        scene = index.internalPointer()
+        if scene is None:
+            scene = self._scenes[index.row()]
+            if index.column() != 0:
+                return None
+            if role == Qt.ItemDataRole.DisplayRole:
+                return scene.name
+            if role == Qt.ItemDataRole.BackgroundRole:
+                return QBrush(QColor(COLOR_MAP[self.progress.status(scene.row)]))
+            return None
+        pos = int(scene.rows[index.row()])
+        col = index.column()
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            if col == 0:
+                return None
+            return str(self.df.iat[pos, self._cols[col]])
+        issues = self.qa.issues.get(pos) if self.qa is not None and col == RU_COL else None
+        if role == Qt.ItemDataRole.BackgroundRole:
+            if issues:
+                return QBrush(QColor(ISSUE_COLOR))
+            if col in (3, 4) and self._has_tags[pos]:
+                return QBrush(QColor(TAG_COLOR))
+        if role == Qt.ItemDataRole.ToolTipRole and issues:
+            return "\n".join(issues)
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid() and index.internalPointer() is not None and index.column() == RU_COL:
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if role != Qt.ItemDataRole.EditRole or index.internalPointer() is None \
+                or index.column() != RU_COL:
+            return False
+        pos = int(index.internalPointer().rows[index.row()])
+        new = str(value)
+        if self.validator is not None and not self.validator(pos, new):
+            return False
+        self.set_translation(pos, new)
+        return True
+
+    # --- доступ для MainApp -----------------------------------------------
+    def position(self, index) -> int | None:
+        """Позиция строки DataFrame для индекса реплики (None для сцены)."""
+        if not index.isValid() or index.internalPointer() is None:
+            return None
+        return int(index.internalPointer().rows[index.row()])
+
+    def scene_rows(self, index) -> tuple[str, np.ndarray] | None:
+        """(имя сцены, позиции её строк) для индекса сцены или реплики."""
+        if not index.isValid():
+            return None
+        scene = index.internalPointer() or self._scenes[index.row()]
+        return scene.name, scene.rows
+
+    def scene_status(self, row: int) -> str:
+        return self.progress.status(row)
+
+    def scene_row(self, pos: int) -> int:
+        """Номер сцены (строка верхнего уровня) для позиции в DataFrame."""
+        return int(self._scene_of[pos])
+
+    def index_for_position(self, pos: int, column: int = RU_COL) -> QModelIndex:
+        """Индекс реплики по позиции в DataFrame; догружает сцену при необходимости."""
+        scene = self._scenes[self._scene_of[pos]]
+        while self._fetched <= scene.row:
+            self.fetchMore(QModelIndex())
+        scene_index = self.createIndex(scene.row, 0, None)
+        offset = int(self._offset_of[pos])
+        while scene.fetched <= offset:
+            self.fetchMore(scene_index)
+        return self.createIndex(offset, column, scene)
+
+    def set_translation(self, pos: int, text: str) -> None:
+        """Записывает перевод и обновляет строку, счётчики и цвет её сцены."""
+        self.df.iat[pos, self._cols[RU_COL]] = text
+        self._row_changed(pos)
+
+    def refresh_rows(self, positions) -> None:
+        """Оповещает вид и счётчики об изменении строк, записанных в DataFrame напрямую."""
+        for pos in positions:
+            self._row_changed(int(pos))
+
+    def _row_changed(self, pos: int) -> None:
+        scene = self._scenes[self._scene_of[pos]]
+        offset = int(self._offset_of[pos])
+        text = str(self.df.iat[pos, self._cols[RU_COL]])
+        if self.qa is not None:
+            self.qa.update(pos, text)
+        if scene.row < self._fetched and offset < scene.fetched:
+            idx = self.createIndex(offset, RU_COL, scene)
+            self.dataChanged.emit(idx, idx)
+        if self.progress.update(pos, text):
+            if scene.row < self._fetched:
+                sidx = self.createIndex(scene.row, 0, None)
+                self.dataChanged.emit(sidx, sidx)
+
+# ------------------------------------------------------------------
+# Фильтр «скрывать завершённые»
+# ------------------------------------------------------------------
+class HideDoneProxy(QSortFilterProxyModel):
+    """Прокси над DialogueModel: прячет сцены со статусом done без перестройки модели."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.hide_done = False
+
+    def set_hide_done(self, on: bool) -> None:
+        self.hide_done = bool(on)
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if source_parent.isValid() or not self.hide_done:
+            return True
+        return self.sourceModel().scene_status(source_row) != "done"
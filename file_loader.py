@@ -1,9 +1,308 @@
+import os, json, struct, hashlib
+import numpy as np
 import pandas as pd
+import instrument
+from pandas.api.types import union_categoricals
 
-def load_csv(path: str) -> pd.DataFrame:
-    """Считывает CSV в DataFrame, пустые ячейки не превращает в NaN."""
-    return pd.read_csv(path, keep_default_na=False, encoding="utf-8")
+# Файл проекта рядом с CSV: <имя>.csv.r1999proj
+# Формат без pickle (при открытии не выполняется никакой код):
+#   PROJECT_MAGIC, длина заголовка (uint64 LE), JSON-заголовок, буферы колонок.
+# Заголовок хранит отпечаток CSV, на котором основан проект, и флаг synced:
+#   synced = True  — содержимое совпадает с CSV (кэш, можно пересоздать);
+#   synced = False — в проекте есть правки, которых нет в CSV (кнопка «Сохранить проект»).
+PROJECT_SUFFIX = ".r1999proj"
+PROJECT_MAGIC = b"R1999PRJ"
+PROJECT_VERSION = 3
+HASH_CHUNK = 1 << 20
+# Потоковое чтение CSV: строк в порции
+CHUNK_ROWS = 50_000
+REQUIRED_COLUMNS = ("File", "StepID", "Character", "EnglishText")
+# Явные типы: повторяющиеся File и Character — категории, тексты — строки
+DTYPES = {"File": "category", "Character": "category", "StepID": str,
+          "EnglishText": str, "RussianTranslation": str}
+CATEGORICAL = ("File", "Character")
+# Числовые типы, допустимые в буферах файла проекта
+_NUMERIC_KINDS = "biuf"
+# Отпечаток CSV, из которого загружен DataFrame (абсолютный путь → mtime, размер, хэш).
+# save_project() пишет именно его, а не текущий: если CSV за это время изменили,
+# при следующем открытии проект будет объединён с новым CSV, а не принят за актуальный.
+_stamps: dict[str, dict] = {}
+
+def project_path(csv_path: str) -> str:
+    return csv_path + PROJECT_SUFFIX
+
+def _atomic_write(path: str, write) -> None:
+    """write(tmp_path) пишет во временный файл, затем он подменяет path."""
+    tmp = path + ".tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def _csv_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _csv_stamp(path: str, with_hash: bool = False) -> dict | None:
+    """Отпечаток CSV (mtime, размер, по запросу хэш); None, если файла нет."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stamp = {"mtime": st.st_mtime_ns, "size": st.st_size}
+    if with_hash:
+        stamp["hash"] = _csv_hash(path)
+    return stamp
+
+def _csv_unchanged(path: str, saved: dict | None) -> bool:
+    """
+    CSV не менялся с отпечатка saved: совпали mtime и размер,
+    а при другом mtime, но том же размере — хэш содержимого (копия файла).
+    """
+    stamp = _csv_stamp(path)
+    if stamp is None:
+        return True          # CSV удалён — остаётся только проект
+    saved = saved or {}
+    if saved.get("mtime") == stamp["mtime"] and saved.get("size") == stamp["size"]:
+        return True
+    return saved.get("size") == stamp["size"] and saved.get("hash") == _csv_hash(path)
+
+# ------------------------------------------------------------------
+# Файл проекта: JSON-заголовок + колонки в виде буферов numpy
+# ------------------------------------------------------------------
+def _encode_strings(values, buffers: list) -> dict:
+    """Строки → один UTF-8 буфер и смещения в символах (n + 1 значение)."""
+    texts = ["" if v is None or v != v else str(v) for v in values]
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, texts), dtype=np.int64, count=len(texts)), out=offsets[1:])
+    return {"text": _add_buffer(buffers, "".join(texts).encode("utf-8")),
+            "offsets": _add_array(buffers, offsets)}
+
+def _decode_strings(spec: dict, raw: memoryview) -> list[str]:
+    text = bytes(_buffer(raw, spec["text"])).decode("utf-8")
+    offsets = _array(raw, spec["offsets"]).tolist()
+    if len(offsets) < 1 or offsets[-1] != len(text):
+        raise ValueError("повреждённая строковая колонка")
+    return [text[a:b] for a, b in zip(offsets, offsets[1:])]
+
+def _add_buffer(buffers: list, data: bytes) -> dict:
+    start = sum(len(b) for b in buffers)
+    buffers.append(data)
+    return {"offset": start, "length": len(data)}
+
+def _add_array(buffers: list, arr: np.ndarray) -> dict:
+    arr = np.ascontiguousarray(arr)
+    spec = _add_buffer(buffers, arr.tobytes())
+    spec["dtype"] = arr.dtype.str
+    return spec
+
+def _buffer(raw: memoryview, spec: dict) -> memoryview:
+    start, length = int(spec["offset"]), int(spec["length"])
+    if start < 0 or length < 0 or start + length > len(raw):
+        raise ValueError("буфер за пределами файла")
+    return raw[start:start + length]
+
+def _array(raw: memoryview, spec: dict) -> np.ndarray:
+    dtype = np.dtype(spec["dtype"])
+    if dtype.kind not in _NUMERIC_KINDS:
+        raise ValueError(f"недопустимый тип буфера {dtype}")
+    return np.frombuffer(_buffer(raw, spec), dtype=dtype)
+
+def _write_project(path: str, df: pd.DataFrame, header: dict) -> None:
+    buffers: list[bytes] = []
+    columns = []
+    for name in df.columns:
+        col = df[name]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            spec = {"kind": "category", "codes": _add_array(buffers, col.cat.codes.to_numpy()),
+                    "categories": _encode_strings(col.cat.categories, buffers)}
+        elif col.dtype.kind in _NUMERIC_KINDS:
+            spec = {"kind": "numeric", "data": _add_array(buffers, col.to_numpy())}
+        else:
+            spec = {"kind": "str", **_encode_strings(col, buffers)}
+        columns.append({"name": str(name), **spec})
+    head = json.dumps({**header, "version": PROJECT_VERSION, "rows": len(df),
+                       "columns": columns}, ensure_ascii=False).encode("utf-8")
+
+    def _write(tmp):
+        with open(tmp, "wb") as f:
+            f.write(PROJECT_MAGIC + struct.pack("<Q", len(head)) + head)
+            for data in buffers:
+                f.write(data)
+    _atomic_write(path, _write)
+
+def _read_project(path: str) -> dict | None:
+    """Заголовок и DataFrame файла проекта; None — файла нет или он не читается."""
+    try:
+        with open(project_path(path), "rb") as f:
+            raw = f.read()
+    except OSError:
+        return None
+    prefix = len(PROJECT_MAGIC) + 8
+    if raw[:len(PROJECT_MAGIC)] != PROJECT_MAGIC or len(raw) < prefix:
+        return None
+    try:
+        (size,) = struct.unpack("<Q", raw[len(PROJECT_MAGIC):prefix])
+        header = json.loads(raw[prefix:prefix + size].decode("utf-8"))
+        if header.get("version") != PROJECT_VERSION:
+            return None
+        body = memoryview(raw)[prefix + size:]
+        rows = int(header["rows"])
+        data = {}
+        for spec in header["columns"]:
+            if spec["kind"] == "category":
+                codes = _array(body, spec["codes"])
+                values = pd.Categorical.from_codes(codes, _decode_strings(spec["categories"], body))
+            elif spec["kind"] == "numeric":
+                values = _array(body, spec["data"]).copy()
+            elif spec["kind"] == "str":
+                values = _decode_strings(spec, body)
+            else:
+                return None
+            if len(values) != rows:
+                return None
+            data[spec["name"]] = values
+    except (ValueError, KeyError, TypeError, struct.error, UnicodeDecodeError):
+        return None
+    header["df"] = pd.DataFrame(data, columns=[spec["name"] for spec in header["columns"]])
+    return header
+
+# ------------------------------------------------------------------
+# Объединение проекта с изменившимся CSV
+# ------------------------------------------------------------------
+def merge_translations(df: pd.DataFrame, project: pd.DataFrame) -> dict:
+    """
+    Переносит переводы из проекта в свежий DataFrame из CSV по ключу
+    (File, StepID), если английский текст строки не изменился.
+    Перевод проекта главнее: он сохранён пользователем, а в CSV его ещё нет.
+    Возвращает счётчики: merged — перенесено, conflicts — в CSV был другой
+    непустой перевод (заменён переводом проекта), orphaned — строки проекта
+    с переводом, которых в новом CSV нет или у них другой английский текст.
+    """
+    if "RussianTranslation" not in df.columns:
+        df["RussianTranslation"] = ""
+    if "RussianTranslation" not in project.columns:
+        return {"merged": 0, "conflicts": 0, "orphaned": 0}
+    key = ["File", "StepID"]
+    ours = project.loc[project["RussianTranslation"].astype(str) != "",
+                       key + ["EnglishText", "RussianTranslation"]].copy()
+    ours = ours.drop_duplicates(key, keep="last")
+    for col in key:
+        ours[col] = ours[col].astype(str)
+    theirs = pd.DataFrame({col: df[col].astype(str) for col in key + ["EnglishText", "RussianTranslation"]})
+    theirs["pos"] = np.arange(len(df))
+    joined = theirs.merge(ours, on=key, how="inner", suffixes=("", "_proj"))
+    same = joined[joined["EnglishText"] == joined["EnglishText_proj"]]
+    differ = same[same["RussianTranslation"] != same["RussianTranslation_proj"]]
+    col = df.columns.get_loc("RussianTranslation")
+    for pos, text in zip(differ["pos"].to_numpy(), differ["RussianTranslation_proj"]):
+        df.iat[int(pos), col] = text
+    return {"merged": len(differ),
+            "conflicts": int((differ["RussianTranslation"] != "").sum()),
+            "orphaned": len(ours) - len(same.drop_duplicates(key))}
+
+def _check_columns(columns) -> None:
+    for col in REQUIRED_COLUMNS:
+        if col not in columns:
+            raise KeyError(f"Отсутствует колонка {col}")
+
+def _compact_step_ids(df: pd.DataFrame) -> None:
+    """StepID → минимальный целый тип, если все значения — целые без ведущих нулей."""
+    steps = df["StepID"]
+    if len(steps) and steps.str.fullmatch(r"0|-?[1-9][0-9]{0,17}").all():
+        df["StepID"] = pd.to_numeric(steps, downcast="integer")
+
+def read_csv_chunked(path: str, chunk_rows: int = CHUNK_ROWS, on_chunk=None) -> pd.DataFrame | None:
+    """
+    Читает CSV порциями по chunk_rows строк с явными типами (DTYPES).
+    Обязательные колонки проверяются на первой порции (KeyError).
+    on_chunk(порция, прочитано байт, всего байт) вызывается после каждой
+    порции; если он вернул False, чтение прерывается и возвращается None.
+    Категории порций объединяются, так что File и Character остаются
+    категориальными и в итоговом DataFrame.
+    """
+    total = os.path.getsize(path)
+    chunks = []
+    with open(path, "rb") as f:
+        reader = pd.read_csv(f, keep_default_na=False, encoding="utf-8",
+                             dtype=DTYPES, chunksize=chunk_rows)
+        for chunk in reader:
+            if not chunks:
+                _check_columns(chunk.columns)
+            chunks.append(chunk)
+            if on_chunk is not None and on_chunk(chunk, f.tell(), total) is False:
+                return None
+    if not chunks:
+        df = pd.read_csv(path, keep_default_na=False, encoding="utf-8", dtype=str, nrows=0)
+        _check_columns(df.columns)
+        return df
+    for col in CATEGORICAL:
+        if col in chunks[0].columns and len(chunks) > 1:
+            cats = union_categoricals([c[col] for c in chunks]).categories
+            for c in chunks:
+                c[col] = c[col].cat.set_categories(cats)
+    df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    _compact_step_ids(df)
+    return df
+
+def load_csv(path: str, use_cache: bool = True, chunk_rows: int = CHUNK_ROWS,
+             on_chunk=None, on_merge=None) -> pd.DataFrame | None:
+    """
+    Считывает CSV в DataFrame, пустые ячейки не превращает в NaN.
+    Если рядом есть файл проекта и CSV с тех пор не менялся, читается проект —
+    без разбора CSV. Иначе CSV читается порциями (read_csv_chunked):
+      - проект был лишь кэшем (synced) или его нет — файл проекта создаётся заново;
+      - в проекте есть правки, которых нет в CSV, — они переносятся в свежий
+        DataFrame (merge_translations), on_merge(счётчики) сообщает об этом,
+        а файл проекта не перезаписывается до явного сохранения.
+    None — чтение отменено через on_chunk.
+    """
+    key = os.path.abspath(path)
+    with instrument.span("csv.load", path=os.path.basename(path)) as sp:
+        project = _read_project(path) if use_cache else None
+        if project is not None and _csv_unchanged(path, project.get("csv")):
+            if project.get("csv"):
+                _stamps[key] = project["csv"]
+            sp.update(cached=True, rows=len(project["df"]), bytes=os.path.getsize(project_path(path)))
+            return project["df"]
+        stamp = _csv_stamp(path, with_hash=True)
+        df = read_csv_chunked(path, chunk_rows, on_chunk)
+        if df is None:
+            return None
+        sp.update(cached=False, rows=len(df), bytes=stamp["size"])
+        if not use_cache:
+            return df
+        _stamps[key] = stamp
+        if project is not None and not project.get("synced", True):
+            info = merge_translations(df, project["df"])
+            if info["merged"] or info["orphaned"]:
+                if on_merge is not None:
+                    on_merge(info)
+                return df
+        _write_project(project_path(path), df, {"csv": stamp, "synced": True})
+        return df
+
+def save_project(df: pd.DataFrame, path: str) -> None:
+    """
+    Атомарно сохраняет DataFrame в файл проекта рядом с CSV path.
+    Сам CSV не трогается — его перезаписывает только save_csv().
+    В проект пишется отпечаток CSV, из которого DataFrame был загружен.
+    """
+    stamp = _stamps.get(os.path.abspath(path)) or _csv_stamp(path, with_hash=True)
+    with instrument.span("project.save", rows=len(df)) as sp:
+        _write_project(project_path(path), df, {"csv": stamp, "synced": False})
+        sp["bytes"] = os.path.getsize(project_path(path))
 
 def save_csv(df: pd.DataFrame, path: str) -> None:
-    """Сохраняет DataFrame без индекса."""
-    df.to_csv(path, index=False, encoding="utf-8")
+    """Атомарно сохраняет DataFrame без индекса; файл проекта становится копией CSV."""
+    with instrument.span("csv.save", rows=len(df)) as sp:
+        _atomic_write(path, lambda tmp: df.to_csv(tmp, index=False, encoding="utf-8"))
+        sp["bytes"] = os.path.getsize(path)
+    stamp = _csv_stamp(path, with_hash=True)
+    _stamps[os.path.abspath(path)] = stamp
+    _write_project(project_path(path), df, {"csv": stamp, "synced": True})
@@ -0,0 +1,102 @@
+import re
+import instrument
+
+# ------------------------------------------------------------------
+# Подстановка глоссария одним регулярным выражением
+# ------------------------------------------------------------------
+_WORD = re.compile(r"\w")
+
+class GlossaryEngine:
+    """
+    Термины складываются в префиксное дерево, а дерево — в одно регулярное
+    выражение: «Black Ship|Black Sea|Ship» превращается в
+    «Black S(?:hip|ea)|Ship». На каждой позиции движок re проверяет не
+    все термины подряд, а спускается по дереву, так что цена поиска почти
+    не зависит от размера глоссария. Ветви дерева пробуются раньше конца
+    термина, поэтому побеждает самый длинный термин («Black Ship» раньше
+    «Ship»). При whole_words термин не совпадает внутри слова («attack» не
+    трогает «attacked»); граница проверяется только с той стороны, где у
+    термина буква или цифра.
+    """
+    def __init__(self, glossary: dict[str, str], whole_words: bool = True):
+        self.glossary = {t: tr for t, tr in glossary.items() if t}
+        self.regex = self._compile(self.glossary, whole_words) if self.glossary else None
+
+    @classmethod
+    def _compile(cls, terms, whole_words: bool):
+        # Корни дерева: термины, начинающиеся с буквы, и все остальные —
+        # у первых при whole_words проверяется граница слева
+        word, other = {}, {}
+        for term in terms:
+            node = word if whole_words and _WORD.match(term[0]) else other
+            for ch in term:
+                node = node.setdefault(ch, {})
+            node[""] = whole_words and bool(_WORD.match(term[-1]))
+        parts = []
+        if word:
+            parts.append(r"(?<!\w)" + cls._node_pattern(word))
+        if other:
+            parts.append(cls._node_pattern(other))
+        return re.compile("|".join(parts))
+
+    @classmethod
+    def _node_pattern(cls, node: dict) -> str:
+        """
+        Выражение для поддерева: сначала продолжения (по убыванию символа —
+        порядок не важен, соседние ветви начинаются с разных символов),
+        последним — конец термина, если он здесь есть.
+        """
+        alts = [re.escape(ch) + cls._node_pattern(child)
+                for ch, child in sorted(node.items(), reverse=True) if ch]
+        if "" in node:
+            alts.append(r"(?!\w)" if node[""] else "")
+        if len(alts) == 1:
+            return alts[0]
+        return "(?:" + "|".join(alts) + ")"
+
+    def apply(self, df) -> list[int]:
+        """
+        Подставляет переводы терминов, найденных в EnglishText, в
+        RussianTranslation (пустой перевод берётся из EnglishText).
+        Поиск и замена — один проход sub по каждой строке, запись —
+        одно присваивание iloc. Возвращает позиции изменённых строк.
+        """
+        if self.regex is None or df.empty:
+            return []
+        changed, values = self.substitute(df["EnglishText"].astype(str),
+                                          df["RussianTranslation"].astype(str))
+        if changed:
+            df.iloc[changed, df.columns.get_loc("RussianTranslation")] = values
+        return changed
+
+    def substitute(self, en, ru) -> tuple[list[int], list[str]]:
+        """
+        Только вычисление: (позиции, новые переводы) по копиям колонок
+        en и ru, без записи — годится для фонового потока.
+        """
+        if self.regex is None or en.empty:
+            return [], []
+        with instrument.span("glossary", rows=len(en), terms=len(self.glossary)) as sp:
+            changed, values = self._substitute(en, ru)
+            sp["changed"] = len(changed)
+        return changed, values
+
+    def _substitute(self, en, ru) -> tuple[list[int], list[str]]:
+        # Один проход sub по каждой строке; обработчик отмечает, была ли
+        # замена, — отдельный поиск кандидатов не нужен
+        glossary, sub = self.glossary, self.regex.sub
+        hit = False
+
+        def replace(m):
+            nonlocal hit
+            hit = True
+            return glossary[m.group()]
+
+        changed, values = [], []
+        for pos, (old, text) in enumerate(zip(ru.tolist(), en.tolist())):
+            hit = False
+            new = sub(replace, old or text)
+            if hit and new != old:
+                changed.append(pos)
+                values.append(new)
+        return changed, values
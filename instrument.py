@@ -0,0 +1,184 @@
+import os, sys, json, time, atexit, threading
+from collections import deque
+
+# ------------------------------------------------------------------
+# Инструментирование горячих путей (по умолчанию выключено)
+#   R1999_PROFILE=1             — включить при запуске
+#   R1999_PROFILE_TRACE=out.json — при выходе записать Chrome-трассу
+# В GUI то же включается пунктом меню «Профилирование».
+# ------------------------------------------------------------------
+ENV_ENABLE = "R1999_PROFILE"
+ENV_TRACE = "R1999_PROFILE_TRACE"
+# Сколько последних событий хранится для панели и трассы
+MAX_EVENTS = 20000
+
+class Recorder:
+    """
+    Счётчики по операциям (вызовов, суммарное и максимальное время,
+    байты, строки, токены) и кольцевой буфер последних событий.
+    Пока enabled == False, span() и record() почти ничего не стоят.
+    Потокобезопасен: события приходят и из фоновых задач.
+    """
+    def __init__(self, enabled: bool = False, max_events: int = MAX_EVENTS):
+        self.enabled = enabled
+        self.events: deque = deque(maxlen=max_events)
+        self.totals: dict[str, dict] = {}
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.events.clear()
+            self.totals.clear()
+
+    def record(self, name: str, seconds: float, start: float | None = None, **fields) -> None:
+        """Событие длительностью seconds; числовые fields суммируются в totals."""
+        if not self.enabled:
+            return
+        if start is None:
+            start = time.perf_counter() - seconds
+        event = {"name": name, "start": start, "dur": seconds,
+                 "tid": threading.get_ident(), "args": fields}
+        with self._lock:
+            self.events.append(event)
+            total = self.totals.setdefault(name, {"count": 0, "seconds": 0.0, "max": 0.0})
+            total["count"] += 1
+            total["seconds"] += seconds
+            total["max"] = max(total["max"], seconds)
+            for key, value in fields.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    total[key] = total.get(key, 0) + value
+
+    def span(self, name: str, **fields):
+        """with recorder.span("csv.load", bytes=n) as s: ... s["rows"] = len(df)"""
+        return _Span(self, name, fields) if self.enabled else _NOOP
+
+    def stats(self) -> dict[str, dict]:
+        with self._lock:
+            return {name: dict(total) for name, total in self.totals.items()}
+
+    def recent(self, n: int = 200) -> list[dict]:
+        with self._lock:
+            return list(self.events)[-n:]
+
+    # --- выгрузка --------------------------------------------------------
+    def chrome_trace(self) -> dict:
+        """События в формате Chrome trace (chrome://tracing, Perfetto)."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+        return {"traceEvents": [
+            {"name": e["name"], "ph": "X", "pid": pid, "tid": e["tid"],
+             "ts": (e["start"] - self.origin) * 1e6, "dur": e["dur"] * 1e6, "args": e["args"]}
+            for e in events]}
+
+    def save_trace(self, path: str) -> None:
+        _save_json(path, self.chrome_trace())
+
+    def save_json(self, path: str) -> None:
+        """Итоги по операциям и последние события (время — от старта записи)."""
+        events = [{**e, "start": e["start"] - self.origin} for e in self.recent(len(self.events))]
+        _save_json(path, {"totals": self.stats(), "events": events})
+
+class _Span:
+    __slots__ = ("recorder", "name", "fields", "start")
+
+    def __init__(self, recorder: Recorder, name: str, fields: dict):
+        self.recorder = recorder
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self) -> dict:
+        self.start = time.perf_counter()
+        return self.fields
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.fields["error"] = exc_type.__name__
+        self.recorder.record(self.name, time.perf_counter() - self.start, self.start, **self.fields)
+        return False
+
+class _NoopSpan:
+    """Заглушка span() при выключенной записи: поля принимаются и отбрасываются."""
+    def __enter__(self) -> dict:
+        return {}
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP = _NoopSpan()
+
+def _save_json(path: str, data) -> None:
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+# Общий регистратор процесса
+RECORDER = Recorder(enabled=os.getenv(ENV_ENABLE, "") not in ("", "0"))
+span = RECORDER.span
+record = RECORDER.record
+
+if os.getenv(ENV_TRACE):
+    RECORDER.enabled = True
+    atexit.register(lambda: RECORDER.save_trace(os.environ[ENV_TRACE]))
+
+# ------------------------------------------------------------------
+# Сэмплирующий профайлер по запросу
+# ------------------------------------------------------------------
+class SamplingProfiler:
+    """
+    Раз в interval секунд снимает стеки всех потоков (sys._current_frames)
+    и считает одинаковые стеки. Результат — «свёрнутые» стеки
+    (func;func;func N), которые читают flamegraph.pl, speedscope и др.
+    Код не замедляется, кроме самого снятия стеков.
+    """
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: dict[str, int] = {}
+        self.count = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self.samples.clear()
+        self.count = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> dict[str, int]:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        return self.samples
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for t in threading.enumerate():
+                names[t.ident] = t.name
+            for tid, frame in sys._current_frames().items():
+                if tid == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                    frame = frame.f_back
+                stack.append(names.get(tid, str(tid)))
+                key = ";".join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+            self.count += 1
+
+    def save_collapsed(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in sorted(self.samples.items(), key=lambda kv: -kv[1]):
+                f.write(f"{stack} {n}\n")
@@ -0,0 +1,90 @@
+import re
+import numpy as np
+
+# ───────────────────────────────────────────────────────────────
+# Парсер тегов / плейсхолдеров
+TAG_REGEX = re.compile(r'(<[^>]+>|%\w+|\{[0-9]+\}|\\n|#\w+:)', re.IGNORECASE)
+def extract_tokens(text: str) -> list[str]:
+    return TAG_REGEX.findall(text or "")
+
+# Статус сцены
+def status_from_counts(done: int, rows: int) -> str:
+    """Статус сцены по числу переведённых строк."""
+    if done == 0: return "empty"
+    if done == rows: return "done"
+    return "partial"
+
+# ------------------------------------------------------------------
+# Индекс строк: сцена → позиции её строк, строка → сцена и место в ней
+# ------------------------------------------------------------------
+class RowIndex:
+    """
+    Строится один раз на DataFrame (один groupby), после чего сцена строки
+    и строки сцены находятся без прохода по файлу. Колонка File в редакторе
+    не меняется, поэтому индекс остаётся валидным, пока не подменён сам
+    DataFrame (тогда — rebuild()).
+    """
+    def __init__(self, df):
+        self.rebuild(df)
+
+    def rebuild(self, df) -> None:
+        n = len(df)
+        self.names: list[str] = []
+        self.rows: list[np.ndarray] = []
+        self.scene_of = np.empty(n, dtype=np.int32)
+        self.offset_of = np.empty(n, dtype=np.int32)
+        groups = df.groupby("File", sort=False, observed=True).indices
+        for i, (name, rows) in enumerate(groups.items()):
+            self.names.append(str(name))
+            self.rows.append(rows)
+            self.scene_of[rows] = i
+            self.offset_of[rows] = np.arange(len(rows), dtype=np.int32)
+        self.by_name = {name: i for i, name in enumerate(self.names)}
+
+# ------------------------------------------------------------------
+# Прогресс перевода по сценам
+# ------------------------------------------------------------------
+class ProgressTracker:
+    """
+    Счётчики по сценам: строк, переведено, символов RU. Считаются одним
+    проходом (bincount по номеру сцены из RowIndex) и дальше
+    поддерживаются за O(1) на каждую изменённую строку через update().
+    """
+    def __init__(self, df, row_index: RowIndex):
+        self.row_index = row_index
+        ru = df["RussianTranslation"].astype(str)
+        # Массивы меняются в update(), а при copy-on-write to_numpy() может
+        # вернуть вид только для чтения — берём собственные копии
+        self._row_done = (ru != "").to_numpy(copy=True)
+        self._row_chars = ru.str.len().to_numpy(dtype=np.int64, copy=True)
+        n_scenes = len(row_index.names)
+        scene_of = row_index.scene_of
+        self.rows = np.bincount(scene_of, minlength=n_scenes).astype(np.int64)
+        self.done = np.bincount(scene_of, weights=self._row_done, minlength=n_scenes).astype(np.int64)
+        self.chars = np.bincount(scene_of, weights=self._row_chars, minlength=n_scenes).astype(np.int64)
+
+    def update(self, pos: int, text: str) -> bool:
+        """
+        Учитывает новый перевод строки pos. Возвращает True, если у строки
+        сменился признак «переведено» (значит, мог смениться статус сцены).
+        """
+        scene = self.row_index.scene_of[pos]
+        is_done = text != ""
+        was_done = bool(self._row_done[pos])
+        self.chars[scene] += len(text) - self._row_chars[pos]
+        self._row_chars[pos] = len(text)
+        if is_done != was_done:
+            self.done[scene] += 1 if is_done else -1
+            self._row_done[pos] = is_done
+            return True
+        return False
+
+    def status(self, scene: int) -> str:
+        return status_from_counts(int(self.done[scene]), int(self.rows[scene]))
+
+    def scene_stats(self, scene: int) -> tuple[int, int, int]:
+        """(строк, переведено, символов RU) для сцены номер scene."""
+        return int(self.rows[scene]), int(self.done[scene]), int(self.chars[scene])
+
+    def totals(self) -> tuple[int, int, int]:
+        return int(self.rows.sum()), int(self.done.sum()), int(self.chars.sum())
@@ -1,35 +1,40 @@
-import sys, os, re, json
-import openai
+import sys, os, re, json, time
+# Замер запуска: R1999_STARTUP_TIMING=1 (или =exit — выйти после отчёта)
+STARTUP_TIMING = os.getenv("R1999_STARTUP_TIMING", "")
+_startup_marks: list[tuple[str, float]] = [("старт", time.perf_counter())]
+
+def startup_mark(label: str) -> None:
+    """Отметка этапа запуска (время — от предыдущей отметки)."""
+    _startup_marks.append((label, time.perf_counter()))
+
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QFileDialog, QMessageBox,
     QTreeWidgetItem, QDialog, QTableWidget, QTableWidgetItem,
-    QHeaderView, QVBoxLayout, QTreeWidget, QHBoxLayout, QPushButton
+    QHeaderView, QVBoxLayout, QTreeWidget, QHBoxLayout, QPushButton,
+    QProgressDialog, QComboBox, QDockWidget, QFormLayout, QSpinBox, QDialogButtonBox
 )
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QColor, QBrush
+from PyQt6.QtCore import Qt, QModelIndex, QTimer
+from PyQt6.QtGui import QColor
 from ui_main import Ui_MainWindow
-import file_loader
+startup_mark("импорт PyQt6 и ui_main")
+from localization import extract_tokens, RowIndex, ProgressTracker
+from dialogue_model import DialogueModel, HideDoneProxy
+from search_index import SearchIndex
+from glossary_engine import GlossaryEngine
+from tag_qa import TagQA
+import translator
+from translation_memory import TranslationMemory
 import dat_decrypt
-import asset_extractor
-
-# ───────────────────────────────────────────────────────────────
-# Парсер тегов / плейсхолдеров
-TAG_REGEX = re.compile(r'(<[^>]+>|%\w+|\{[0-9]+\}|\\n|#\w+:)', re.IGNORECASE)
-def extract_tokens(text: str) -> list[str]:
-    return TAG_REGEX.findall(text or "")
-
-# Статус сцены
-COLOR_MAP = {"empty": "#FFCCCC", "partial": "#FFF4CC", "done": "#CCFFCC"}
-def scene_status(df_slice) -> str:
-    ru = df_slice["RussianTranslation"].astype(str)
-    if (ru == "").all(): return "empty"
-    if (ru != "").all(): return "done"
-    return "partial"
-
-# OpenAI клиент (читает OPENAI_API_KEY из окружения)
-client = openai.OpenAI(
-    api_key=os.getenv('OPENAI_API_KEY')
-)
+from tasks import TaskRunner, TaskBar
+import instrument
+startup_mark("импорт модулей приложения (numpy)")
+# pandas (file_loader), UnityPy и PIL (asset_extractor) и openai
+# импортируются при первом использовании или фоном после показа окна;
+# клиент OpenAI создаётся при первом запросе (translator.default_client)
+PRELOAD_MODULES = ("file_loader", "asset_extractor")
+HEAVY_MODULES = ("pandas", "UnityPy", "PIL", "openai")
+# Подсказка памяти переводов ищется, когда курсор задержался на строке
+TM_SUGGEST_DELAY_MS = 250
 
 class MainApp(QMainWindow):
     def __init__(self):
@@ -40,20 +45,55 @@ class MainApp(QMainWindow):
         # Данные
         self.df = None
         self.current_path = ""
+        # Модель реплик и фильтр «скрывать завершённые»
+        self.model: DialogueModel | None = None
+        self.row_index: RowIndex | None = None
+        self.progress: ProgressTracker | None = None
+        self.qa: TagQA | None = None
+        self.proxy = HideDoneProxy(self)
+        self.ui.tree.setModel(self.proxy)
         # Поиск
-        self.flat_items: list[QTreeWidgetItem] = []
-        self.search_pattern = ""
+        self.search_index: SearchIndex | None = None
+        self.search_key = None
+        self.search_hits: list[int] = []
         self.search_idx = -1
         # Глоссарий
         self.glossary: dict[str,str] = {}
+        # Текущий авто-перевод (None — не выполняется)
+        self.translator: translator.Translator | None = None
+        self.translate_df = None    # DataFrame, в который пишет текущий перевод
+        self.translate_total = self.translate_done = 0
+        # Память переводов: точные совпадения без обращения к API
+        self.tm = TranslationMemory()
+        self.tm_hits = 0
+        # Нечёткий поиск подсказки — в своём потоке и без TaskBar:
+        # быстрое листание строк не должно ни тормозить GUI, ни мигать задачами
+        self.tm_runner = TaskRunner(self, max_threads=1)
+        self.tm_task = None
+        self.tm_pos = None          # строка, для которой нужна подсказка
+        self.tm_timer = QTimer(self)
+        self.tm_timer.setSingleShot(True)
+        self.tm_timer.setInterval(TM_SUGGEST_DELAY_MS)
+        self.tm_timer.timeout.connect(self.lookup_tm_suggestion)
+        self.translate_rejected: list[int] = []
+        # Последний открытый бандл (путь к _DEC или байты в памяти)
+        self.last_bundle = None
+        self.last_bundle_name = ""
+        self.last_asset_id = None   # (CAB, path_id) ассета, выбранного в диалоге .dat
+        # Память на воркеры экспорта и предел очереди записи, МБ
+        # (0 — значения asset_extractor по умолчанию)
+        self.export_budget_mb = 0
+        self.export_cap_mb = 0
+        # Фоновые задачи (дешифровка, листинг, экспорт, перевод, глоссарий)
+        self.tasks = TaskRunner(self)
+        self.statusBar().addPermanentWidget(TaskBar(self.tasks))
 
         # Сигналы
         self.ui.btnOpen.clicked.connect(self.open_csv)
-        self.ui.btnSave.clicked.connect(self.save_csv)
+        self.ui.btnSave.clicked.connect(self.save_project)
         self.ui.btnStats.clicked.connect(self.show_stats)
         self.ui.btnAutoTranslate.clicked.connect(self.auto_translate_scene)
-        self.ui.tree.itemChanged.connect(self.mark_edited)
-        self.ui.chkHideDone.stateChanged.connect(self.populate_tree)
+        self.ui.chkHideDone.stateChanged.connect(self.proxy.set_hide_done)
         self.ui.btnFind.clicked.connect(self.search_next)
         self.ui.txtSearch.returnPressed.connect(self.search_next)
 
@@ -61,6 +101,38 @@ class MainApp(QMainWindow):
         self.ui.btnExportAllAssets.clicked.connect(self.export_all_assets)
         self.ui.btnExportAsset.clicked.connect(self.export_selected_asset)
 
+        # Меню «Инструменты»
+        menu_tools = self.ui.menubar.addMenu("Инструменты")
+        menu_tools.addAction("Экспорт CSV…").triggered.connect(self.save_csv)
+        menu_tools.addSeparator()
+        menu_tools.addAction("Пакетная дешифровка .dat…").triggered.connect(self.batch_decrypt)
+        self.actWriteDec = menu_tools.addAction("Сохранять _DEC.dat на диск")
+        self.actWriteDec.setCheckable(True)
+        menu_tools.addAction("Память экспорта ассетов…").triggered.connect(self.edit_export_memory)
+        menu_tools.addSeparator()
+        menu_tools.addAction("Авто-перевод всего файла").triggered.connect(self.auto_translate_file)
+        menu_tools.addAction("Остановить авто-перевод").triggered.connect(self.cancel_translation)
+        menu_tools.addAction("Отменить все задачи").triggered.connect(self.tasks.cancel_all)
+        menu_tools.addSeparator()
+        menu_tools.addAction("Проверить теги во всём файле").triggered.connect(self.check_tags)
+
+        # Меню «Профилирование» (запись включается и через R1999_PROFILE=1)
+        menu_prof = self.ui.menubar.addMenu("Профилирование")
+        self.actProfile = menu_prof.addAction("Инструментирование")
+        self.actProfile.setCheckable(True)
+        self.actProfile.setChecked(instrument.RECORDER.enabled)
+        self.actProfile.toggled.connect(self.toggle_instrumentation)
+        menu_prof.addAction("Панель профилирования").triggered.connect(self.show_profile_panel)
+        menu_prof.addAction("Сохранить Chrome-трассу…").triggered.connect(self.save_profile_trace)
+        menu_prof.addAction("Сохранить JSON…").triggered.connect(self.save_profile_json)
+        menu_prof.addAction("Сбросить").triggered.connect(instrument.RECORDER.reset)
+        menu_prof.addSeparator()
+        self.actSampler = menu_prof.addAction("Сэмплирующий профайлер")
+        self.actSampler.setCheckable(True)
+        self.actSampler.toggled.connect(self.toggle_sampler)
+        self.sampler = instrument.SamplingProfiler()
+        self.profile_dock = None
+
         # Глоссарий UI
         self.ui.btnImportGlossary.clicked.connect(self.import_glossary)
         self.ui.btnExportGlossary.clicked.connect(self.export_glossary)
@@ -68,164 +140,404 @@ class MainApp(QMainWindow):
         self.ui.btnRemoveTerm.clicked.connect(self.remove_glossary_term)
         self.ui.btnApplyGlossary.clicked.connect(self.apply_glossary)
 
+        # Панель поиска «Найти все» в нижнем доке
+        self.setup_search_panel()
+        # Подсказка из памяти переводов для текущей строки
+        self.ui.tree.selectionModel().currentChanged.connect(self.show_tm_suggestion)
+
         # Загрузка и отображение глоссария
         self.load_glossary()
         self.populate_glossary()
 
+        # Тяжёлые модули догружаются фоном, когда окно уже на экране
+        QTimer.singleShot(0, self.preload_modules)
+
+    # Фоновый импорт pandas / UnityPy; ошибки импорта всплывут при первом использовании
+    def preload_modules(self):
+        if STARTUP_TIMING:
+            startup_mark("окно показано")
+            self.report_startup()
+
+        def _run(task):
+            costs = {}
+            for name in PRELOAD_MODULES:
+                task.check()
+                t0 = time.perf_counter()
+                try:
+                    __import__(name)
+                except ImportError as e:
+                    costs[name] = str(e)
+                    continue
+                costs[name] = time.perf_counter() - t0
+            return costs
+
+        def _done(costs):
+            if not STARTUP_TIMING:
+                return
+            for name, cost in costs.items():
+                value = f"{cost * 1000:.0f} мс" if isinstance(cost, float) else f"ошибка: {cost}"
+                print(f"[startup] фоновый импорт {name}: {value}", file=sys.stderr)
+            if STARTUP_TIMING == "exit":
+                QApplication.quit()
+
+        self.tasks.submit("Загрузка модулей", _run, on_finished=_done)
+
+    # Отчёт о запуске в stderr: этапы и какие тяжёлые модули уже загружены
+    def report_startup(self):
+        prev = _startup_marks[0][1]
+        for label, t in _startup_marks[1:]:
+            print(f"[startup] {label}: {(t - prev) * 1000:.0f} мс", file=sys.stderr)
+            prev = t
+        total = _startup_marks[-1][1] - _startup_marks[0][1]
+        print(f"[startup] всего до окна: {total * 1000:.0f} мс", file=sys.stderr)
+        loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+        print(f"[startup] загружены до окна: {', '.join(loaded) or 'нет'}", file=sys.stderr)
+
+    # Нижний док: режим и колонки поиска, «Найти все», таблица совпадений
+    MAX_RESULTS = 5000
+
+    def setup_search_panel(self):
+        panel = self.ui.dockWidgetContents_4
+        self.cmbSearchMode = QComboBox()
+        self.cmbSearchMode.addItems(["Подстрока", "Слово целиком", "Регулярное выражение"])
+        self.cmbSearchCol = QComboBox()
+        self.cmbSearchCol.addItems(["EN + RU", "EnglishText", "RussianTranslation"])
+        btnFindAll = QPushButton("Найти все")
+        btnFindAll.clicked.connect(self.find_all)
+        self.tblResults = QTableWidget(0, 4)
+        self.tblResults.setHorizontalHeaderLabels(["File", "StepID", "EnglishText", "RussianTranslation"])
+        self.tblResults.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.tblResults.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.tblResults.itemDoubleClicked.connect(self._result_activated)
+        top = QHBoxLayout()
+        top.addWidget(self.cmbSearchMode)
+        top.addWidget(self.cmbSearchCol)
+        top.addWidget(btnFindAll)
+        top.addStretch(1)
+        lay = QVBoxLayout(panel)
+        lay.addLayout(top)
+        lay.addWidget(self.tblResults)
+
     # Открыть CSV
     def open_csv(self):
         path, _ = QFileDialog.getOpenFileName(self, "Открыть CSV", "", "CSV files (*.csv)")
         if not path:
             return
+        prev = (self.df, self.current_path)
+        dlg = QProgressDialog("Чтение CSV…", "Отмена", 0, 1000, self)
+        dlg.setWindowModality(Qt.WindowModality.WindowModal)
+        dlg.setMinimumDuration(300)
+        preview = [False]
+        merged = []
+
+        # Порции приходят по мере разбора; первые сцены показываем сразу
+        def _on_chunk(chunk, done, total):
+            if not preview[0] and done < total:
+                preview[0] = True
+                self.set_dataframe(chunk.copy(), path)
+            dlg.setValue(min(999, done * 1000 // max(total, 1)))
+            QApplication.processEvents()
+            return not dlg.wasCanceled()
+
         try:
-            self.df = file_loader.load_csv(path)
-            # Проверка столбцов
-            for col in ["File","StepID","Character","EnglishText"]:
-                if col not in self.df.columns:
-                    raise KeyError(f"Отсутствует колонка {col}")
-            if "RussianTranslation" not in self.df.columns:
-                self.df["RussianTranslation"] = ""
+            import file_loader
+            df = file_loader.load_csv(path, on_chunk=_on_chunk, on_merge=merged.append)
         except Exception as e:
+            df = None
             QMessageBox.critical(self, "Ошибка чтения", str(e))
+        dlg.close()
+        if df is None:
+            if preview[0]:
+                self.set_dataframe(*prev)
             return
+        self.set_dataframe(df, path)
+        if merged:
+            self._warn_project_merged(merged[0])
+
+    # CSV изменился после «Сохранить проект»: правки перенесены в новый CSV
+    def _warn_project_merged(self, info: dict):
+        text = (f"CSV изменился после последнего сохранения проекта.\n"
+                f"Переводов из проекта перенесено: {info['merged']}")
+        if info["conflicts"]:
+            text += f", из них заменили другой перевод в CSV: {info['conflicts']}"
+        if info["orphaned"]:
+            text += (f".\nНе перенесено (строки удалены или изменился английский текст): {info['orphaned']}."
+                     "\nОни остаются в файле проекта, пока проект не будет сохранён снова")
+        QMessageBox.warning(self, "Проект и CSV", text + ".")
+
+    # Подменить DataFrame: индексы, счётчики, проверка тегов, дерево
+    def set_dataframe(self, df, path: str):
+        self.df = df
         self.current_path = path
+        if df is None:
+            self.model = None
+            self.proxy.setSourceModel(None)
+            return
+        if "RussianTranslation" not in df.columns:
+            df["RussianTranslation"] = ""
+        self.row_index = RowIndex(df)
+        self.progress = ProgressTracker(df, self.row_index)
+        self.qa = TagQA(df)
         self.populate_tree()
 
-    # Заполнить дерево
+    # Заполнить дерево: модель читает DataFrame напрямую и подгружается лениво
     def populate_tree(self):
         if self.df is None: return
-        tree = self.ui.tree
-        tree.blockSignals(True)
-        tree.clear()
-
-        headers = ["File","StepID","Character","EnglishText","RussianTranslation"]
-        tree.setColumnCount(len(headers))
-        tree.setHeaderLabels(headers)
-
-        hide_done = self.ui.chkHideDone.isChecked()
-        self.flat_items.clear()
-
-        for file_name, group in self.df.groupby("File", sort=False):
-            status = scene_status(group)
-            if hide_done and status == "done":
-                continue
-            # Корневой узел сцены
-            root = QTreeWidgetItem(tree)
-            root.setText(0, file_name)
-            root.setFirstColumnSpanned(True)
-            root.setExpanded(False)
-            root.setBackground(0, QBrush(QColor(COLOR_MAP[status])))
-
-            # Дочерние реплики
-            for idx, rec in group.iterrows():
-                child = QTreeWidgetItem(root)
-                child.setText(1, str(rec["StepID"]))
-                child.setText(2, rec["Character"])
-                child.setText(3, rec["EnglishText"])
-                child.setText(4, rec["RussianTranslation"])
-                child.setFlags(child.flags() | Qt.ItemFlag.ItemIsEditable)
-                # Подсветка тегов
-                if extract_tokens(rec["EnglishText"]):
-                    hl = QBrush(QColor("#FFFACD"))
-                    child.setBackground(3, hl)
-                    child.setBackground(4, hl)
-                self.flat_items.append(child)
-
-        tree.blockSignals(False)
-        tree.expandToDepth(0)
+        with instrument.span("tree.populate", rows=len(self.df)):
+            self._populate_tree()
+
+    def _populate_tree(self):
+        self.model = DialogueModel(self.df, self.row_index, self.progress, self, qa=self.qa)
+        self.model.validator = self.mark_edited
+        self.proxy.setSourceModel(self.model)
+        self.proxy.set_hide_done(self.ui.chkHideDone.isChecked())
+        self.model.dataChanged.connect(self._translations_changed)
+        self.search_index = SearchIndex(self.df)
+        self.search_key = None
         self.search_idx = -1
 
-    # Обработка правок
-    def mark_edited(self, item, column):
-        if item.parent() is None:
+    # Проверка правки перевода (вызывается моделью перед записью)
+    def mark_edited(self, pos: int, new: str) -> bool:
+        orig = self.df["EnglishText"].iat[pos]
+        with instrument.span("edit.check", chars=len(new)) as s:
+            issues = self.qa.check(pos, new)
+            s["issues"] = len(issues)
+        if issues:
+            QMessageBox.warning(self, "Ошибка", "Теги не совпадают: " + " ".join(extract_tokens(orig))
+                                + "\n" + "\n".join(issues))
+            return False
+        self.tm.add(orig, new)
+        return True
+
+    # Нечёткое совпадение из памяти переводов — в строку состояния.
+    # Поиск откладывается на TM_SUGGEST_DELAY_MS (каждый переход перезапускает
+    # таймер) и идёт в фоне; ответ для уже покинутой строки отбрасывается
+    def show_tm_suggestion(self, current: QModelIndex, _prev=None):
+        self.tm_pos = None
+        if self.model is None or not current.isValid():
+            self.tm_timer.stop()
             return
-        file_name = item.parent().text(0)
-        step_id = item.text(1)
-        mask = (self.df["File"] == file_name) & (self.df["StepID"].astype(str) == step_id)
-
-        # Откат изменения негружаемых колонок
-        if column != 4:
-            orig_cols = ["StepID", "Character", "EnglishText"]
-            value = self.df.loc[mask, orig_cols[column-1]].values[0]
-            item.setText(column, str(value))
+        pos = self.model.position(self.proxy.mapToSource(current))
+        if pos is None or self.df["RussianTranslation"].iat[pos] != "":
+            self.tm_timer.stop()
             return
+        self.tm_pos = pos
+        self.tm_timer.start()
 
-        # Проверка тегов
-        orig = item.text(3)
-        new = item.text(4)
-        if extract_tokens(orig) != extract_tokens(new):
-            QMessageBox.warning(self, "Ошибка", "Теги не совпадают: " + " ".join(extract_tokens(orig)))
-            item.setText(4, self.df.loc[mask, "RussianTranslation"].values[0])
+    def lookup_tm_suggestion(self):
+        if self.tm_pos is None:
             return
-
-        # Сохранение перевода
-        self.df.loc[mask, "RussianTranslation"] = new
-        # Обновление цвета сцены
-        parent = item.parent()
-        status = scene_status(self.df[self.df["File"] == file_name])
-        parent.setBackground(0, QBrush(QColor(COLOR_MAP[status])))
-        if status == "done" and self.ui.chkHideDone.isChecked():
-            parent.setHidden(True)
+        # Не начатый поиск для прежней строки больше не нужен
+        if self.tm_task is not None and self.tm_task.state == "queued":
+            self.tm_runner.cancel(self.tm_task)
+        text = str(self.df["EnglishText"].iat[self.tm_pos])
+        self.tm_task = self.tm_runner.submit(
+            "Память переводов", lambda task, pos, text: (pos, text, self.tm.fuzzy(text)),
+            self.tm_pos, text, on_finished=self.show_tm_match)
+
+    def show_tm_match(self, result):
+        pos, text, match = result
+        # Пока искали, курсор ушёл или загрузили другой файл
+        if match is None or pos != self.tm_pos or self.df is None or pos >= len(self.df) \
+                or str(self.df["EnglishText"].iat[pos]) != text:
+            return
+        score, _src, tgt = match
+        self.statusBar().showMessage(f"Память переводов {score:.0%}: {tgt}", 15000)
 
     # Авто-перевод сцены через OpenAI
     def auto_translate_scene(self):
-        sel = self.ui.tree.currentItem()
-        if sel is None:
+        sel = self.ui.tree.currentIndex()
+        scene = self.model.scene_rows(self.proxy.mapToSource(sel)) if self.model else None
+        if scene is None:
             QMessageBox.information(self, "Авто-перевод", "Выберите сцену или строку.")
             return
-        root = sel.parent() if sel.parent() else sel
-        file_name = root.text(0)
-        group = self.df[self.df["File"] == file_name]
-        if group.empty:
+        file_name, rows = scene
+        if len(rows) == 0:
             QMessageBox.information(self, "Авто-перевод", "Нет строк для перевода.")
             return
-        lines = group["EnglishText"].tolist()
-        prompt = "Переведи на русский, сохрани теги. Построчно:\n" + "\n".join(lines)
-        try:
-            resp = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
-            out = resp.choices[0].message.content.strip().splitlines()
-            if len(out) != len(lines):
-                QMessageBox.warning(self, "Авто-перевод", "Неверное число строк.")
-                return
-            for i, (idx, _) in enumerate(group.iterrows()):
-                self.df.at[idx, "RussianTranslation"] = out[i]
-                child = root.child(i)
-                child.setText(4, out[i])
-            status = scene_status(group)
-            root.setBackground(0, QBrush(QColor(COLOR_MAP[status])))
-        except Exception as e:
-            QMessageBox.critical(self, "Авто-перевод", str(e))
+        self.start_translation([int(p) for p in rows])
 
-    # Поиск по репликам
-    def search_next(self):
-        pattern = self.ui.txtSearch.text().strip().lower()
-        if not pattern:
+    # Авто-перевод всех непереведённых строк файла
+    def auto_translate_file(self):
+        if self.df is None:
+            QMessageBox.information(self, "Авто-перевод", "Откройте CSV.")
+            return
+        empty = (self.df["RussianTranslation"].astype(str) == "").to_numpy()
+        rows = [int(p) for p in self.model.order if empty[p]]
+        if not rows:
+            QMessageBox.information(self, "Авто-перевод", "Нет строк для перевода.")
+            return
+        self.start_translation(rows)
+
+    # Запуск перевода в рабочем потоке; результаты приходят сигналами
+    def start_translation(self, rows: list[int]):
+        if self.translator is not None:
+            QMessageBox.information(self, "Авто-перевод", "Перевод уже выполняется.")
+            return
+        en = self.df["EnglishText"]
+        items = [(pos, str(en.iat[pos])) for pos in rows]
+        self.translate_total = len(items)
+        # Точные совпадения из памяти переводов — сразу, без API
+        hits, items = self.tm.prefill(items)
+        for pos, text in hits.items():
+            self.model.set_translation(pos, text)
+        self.tm_hits = self.translate_done = len(hits)
+        self.translate_rejected = []
+        if not items:
+            self.statusBar().showMessage(
+                f"Авто-перевод: {len(hits)}/{self.translate_total} из памяти переводов", 10000)
             return
-        if pattern != self.search_pattern:
-            self.search_pattern = pattern
+        self.translator = tr = translator.Translator()
+        self.translate_df = self.df
+        total, sent = self.translate_total, [len(hits)]
+
+        def _run(task):
+            def _batch(got):
+                sent[0] += len(got)
+                task.emit_partial(got)
+                task.report(sent[0], total, f"{sent[0]}/{total}")
+            return tr.translate(items, on_batch=_batch)
+
+        self.ui.btnAutoTranslate.setEnabled(False)
+        self.tasks.submit("Авто-перевод", _run, on_partial=self._translation_batch,
+                          on_finished=self._translation_finished,
+                          on_failed=self._translation_failed, on_cancel=tr.cancel)
+
+    def _translation_batch(self, got: dict):
+        # Файл переоткрыт во время перевода — позиции относятся к старому DataFrame
+        if self.df is not self.translate_df:
+            return
+        en = self.df["EnglishText"]
+        # Переводы с испорченными тегами не записываются
+        ok = {}
+        for pos, text in got.items():
+            if self.qa.check(pos, text):
+                self.translate_rejected.append(pos)
+            else:
+                ok[pos] = text
+        for pos, text in ok.items():
+            self.model.set_translation(pos, text)
+        self.tm.add_many((str(en.iat[pos]), text) for pos, text in ok.items())
+        self.translate_done += len(got)
+
+    def _translation_finished(self, result: tuple[dict, list]):
+        done, failed = result
+        tr, self.translator = self.translator, None
+        self.ui.btnAutoTranslate.setEnabled(True)
+        usage = tr.usage
+        tm = self.tm.stats()
+        self.statusBar().showMessage(
+            f"Авто-перевод: {len(done) - len(self.translate_rejected) + self.tm_hits}/{self.translate_total}, "
+            f"из памяти {self.tm_hits}, запросов {usage['requests']}, "
+            f"токенов {usage['prompt_tokens'] + usage['completion_tokens']}; "
+            f"память: попаданий {tm['hit_rate']:.0%}, сэкономлено ≈{tm['tokens_saved']} токенов", 10000)
+        if failed:
+            err = f"\n{tr.last_error}" if tr.last_error else ""
+            QMessageBox.warning(self, "Авто-перевод", f"Не удалось перевести строк: {len(failed)}.{err}")
+        if self.translate_rejected:
+            self.show_results(sorted(self.translate_rejected),
+                              f"Отклонено авто-переводов с ошибками тегов: {len(self.translate_rejected)}")
+
+    def _translation_failed(self, e: Exception):
+        self.translator = None
+        self.ui.btnAutoTranslate.setEnabled(True)
+        self._task_failed(e)
+
+    def cancel_translation(self):
+        if self.translator is not None:
+            self.translator.cancel()
+
+    # Ошибка фоновой задачи
+    def _task_failed(self, e: Exception):
+        QMessageBox.critical(self, "Ошибка", str(e))
+
+    # Поиск по репликам через SearchIndex (совпадения в порядке отображения)
+    def _search_hits(self) -> list[int]:
+        pattern = self.ui.txtSearch.text().strip()
+        modes = ["substring", "word", "regex"]
+        cols = [None, ("EnglishText",), ("RussianTranslation",)]
+        key = (pattern, self.cmbSearchMode.currentIndex(), self.cmbSearchCol.currentIndex())
+        if key != self.search_key:
+            hits = self.search_index.search(pattern, modes[key[1]], cols[key[2]])
+            rank = self.model.display_rank
+            self.search_hits = sorted(hits, key=rank.__getitem__)
+            self.search_key = key
             self.search_idx = -1
-        total = len(self.flat_items)
-        if total == 0:
+        return self.search_hits
+
+    def search_next(self):
+        if not self.ui.txtSearch.text().strip():
+            return
+        if self.model is None or len(self.model.order) == 0:
             QMessageBox.information(self, "Поиск", "Нет данных.")
             return
-        start = (self.search_idx + 1) % total
-        idx = start
-        while True:
-            item = self.flat_items[idx]
-            if pattern in (item.text(3) + " " + item.text(4)).lower():
-                self.search_idx = idx
-                item.parent().setExpanded(True)
-                self.ui.tree.setCurrentItem(item)
-                self.ui.tree.scrollToItem(item)
-                return
-            idx = (idx + 1) % total
-            if idx == start:
-                break
-        QMessageBox.information(self, "Поиск", "Совпадений нет.")
+        try:
+            hits = self._search_hits()
+        except re.error as e:
+            QMessageBox.warning(self, "Поиск", f"Ошибка в выражении: {e}")
+            return
+        if not hits:
+            QMessageBox.information(self, "Поиск", "Совпадений нет.")
+            return
+        self.search_idx = (self.search_idx + 1) % len(hits)
+        self.select_position(hits[self.search_idx])
+
+    # «Найти все»: список совпадений в нижней панели
+    def find_all(self):
+        if self.model is None or not self.ui.txtSearch.text().strip():
+            return
+        try:
+            hits = self._search_hits()
+        except re.error as e:
+            QMessageBox.warning(self, "Поиск", f"Ошибка в выражении: {e}")
+            return
+        self.show_results(hits, f"Найдено: {len(hits)}")
+
+    # Заполнить таблицу нижнего дока строками DataFrame (подсказка — ошибки тегов)
+    def show_results(self, positions: list[int], title: str):
+        table = self.tblResults
+        shown = positions[:self.MAX_RESULTS]
+        table.setRowCount(len(shown))
+        cols = ["File", "StepID", "EnglishText", "RussianTranslation"]
+        for r, pos in enumerate(shown):
+            issues = "\n".join(self.qa.issues.get(pos, ())) if self.qa else ""
+            for c, col in enumerate(cols):
+                item = QTableWidgetItem(str(self.df[col].iat[pos]))
+                item.setData(Qt.ItemDataRole.UserRole, pos)
+                if issues:
+                    item.setToolTip(issues)
+                table.setItem(r, c, item)
+        more = f" (показаны первые {len(shown)})" if len(positions) > len(shown) else ""
+        self.ui.dockWidget.setWindowTitle(f"{title}{more}")
+
+    # Проверка тегов во всём файле: все строки с расхождениями — в нижний док
+    def check_tags(self):
+        if self.qa is None:
+            QMessageBox.information(self, "Проверка тегов", "Откройте CSV.")
+            return
+        bad = [pos for pos, _ in self.qa.report()]
+        self.show_results(bad, f"Ошибки тегов: {len(bad)}")
+        if not bad:
+            self.statusBar().showMessage("Ошибок тегов не найдено", 5000)
+
+    def _result_activated(self, item):
+        self.select_position(item.data(Qt.ItemDataRole.UserRole))
+
+    # Показать строку DataFrame в дереве (скрытую сцену сначала показываем)
+    def select_position(self, pos: int):
+        if not self.proxy.filterAcceptsRow(self.model.scene_row(pos), QModelIndex()):
+            self.ui.chkHideDone.setChecked(False)
+        view_idx = self.proxy.mapFromSource(self.model.index_for_position(pos))
+        if not view_idx.isValid():
+            return
+        self.ui.tree.expand(view_idx.parent())
+        self.ui.tree.setCurrentIndex(view_idx)
+        self.ui.tree.scrollTo(view_idx)
+
+    # Правки перевода: поисковый кэш колонки пересоберётся при следующем поиске
+    def _translations_changed(self, *_):
+        self.search_index.invalidate("RussianTranslation")
+        self.search_key = None
 
     # Загрузка/сохранение глоссария
     def load_glossary(self):
@@ -291,32 +603,43 @@ class MainApp(QMainWindow):
             self.save_glossary()
 
     def apply_glossary(self):
-        for term, trans in self.glossary.items():
-            for idx, rec in self.df.iterrows():
-                if term in rec['EnglishText']:
-                    orig_ru = rec['RussianTranslation'] or rec['EnglishText']
-                    new_ru = orig_ru.replace(term, trans)
-                    self.df.at[idx, 'RussianTranslation'] = new_ru
-        self.populate_tree()
-        QMessageBox.information(self, "Глоссарий", "Подстановка выполнена.")
+        if self.df is None: return
+        # Все термины — одно выражение; подстановка считается в фоне
+        # по копиям колонок, запись в DataFrame — здесь, в главном потоке
+        df = self.df
+        en = df["EnglishText"].astype(str)
+        ru = df["RussianTranslation"].astype(str)
+        engine = GlossaryEngine(self.glossary)
+
+        def _done(result):
+            if self.df is not df:
+                return
+            # Строки, изменённые за время подстановки (правка, перевод), не трогаем
+            current = df["RussianTranslation"]
+            keep = [(p, v) for p, v in zip(*result) if str(current.iat[p]) == ru.iat[p]]
+            changed = [p for p, _ in keep]
+            if changed:
+                df.iloc[changed, df.columns.get_loc("RussianTranslation")] = [v for _, v in keep]
+            # Обновляем только затронутые строки (и счётчики их сцен)
+            self.model.refresh_rows(changed)
+            QMessageBox.information(self, "Глоссарий", f"Подстановка выполнена, изменено строк: {len(changed)}.")
+
+        self.tasks.submit("Глоссарий", lambda task: engine.substitute(en, ru),
+                          on_finished=_done, on_failed=self._task_failed)
 
     # Статистика
     def show_stats(self):
         dlg = QDialog(self)
         dlg.setWindowTitle("Статистика перевода")
         table = QTableWidget(dlg)
-        scenes = sorted(self.df["File"].unique())
+        scenes = sorted(self.row_index.names)
         table.setRowCount(len(scenes) + 1)
         table.setColumnCount(5)
         table.setHorizontalHeaderLabels(["Сцена","Строк","Переведено","%","Символов RU"])
-        tot_r = tot_d = tot_c = 0
+        tot_r, tot_d, tot_c = self.progress.totals()
         for r, f in enumerate(scenes):
-            sub = self.df[self.df["File"]==f]
-            rows = len(sub)
-            done = (sub["RussianTranslation"]!="").sum()
+            rows, done, chars = self.progress.scene_stats(self.row_index.by_name[f])
             perc = 0 if rows==0 else round(done/rows*100)
-            chars = sub["RussianTranslation"].str.len().sum()
-            tot_r+=rows; tot_d+=done; tot_c+=chars
             for c, val in enumerate([f,str(rows),str(done),f"{perc}%",str(chars)]):
                 table.setItem(r,c,QTableWidgetItem(val))
         perc_all = 0 if tot_r==0 else round(tot_d/tot_r*100)
@@ -331,40 +654,91 @@ class MainApp(QMainWindow):
         dlg.setLayout(lay); dlg.resize(600,400); dlg.exec()
 
     # Сохранить CSV
+    # Перед сохранением: строки с ошибками тегов — в нижний док и подтверждение
+    def _confirm_tag_issues(self) -> bool:
+        if not self.qa.issues:
+            return True
+        bad = [pos for pos, _ in self.qa.report()]
+        self.show_results(bad, f"Ошибки тегов: {len(bad)}")
+        answer = QMessageBox.question(
+            self, "Сохранение", f"Строк с ошибками тегов: {len(bad)} (см. список внизу). "
+            "Всё равно сохранить?")
+        return answer == QMessageBox.StandardButton.Yes
+
+    # Сохранить проект: файл проекта рядом с CSV, сам CSV не переписывается
+    def save_project(self):
+        if self.df is None:
+            QMessageBox.information(self, "Сохранение", "Откройте CSV.")
+            return
+        if not self._confirm_tag_issues():
+            return
+        import file_loader
+        try:
+            file_loader.save_project(self.df, self.current_path)
+        except OSError as e:
+            QMessageBox.critical(self, "Ошибка сохранения", str(e))
+            return
+        self.statusBar().showMessage("Проект сохранён", 5000)
+
+    # Экспорт CSV (по запросу)
     def save_csv(self):
         if self.df is None:
             QMessageBox.information(self, "Сохранение", "Откройте CSV.")
             return
-        path, _ = QFileDialog.getSaveFileName(self, "Сохранить CSV", self.current_path, "CSV files (*.csv)")
+        if not self._confirm_tag_issues():
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Экспорт CSV", self.current_path, "CSV files (*.csv)")
         if path:
-            file_loader.save_csv(self.df, path)
+            import file_loader
+            try:
+                file_loader.save_csv(self.df, path)
+            except OSError as e:
+                QMessageBox.critical(self, "Ошибка сохранения", str(e))
+                return
             QMessageBox.information(self, "Готово", "Сохранено.")
 
     def open_dat(self):
         path, _ = QFileDialog.getOpenFileName(self, "Открыть .dat", "", "DAT files (*.dat)")
         if not path: return
-
-        base, ext = os.path.splitext(path)
-        dec = base + "_DEC" + ext
-        if not dat_decrypt.decrypt_dat(path, dec):
+        write_dec = self.actWriteDec.isChecked()
+
+        # По умолчанию дешифруем в память; _DEC-файл пишется только по опции
+        def _decrypt(task):
+            task.report(0, 0, os.path.basename(path))
+            if write_dec:
+                base, ext = os.path.splitext(path)
+                dec = base + "_DEC" + ext
+                bundle = dec if dat_decrypt.decrypt_dat(path, dec) else None
+            else:
+                bundle = dat_decrypt.decrypt_to_bytes(path)
+            return bundle
+
+        self.tasks.submit("Дешифровка .dat", _decrypt,
+                          on_finished=lambda bundle: self.show_assets(path, bundle),
+                          on_failed=self._task_failed)
+
+    # Диалог ассетов: дерево заполняется порциями из фоновой задачи листинга
+    def show_assets(self, path: str, bundle):
+        import asset_extractor
+        if bundle is None:
             QMessageBox.critical(self, ".dat → DEC", "Не удалось найти ключ дешифрования.")
             return
-
-        # Готовим модель
-        assets = asset_extractor.list_assets(dec)
+        # Буфер предыдущего бандла больше недостижим — освобождаем его окружение
+        if self.last_bundle is not None and not isinstance(self.last_bundle, str):
+            asset_extractor.BUNDLE_CACHE.discard(self.last_bundle)
+        self.last_bundle = bundle
+        self.last_bundle_name = os.path.basename(path)
+        self.last_asset_id = None
 
         # Создаём диалог ПО КОДУ, с деревом и двумя своими кнопками
         dlg = QDialog(self)
-        dlg.setWindowTitle(f"Ассеты: {os.path.basename(dec)}")
+        dlg.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        dlg.setWindowTitle(f"Ассеты: {os.path.basename(path)}")
         vlay = QVBoxLayout(dlg)
 
         tree = QTreeWidget()
         tree.setColumnCount(2)
         tree.setHeaderLabels(["Type", "Name"])
-        for typ, name in assets:
-            it = QTreeWidgetItem(tree)
-            it.setText(0, typ)
-            it.setText(1, name)
         vlay.addWidget(tree)
 
         # Панель кнопок -------------
@@ -379,52 +753,250 @@ class MainApp(QMainWindow):
         def _export_all():
             out = QFileDialog.getExistingDirectory(dlg, "Папка для экспорта всех")
             if out:
-                asset_extractor.extract_all(dec, out)
-                QMessageBox.information(dlg, "Экспорт", f"Все ассеты в {out}")
+                self.start_export_all(bundle, out)
 
         def _export_sel():
-            idx = tree.currentIndex().row()
-            if idx < 0:
+            it = tree.currentItem()
+            if it is None:
                 QMessageBox.information(dlg, "Экспорт", "Ничего не выбрано.")
                 return
+            key = it.data(0, Qt.ItemDataRole.UserRole)
             out = QFileDialog.getExistingDirectory(dlg, "Папка для экспорта")
             if out:
-                asset_extractor.extract_asset(dec, idx, out)
-                QMessageBox.information(dlg, "Экспорт", f"Ассет экспортирован в {out}")
+                self.start_export_asset(bundle, key, out)
+
+        # Запоминаем выбор для кнопки «Экспорт выбранного» главного окна
+        def _remember_sel(cur, _prev):
+            if cur is not None:
+                self.last_asset_id = cur.data(0, Qt.ItemDataRole.UserRole)
 
         btnAll.clicked.connect(_export_all)
         btnSel.clicked.connect(_export_sel)
-
-        # Показываем модально, но кнопки внутри работают
-        dlg.exec()
+        tree.currentItemChanged.connect(_remember_sel)
+
+        # Листинг в фоне (окружение UnityPy загружается один раз и
+        # переиспользуется экспортом через BUNDLE_CACHE); строки дерева
+        # добавляются порциями по мере готовности
+        def _list(task):
+            batch, n = [], 0
+            for n, row in enumerate(asset_extractor.iter_assets(bundle), 1):
+                batch.append(row)
+                if len(batch) == 500:
+                    task.emit_partial(batch)
+                    task.report(n, 0, f"{n} ассетов")
+                    batch = []
+                    task.check()
+            if batch:
+                task.emit_partial(batch)
+            return n
+
+        closed = [False]
+
+        def _add_rows(rows):
+            if closed[0]:
+                return
+            for key, typ, name in rows:
+                it = QTreeWidgetItem(tree)
+                it.setText(0, typ)
+                it.setText(1, name)
+                it.setData(0, Qt.ItemDataRole.UserRole, key)
+
+        listing = self.tasks.submit(f"Листинг {self.last_bundle_name}", _list,
+                                    on_partial=_add_rows, on_failed=self._task_failed)
+
+        def _closed(_result):
+            closed[0] = True
+            self.tasks.cancel(listing)
+
+        dlg.finished.connect(_closed)
+        dlg.resize(600, 500)
+        dlg.show()
+
+    # Пакетная дешифровка каталога
+    def batch_decrypt(self):
+        src = QFileDialog.getExistingDirectory(self, "Каталог с .dat")
+        if not src:
+            return
+        out = QFileDialog.getExistingDirectory(self, "Куда сохранять (отмена — рядом с исходниками)")
+
+        def _run(task):
+            n = [0]
+            def _on_result(res):
+                n[0] += 1
+                task.report(n[0], 0, f"{n[0]} файлов")
+            return dat_decrypt.decrypt_tree(src, out or None, on_result=_on_result,
+                                            cancel=task.cancel_event)
+
+        def _done(summary):
+            failed = [f"{os.path.relpath(r['path'], src)}: {r['error']}"
+                      for r in summary["results"] if r["status"] == "failed"]
+            text = (f"Файлов: {summary['files']}\n"
+                    f"Дешифровано: {summary['ok']}, пропущено: {summary['skipped']}, "
+                    f"ошибок: {summary['failed']}\n"
+                    f"Скорость: {summary['mb_per_s']:.1f} МБ/с за {summary['seconds']:.1f} с")
+            if summary["cancelled"]:
+                text = "Прервано.\n" + text
+            if failed:
+                text += "\n\n" + "\n".join(failed[:20])
+            QMessageBox.information(self, "Пакетная дешифровка", text)
+
+        self.tasks.submit("Пакетная дешифровка", _run, on_finished=_done, on_failed=self._task_failed)
+
+    # Параллельный экспорт в фоновой задаче
+    # (инкрементально по манифесту; итог — в окне сообщения)
+    def start_export_all(self, bundle, out_dir: str):
+        import asset_extractor
+        bundle_name = self.last_bundle_name
+
+        def _run(task):
+            last = {}
+            def _progress(p):
+                last.update(p)
+                rates = ", ".join(f"{t}: {r:.1f}/с" for t, r in sorted(p["rates"].items()))
+                task.report(p["done"], p["total"],
+                            f"{p['done']}/{p['total']} · {p['bytes'] / 1e6:.1f} МБ · "
+                            f"процессов: {p['workers']} · {rates}")
+            asset_extractor.extract_all(bundle, out_dir, workers=os.cpu_count() or 1,
+                                        progress=_progress, bundle_name=bundle_name,
+                                        cancel=task.cancel_event,
+                                        memory_budget=self.export_budget_mb * 1024 * 1024 or None,
+                                        memory_cap=self.export_cap_mb * 1024 * 1024 or asset_extractor.MEMORY_CAP)
+            last["cancelled"] = task.cancelled
+            return last
+
+        def _done(last):
+            text = (f"Экспортировано: {last.get('exported', 0)}, "
+                    f"без изменений: {last.get('skipped', 0)}, "
+                    f"процессов: {last.get('workers', 1)}")
+            removed = last.get("removed", [])
+            if removed:
+                text += f"\nУдалены из бандла ({len(removed)}): " + ", ".join(removed[:10])
+            if last["cancelled"]:
+                text = "Экспорт прерван.\n" + text
+            QMessageBox.information(self, "Экспорт", f"Ассеты в {out_dir}\n{text}")
+
+        self.tasks.submit(f"Экспорт {bundle_name}", _run, on_finished=_done, on_failed=self._task_failed)
+
+    def start_export_asset(self, bundle, key: tuple[str, int], out_dir: str):
+        import asset_extractor
+        def _done(ok):
+            if ok:
+                QMessageBox.information(self, "Экспорт", f"Ассет экспортирован в:\n{out_dir}")
+            else:
+                QMessageBox.warning(self, "Экспорт", "Не удалось экспортировать ассет.")
+
+        self.tasks.submit("Экспорт ассета",
+                          lambda task: asset_extractor.extract_asset(bundle, key, out_dir),
+                          on_finished=_done, on_failed=self._task_failed)
+
+    # Память экспорта: бюджет на воркеры (сколько копий бандла держать
+    # одновременно) и предел очереди записи; действует на следующие экспорты
+    # (в CLI — --memory-budget и --memory-cap)
+    def edit_export_memory(self):
+        import asset_extractor
+        dlg = QDialog(self)
+        dlg.setWindowTitle("Память экспорта ассетов")
+        form = QFormLayout(dlg)
+        budget = QSpinBox()
+        budget.setRange(0, 1024 * 1024)
+        budget.setSingleStep(512)
+        budget.setSuffix(" МБ")
+        budget.setSpecialValueText(f"по умолчанию ({asset_extractor.EXPORT_MEMORY_BUDGET // 2**20} МБ)")
+        budget.setValue(self.export_budget_mb)
+        form.addRow("На воркеры экспорта:", budget)
+        cap = QSpinBox()
+        cap.setRange(0, 64 * 1024)
+        cap.setSingleStep(64)
+        cap.setSuffix(" МБ")
+        cap.setSpecialValueText(f"по умолчанию ({asset_extractor.MEMORY_CAP // 2**20} МБ)")
+        cap.setValue(self.export_cap_mb)
+        form.addRow("Очередь записи (пик):", cap)
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(dlg.accept)
+        buttons.rejected.connect(dlg.reject)
+        form.addRow(buttons)
+        if dlg.exec() == QDialog.DialogCode.Accepted:
+            self.export_budget_mb = budget.value()
+            self.export_cap_mb = cap.value()
 
     def export_all_assets(self):
-        # bundle_path храните в атрибуте после decrypt_dat, например self.last_dec_path
-        if not hasattr(self, 'last_dec_path'):
+        if self.last_bundle is None:
             return
         out_dir = QFileDialog.getExistingDirectory(self, "Папка для экспорта всех ассетов")
         if not out_dir:
             return
-        asset_extractor.extract_all(self.last_dec_path, out_dir)
-        QMessageBox.information(self, "Экспорт", f"Все ассеты экспортированы в:\n{out_dir}")
+        self.start_export_all(self.last_bundle, out_dir)
 
     def export_selected_asset(self):
-        if not hasattr(self, 'last_dec_path'):
+        if self.last_bundle is None:
             return
-        it = self.ui.tree.currentItem()
-        if it is None or it.parent() is None:
+        if self.last_asset_id is None:
             QMessageBox.information(self, "Экспорт", "Выберите ассет в списке.")
             return
-        # определяем индекс объекта по порядку в asset_extractor.list_assets
-        idx = self.ui.tree.indexOfTopLevelItem(it)  # или сохраните flat list при открытии
         out_dir = QFileDialog.getExistingDirectory(self, "Папка для экспорта ассета")
         if not out_dir:
             return
-        asset_extractor.extract_asset(self.last_dec_path, idx, out_dir)
-        QMessageBox.information(self, "Экспорт", f"Ассет экспортирован в:\n{out_dir}")
+        self.start_export_asset(self.last_bundle, self.last_asset_id, out_dir)
+
+    # ------------------------------------------------------------------
+    # Профилирование
+    # ------------------------------------------------------------------
+    def toggle_instrumentation(self, on: bool):
+        instrument.RECORDER.enabled = on
+        self.statusBar().showMessage("Инструментирование " + ("включено" if on else "выключено"), 3000)
+
+    def show_profile_panel(self):
+        if self.profile_dock is None:
+            from profile_panel import ProfilePanel
+            self.profile_dock = QDockWidget("Профилирование", self)
+            self.profile_dock.setWidget(ProfilePanel(parent=self.profile_dock))
+            self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.profile_dock)
+        self.profile_dock.show()
+        self.profile_dock.raise_()
+
+    def save_profile_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Chrome-трасса", "trace.json", "JSON (*.json)")
+        if path:
+            instrument.RECORDER.save_trace(path)
+            self.statusBar().showMessage(f"Трасса сохранена: {path} (chrome://tracing, Perfetto)", 5000)
+
+    def save_profile_json(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Профиль (JSON)", "profile.json", "JSON (*.json)")
+        if path:
+            instrument.RECORDER.save_json(path)
+            self.statusBar().showMessage(f"Профиль сохранён: {path}", 5000)
+
+    # Включение — старт сэмплирования, выключение — остановка и запись свёрнутых стеков
+    def toggle_sampler(self, on: bool):
+        if on:
+            self.sampler.start()
+            self.statusBar().showMessage("Сэмплирующий профайлер запущен", 3000)
+            return
+        self.sampler.stop()
+        if not self.sampler.samples:
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Стеки профайлера", "profile.folded",
+                                              "Свёрнутые стеки (*.folded *.txt)")
+        if path:
+            self.sampler.save_collapsed(path)
+            self.statusBar().showMessage(
+                f"Снимков: {self.sampler.count}, стеки сохранены: {path} (flamegraph.pl, speedscope)", 5000)
+
+    # Закрытие окна: отменяем задачи и ждём выполняющиеся
+    def closeEvent(self, event):
+        self.sampler.stop()
+        self.tasks.cancel_all()
+        self.tm_timer.stop()
+        self.tm_runner.cancel_all()
+        self.tasks.pool.waitForDone()
+        self.tm_runner.pool.waitForDone()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    startup_mark("QApplication")
     w = MainApp()
+    startup_mark("MainApp.__init__")
     w.show()
+    startup_mark("show()")
     sys.exit(app.exec())
@@ -0,0 +1,69 @@
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView, QLabel
+)
+import instrument
+
+# ------------------------------------------------------------------
+# Панель профилирования: итоги по операциям и последние события
+# ------------------------------------------------------------------
+# Поля событий, которые показываются в колонке «Прочее»
+_EXTRA = ("rows", "files", "changed", "lines", "prompt_tokens", "completion_tokens", "retries", "terms")
+
+class ProfilePanel(QWidget):
+    """
+    Раз в секунду (только пока панель видна) перечитывает итоги
+    instrument.RECORDER: вызовы, суммарное/среднее/максимальное время,
+    байты и пропускная способность, счётчики строк и токенов.
+    """
+    HEADERS = ["Операция", "Вызовов", "Всего, мс", "Среднее, мс", "Макс, мс", "МБ", "МБ/с", "Прочее"]
+
+    def __init__(self, recorder: instrument.Recorder = instrument.RECORDER, parent=None):
+        super().__init__(parent)
+        self.recorder = recorder
+        self.label = QLabel()
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(len(self.HEADERS) - 1, QHeaderView.ResizeMode.Stretch)
+        self.recent = QTableWidget(0, 3)
+        self.recent.setHorizontalHeaderLabels(["Операция", "мс", "Данные"])
+        self.recent.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.recent.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        lay = QVBoxLayout(self)
+        lay.addWidget(self.label)
+        lay.addWidget(self.table, 2)
+        lay.addWidget(self.recent, 1)
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        state = "запись включена" if self.recorder.enabled else "запись выключена"
+        self.label.setText(f"{state} · событий в буфере: {len(self.recorder.events)}")
+        stats = sorted(self.recorder.stats().items(), key=lambda kv: -kv[1]["seconds"])
+        self.table.setRowCount(len(stats))
+        for r, (name, t) in enumerate(stats):
+            mb = t.get("bytes", 0) / 1e6
+            extra = ", ".join(f"{k}={t[k]:g}" for k in _EXTRA if k in t)
+            values = [name, str(t["count"]), f"{t['seconds'] * 1000:.1f}",
+                      f"{t['seconds'] * 1000 / t['count']:.2f}", f"{t['max'] * 1000:.1f}",
+                      f"{mb:.1f}" if mb else "", f"{mb / t['seconds']:.1f}" if mb and t["seconds"] else "",
+                      extra]
+            for c, val in enumerate(values):
+                self.table.setItem(r, c, QTableWidgetItem(val))
+        events = self.recorder.recent(100)[::-1]
+        self.recent.setRowCount(len(events))
+        for r, e in enumerate(events):
+            args = ", ".join(f"{k}={v}" for k, v in e["args"].items())
+            for c, val in enumerate([e["name"], f"{e['dur'] * 1000:.1f}", args]):
+                self.recent.setItem(r, c, QTableWidgetItem(val))
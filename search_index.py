@@ -0,0 +1,90 @@
+import re
+from bisect import bisect_right
+
+# Колонки, по которым ищем по умолчанию
+SEARCH_COLUMNS = ("EnglishText", "RussianTranslation")
+# Режимы поиска
+MODES = ("substring", "word", "regex")
+# Разделитель строк в склеенной колонке: не встречается в тексте и не
+# является «словесным» символом, поэтому \b на границе строк работает
+_SEP = "\x00"
+
+class SearchIndex:
+    """
+    Поисковый кэш по колонкам DataFrame: каждая колонка склеивается
+    в одну строку (в нижнем регистре для поиска без учёта регистра)
+    плюс массив смещений начала строк. Подстрока ищется str.find,
+    слово целиком — одним регулярным выражением по всей колонке, так что
+    поиск идёт на стороне C, а не циклом Python по строкам.
+    После правок колонку достаточно invalidate() — она пересоберётся
+    при следующем поиске.
+    """
+    def __init__(self, df, columns: tuple[str, ...] = SEARCH_COLUMNS):
+        self.df = df
+        self.columns = columns
+        self._joined: dict[tuple[str, bool], tuple[str, list[int]]] = {}
+
+    def invalidate(self, column: str | None = None) -> None:
+        if column is None:
+            self._joined.clear()
+        else:
+            self._joined.pop((column, False), None)
+            self._joined.pop((column, True), None)
+
+    def _column(self, column: str, case_sensitive: bool) -> tuple[str, list[int]]:
+        key = (column, case_sensitive)
+        if key not in self._joined:
+            values = self.df[column].astype(str)
+            if not case_sensitive:
+                values = values.str.lower()
+            values = values.tolist()
+            starts, pos = [], 0
+            for v in values:
+                starts.append(pos)
+                pos += len(v) + 1
+            self._joined[key] = (_SEP.join(values), starts)
+        return self._joined[key]
+
+    def search(self, pattern: str, mode: str = "substring", columns: tuple[str, ...] | None = None,
+               case_sensitive: bool = False) -> list[int]:
+        """
+        Возвращает отсортированные позиции строк, где есть совпадение
+        хотя бы в одной из columns. mode: "substring", "word" или "regex".
+        Некорректное регулярное выражение поднимает re.error.
+        """
+        if not pattern:
+            return []
+        hits: set[int] = set()
+        for column in columns or self.columns:
+            if mode == "regex":
+                hits.update(self._search_regex(column, pattern, case_sensitive))
+                continue
+            text, starts = self._column(column, case_sensitive)
+            needle = pattern if case_sensitive else pattern.lower()
+            if mode == "word":
+                rx = re.compile(r"\b" + re.escape(needle) + r"\b")
+                for m in rx.finditer(text):
+                    hits.add(bisect_right(starts, m.start()) - 1)
+            else:
+                hits.update(self._search_substring(text, starts, needle))
+        return sorted(hits)
+
+    @staticmethod
+    def _search_substring(text: str, starts: list[int], needle: str) -> list[int]:
+        rows = []
+        off = text.find(needle)
+        while off != -1:
+            row = bisect_right(starts, off) - 1
+            rows.append(row)
+            # Одного совпадения на строку достаточно — прыгаем к следующей
+            if row + 1 >= len(starts):
+                break
+            off = text.find(needle, starts[row + 1])
+        return rows
+
+    def _search_regex(self, column: str, pattern: str, case_sensitive: bool) -> list[int]:
+        # Регулярное выражение проверяется построчно: иначе «.*» могло бы
+        # захватить соседние строки склеенной колонки
+        rx = re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+        values = self.df[column].astype(str).tolist()
+        return [i for i, v in enumerate(values) if rx.search(v)]
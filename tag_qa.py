@@ -0,0 +1,84 @@
+import re
+from collections import Counter
+import numpy as np
+from localization import TAG_REGEX
+
+# ------------------------------------------------------------------
+# Проверка тегов и плейсхолдеров по всему файлу
+# ------------------------------------------------------------------
+# Похоже на плейсхолдер, но не {n}: «{ 0}», «{0», «｛0｝»
+_PLACEHOLDER_LIKE = re.compile(r"[{｛]\s*\d+\s*[}｝]?")
+_PLACEHOLDER = re.compile(r"\{[0-9]+\}")
+# Разделитель при склейке последовательностей тегов для сравнения колонок
+_SEP = "\x00"
+
+def check_tokens(en_tokens: list[str], ru_tokens: list[str], ru_text: str) -> list[str]:
+    """
+    Описания расхождений перевода с оригиналом: недостающие, лишние и
+    переставленные теги, сломанные плейсхолдеры {n}. Пустой список — всё в порядке.
+    """
+    issues = []
+    if en_tokens != ru_tokens:
+        en_count, ru_count = Counter(en_tokens), Counter(ru_tokens)
+        missing = list((en_count - ru_count).elements())
+        extra = list((ru_count - en_count).elements())
+        if missing:
+            issues.append("нет тегов: " + " ".join(missing))
+        if extra:
+            issues.append("лишние теги: " + " ".join(extra))
+        if not missing and not extra:
+            issues.append("порядок тегов: " + " ".join(ru_tokens))
+    broken = [m.group() for m in _PLACEHOLDER_LIKE.finditer(ru_text)
+              if not _PLACEHOLDER.fullmatch(m.group())]
+    if broken:
+        issues.append("сломан плейсхолдер: " + " ".join(broken))
+    return issues
+
+class TagQA:
+    """
+    Последовательности тегов для всех строк EnglishText и RussianTranslation
+    извлекаются одним проходом str.findall и кэшируются по позиции строки.
+    Подробная проверка идёт только для строк, где склеенные
+    последовательности различаются или в переводе есть подозрительные
+    скобки, поэтому полный прогон дёшев и годится перед каждым сохранением.
+    Пустой перевод ошибкой не считается. После правки строки — update().
+    """
+    def __init__(self, df):
+        self.df = df
+        en = df["EnglishText"].astype(str)
+        ru = df["RussianTranslation"].astype(str)
+        self.en_tokens: list[list[str]] = en.str.findall(TAG_REGEX).tolist()
+        self.ru_tokens: list[list[str]] = ru.str.findall(TAG_REGEX).tolist()
+        self.has_tags = np.fromiter((bool(t) for t in self.en_tokens), dtype=bool, count=len(df))
+        self.issues: dict[int, list[str]] = {}
+
+        en_joined = np.array([_SEP.join(t) for t in self.en_tokens], dtype=object)
+        ru_joined = np.array([_SEP.join(t) for t in self.ru_tokens], dtype=object)
+        filled = (ru != "").to_numpy()
+        suspect = ru.str.contains(_PLACEHOLDER_LIKE).to_numpy()
+        candidates = np.flatnonzero(filled & ((en_joined != ru_joined) | suspect))
+        ru_values = ru.to_numpy()
+        for pos in candidates:
+            found = check_tokens(self.en_tokens[pos], self.ru_tokens[pos], ru_values[pos])
+            if found:
+                self.issues[int(pos)] = found
+
+    def check(self, pos: int, text: str) -> list[str]:
+        """Проверка нового перевода строки pos без записи в кэш."""
+        if not text:
+            return []
+        return check_tokens(self.en_tokens[pos], TAG_REGEX.findall(text), text)
+
+    def update(self, pos: int, text: str) -> list[str]:
+        """Учитывает перевод строки pos; возвращает её текущие расхождения."""
+        self.ru_tokens[pos] = TAG_REGEX.findall(text)
+        found = self.check(pos, text)
+        if found:
+            self.issues[pos] = found
+        else:
+            self.issues.pop(pos, None)
+        return found
+
+    def report(self) -> list[tuple[int, list[str]]]:
+        """(позиция, расхождения) по всем строкам с ошибками, по возрастанию позиции."""
+        return sorted(self.issues.items())
@@ -0,0 +1,163 @@
+import threading
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt6.QtWidgets import QWidget, QLabel, QProgressBar, QPushButton, QHBoxLayout
+
+# ------------------------------------------------------------------
+# Фоновые задачи: QThreadPool + сигналы в GUI
+# ------------------------------------------------------------------
+class TaskCancelled(Exception):
+    """Поднимается Task.check(), если задачу отменили."""
+
+class TaskSignals(QObject):
+    # object, а не dict/list: значения уходят в GUI без преобразования в QVariant
+    progress = pyqtSignal(object)   # сама задача (done/total/text обновлены)
+    partial = pyqtSignal(object)    # порция результатов по мере готовности
+    finished = pyqtSignal(object)   # итог fn
+    failed = pyqtSignal(object)     # исключение fn
+    done = pyqtSignal(object)       # всегда последним, в том числе после отмены
+
+class Task(QRunnable):
+    """
+    Вызов fn(task, *args, **kwargs) в пуле потоков. fn сообщает прогресс
+    через report(), отдаёт частичные результаты через emit_partial() и
+    периодически проверяет cancelled / check(). on_cancel — необязательный
+    обработчик отмены (например, Translator.cancel), вызывается из GUI.
+    Обработчики сигналов выполняются в главном потоке.
+    """
+    def __init__(self, title: str, fn, *args, **kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.title = title
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+        self.cancel_event = threading.Event()
+        self.on_cancel = None
+        self.state = "queued"       # queued / running / finished / failed / cancelled
+        self.done = 0
+        self.total = 0
+        self.text = ""
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+        if self.on_cancel is not None:
+            self.on_cancel()
+
+    def check(self) -> None:
+        if self.cancel_event.is_set():
+            raise TaskCancelled()
+
+    def report(self, done: int, total: int, text: str = "") -> None:
+        self.done, self.total, self.text = done, total, text
+        self.signals.progress.emit(self)
+
+    def emit_partial(self, value) -> None:
+        self.signals.partial.emit(value)
+
+    def run(self):
+        self.state = "running"
+        try:
+            self.check()
+            result = self.fn(self, *self.args, **self.kwargs)
+        except TaskCancelled:
+            self.state = "cancelled"
+        except Exception as e:
+            self.state = "failed"
+            self.signals.failed.emit(e)
+        else:
+            self.state = "cancelled" if self.cancelled else "finished"
+            self.signals.finished.emit(result)
+        self.signals.done.emit(self)
+
+class TaskRunner(QObject):
+    """
+    Очередь фоновых задач: одновременно выполняется не больше
+    max_threads, остальные ждут в очереди QThreadPool.
+    changed — список задач или прогресс одной из них изменились.
+    """
+    changed = pyqtSignal()
+
+    def __init__(self, parent=None, max_threads: int = 2):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.tasks: list[Task] = []
+
+    def submit(self, title: str, fn, *args, on_partial=None, on_finished=None,
+               on_failed=None, on_cancel=None, **kwargs) -> Task:
+        task = Task(title, fn, *args, **kwargs)
+        task.on_cancel = on_cancel
+        if on_partial is not None:
+            task.signals.partial.connect(on_partial)
+        if on_finished is not None:
+            task.signals.finished.connect(on_finished)
+        if on_failed is not None:
+            task.signals.failed.connect(on_failed)
+        task.signals.progress.connect(self.changed)
+        task.signals.done.connect(self._task_done)
+        self.tasks.append(task)
+        self.pool.start(task)
+        self.changed.emit()
+        return task
+
+    def cancel(self, task: Task) -> None:
+        task.cancel()
+        # Ещё не начатую задачу просто убираем из очереди пула
+        if task.state == "queued" and self.pool.tryTake(task):
+            task.state = "cancelled"
+            self._task_done(task)
+
+    def cancel_all(self) -> None:
+        for task in list(self.tasks):
+            self.cancel(task)
+
+    def current(self) -> Task | None:
+        """Первая выполняющаяся задача (или первая в очереди)."""
+        running = [t for t in self.tasks if t.state == "running"]
+        return (running or self.tasks or [None])[0]
+
+    def _task_done(self, task: Task) -> None:
+        if task in self.tasks:
+            self.tasks.remove(task)
+        self.changed.emit()
+
+class TaskBar(QWidget):
+    """Строка состояния задач: название и прогресс текущей, число в очереди, отмена."""
+    def __init__(self, runner: TaskRunner, parent=None):
+        super().__init__(parent)
+        self.runner = runner
+        self.label = QLabel()
+        self.bar = QProgressBar()
+        self.bar.setMaximumWidth(200)
+        self.btnCancel = QPushButton("Отмена")
+        self.btnCancel.clicked.connect(self._cancel_current)
+        lay = QHBoxLayout(self)
+        lay.setContentsMargins(0, 0, 0, 0)
+        lay.addWidget(self.label)
+        lay.addWidget(self.bar)
+        lay.addWidget(self.btnCancel)
+        runner.changed.connect(self.refresh)
+        self.refresh()
+
+    def _cancel_current(self):
+        task = self.runner.current()
+        if task is not None:
+            self.runner.cancel(task)
+
+    def refresh(self):
+        task = self.runner.current()
+        self.setVisible(task is not None)
+        if task is None:
+            return
+        queued = len(self.runner.tasks) - 1
+        text = f"{task.title}: {task.text}" if task.text else task.title
+        self.label.setText(text + (f" (+{queued} в очереди)" if queued else ""))
+        self.setToolTip("\n".join(f"{t.title} — {t.state}" for t in self.runner.tasks))
+        # total == 0 — неопределённый прогресс («бегущая» полоса)
+        self.bar.setMaximum(task.total)
+        self.bar.setValue(min(task.done, task.total))
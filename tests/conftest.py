@@ -0,0 +1,14 @@
+import os, sys
+import pytest
+
+# Модули приложения лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def make_df():
+    """Таблица редактора из строк (File, StepID, Character, EnglishText, RussianTranslation)."""
+    pd = pytest.importorskip("pandas")
+
+    def _make(rows):
+        return pd.DataFrame(rows, columns=["File", "StepID", "Character", "EnglishText", "RussianTranslation"])
+    return _make
@@ -0,0 +1,386 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("UnityPy")
+
+import asset_extractor
+from asset_extractor import BundleCache
+
+# ------------------------------------------------------------------
+# Поддельные объекты UnityPy: настоящий бандл для тестов не нужен
+# ------------------------------------------------------------------
+class FakeReader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.Position = 0
+
+    def read_bytes(self, n: int) -> bytes:
+        chunk = self.data[self.Position:self.Position + n]
+        self.Position += len(chunk)
+        return chunk
+
+class FakeObj:
+    def __init__(self, path_id, type_name="MonoBehaviour", name=None, raw=b"raw", cab="CAB-a",
+                 tree=None, cabs=None, **fields):
+        self.path_id = path_id
+        self.type = SimpleNamespace(name=type_name)
+        self.name = name
+        self.reader = FakeReader(raw)
+        self.byte_start = 0
+        self.byte_size = len(raw)
+        # cabs — потоки бандла (.resS и т. п.) по именам, как env.get_cab
+        cabs = cabs or {}
+        self.assets_file = SimpleNamespace(name=cab, environment=SimpleNamespace(get_cab=cabs.get))
+        self.tree = tree or {}
+        self.fields = fields
+
+    def peek_name(self):
+        return self.name
+
+    def read_typetree(self):
+        return self.tree
+
+    def read(self):
+        # Класс контейнера назван по типу, как у классов UnityPy; словари
+        # (семплы AudioClip) — копии, экспорт их опустошает
+        fields = {k: dict(v) if isinstance(v, dict) else v for k, v in self.fields.items()}
+        return type(self.type.name, (SimpleNamespace,), {})(name=self.name, type=self.type, **fields)
+
+def fake_env(objects, container=None):
+    return SimpleNamespace(objects=list(objects), container=container or {})
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Подменяет UnityPy.load; список аргументов загрузок."""
+    calls = []
+
+    def _load(bundle):
+        calls.append(bundle)
+        return fake_env([FakeObj(1, name="a"), FakeObj(2, name="b")])
+    monkeypatch.setattr(asset_extractor.UnityPy, "load", _load)
+    return calls
+
+# ------------------------------------------------------------------
+# BundleCache
+# ------------------------------------------------------------------
+def test_cache_loads_each_bundle_once(tmp_path, loads):
+    path = tmp_path / "b.dat"
+    path.write_bytes(b"x" * 10)
+    cache = BundleCache()
+    assert cache.get(str(path)) is cache.get(str(path))
+    assert len(loads) == 1
+    # Перезаписанный файл (другой mtime) загружается заново
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    cache.get(str(path))
+    assert len(loads) == 2
+
+def test_buffers_are_keyed_by_identity(loads):
+    cache = BundleCache()
+    a, b = bytearray(b"same"), bytearray(b"same")
+    assert cache.get(a) is not cache.get(b)
+    cache.get(a)
+    assert len(loads) == 2
+
+def test_eviction_keeps_the_last_bundle(loads):
+    cache = BundleCache(budget_bytes=100, overhead=1.0)
+    first, second = bytearray(60), bytearray(60)
+    cache.get(first)
+    cache.get(second)
+    assert cache._used == 60
+    cache.get(first)                  # вытеснен — загружается снова
+    assert len(loads) == 3
+    huge = bytearray(500)             # больше бюджета, но остаётся в кэше
+    env = cache.get(huge)
+    assert cache.get(huge) is env and len(loads) == 4
+
+def test_discard_and_clear(loads):
+    cache = BundleCache()
+    buf = bytearray(10)
+    cache.get(buf)
+    cache.discard(buf)
+    assert cache._used == 0
+    cache.get(buf)
+    assert len(loads) == 2
+    cache.clear()
+    assert cache._used == 0 and not cache._entries
+
+def test_index_is_built_once(loads):
+    cache = BundleCache()
+    buf = bytearray(10)
+    index = cache.index(buf)
+    assert sorted(index) == [("CAB-a", 1), ("CAB-a", 2)]
+    with cache.use(buf) as entry:
+        assert entry.index is index
+
+# ------------------------------------------------------------------
+# Листинг
+# ------------------------------------------------------------------
+def test_iter_assets_uses_metadata_only(monkeypatch):
+    class NoRead(FakeObj):
+        def read(self):
+            raise AssertionError("листинг не должен декодировать объекты")
+    objs = [NoRead(1, "Texture2D", name="hero"), NoRead(2, "TextAsset"), NoRead(3, "Mesh")]
+    env = fake_env(objs, container={"assets/story/intro.bytes": objs[1]})
+    monkeypatch.setattr(asset_extractor.UnityPy, "load", lambda bundle: env)
+    assert asset_extractor.list_assets(bytearray(1)) == [
+        (("CAB-a", 1), "Texture2D", "hero"), (("CAB-a", 2), "TextAsset", "assets/story/intro.bytes"),
+        (("CAB-a", 3), "Mesh", "path_id_3")]
+
+def test_full_listing_reads_objects(monkeypatch):
+    class Broken(FakeObj):
+        def read(self):
+            raise ValueError("битый объект")
+    env = fake_env([FakeObj(1, "Texture2D", name="hero"), Broken(2)])
+    monkeypatch.setattr(asset_extractor.UnityPy, "load", lambda bundle: env)
+    assert asset_extractor.list_assets(bytearray(1), fast=False) == [(("CAB-a", 1), "Texture2D", "hero")]
+
+# ------------------------------------------------------------------
+# Адресация (CAB, path_id) и имена файлов
+# ------------------------------------------------------------------
+def test_asset_filename():
+    assert asset_extractor.asset_filename("hero", 42, "png") == "hero_42.png"
+    assert asset_extractor.asset_filename('a/b:c*?"<>|', 1, "bytes") == "a_b_c_______1.bytes"
+    assert asset_extractor.asset_filename(" .. ", 7, "wav") == "asset_7.wav"
+    assert asset_extractor.asset_filename("x" * 300, 1, "png") == "x" * 120 + "_1.png"
+    assert asset_extractor.asset_filename("hero", 42, "png", "CAB-1") == "hero_CAB-1_42.png"
+
+@pytest.fixture
+def two_cabs(monkeypatch):
+    # Сцена и sharedAssets: path_id 1 есть в обоих CAB
+    env = fake_env([FakeObj(1, "TextAsset", name="intro", cab="CAB-scene", m_Script=b"scene"),
+                    FakeObj(1, "TextAsset", name="intro", cab="CAB-shared", m_Script=b"shared"),
+                    FakeObj(2, "TextAsset", name="outro", cab="CAB-shared", m_Script=b"outro")])
+    monkeypatch.setattr(asset_extractor.UnityPy, "load", lambda bundle: env)
+    return bytearray(1)
+
+def test_colliding_path_ids_are_kept(two_cabs):
+    keys = [key for key, _, _ in asset_extractor.iter_assets(two_cabs)]
+    assert keys == [("CAB-scene", 1), ("CAB-shared", 1), ("CAB-shared", 2)]
+    index = asset_extractor.load_index(two_cabs)
+    assert asset_extractor.shared_path_ids(index) == {1}
+    assert asset_extractor.resolve_key(index, 2) == ("CAB-shared", 2)
+    assert asset_extractor.resolve_key(index, 3) is None
+    with pytest.raises(ValueError, match="CAB-scene, CAB-shared"):
+        asset_extractor.resolve_key(index, 1)
+
+def test_export_of_colliding_path_ids(two_cabs, tmp_path):
+    assert asset_extractor.extract_all(two_cabs, str(tmp_path), bundle_name="b") == 3
+    files = sorted(p.name for p in tmp_path.iterdir() if not p.name.startswith("."))
+    assert files == ["intro_CAB-scene_1.bytes", "intro_CAB-shared_1.bytes", "outro_2.bytes"]
+    assert (tmp_path / "intro_CAB-scene_1.bytes").read_bytes() == b"scene"
+    manifest = asset_extractor.load_manifest(str(tmp_path))
+    assert sorted(manifest) == ["b:CAB-scene:1", "b:CAB-shared:1", "b:CAB-shared:2"]
+    assert asset_extractor.extract_asset(two_cabs, ("CAB-shared", 1), str(tmp_path / "one"))
+    assert (tmp_path / "one" / "intro_CAB-shared_1.bytes").read_bytes() == b"shared"
+
+# ------------------------------------------------------------------
+# Экспорт: прогресс и ошибки записи
+# ------------------------------------------------------------------
+def test_export_progress_snapshot():
+    seen = []
+    tracker = asset_extractor.ExportProgress(3, seen.append)
+    tracker.add(("Texture2D", 10, ["a.png"]))
+    tracker.add(None)
+    tracker.skipped += 1
+    tracker.report()
+    snap = seen[-1]
+    assert (snap["done"], snap["total"], snap["exported"], snap["skipped"], snap["bytes"]) == (2, 3, 1, 1, 10)
+    assert set(snap["rates"]) == {"Texture2D"}
+
+def text_assets(n):
+    return [FakeObj(i, "TextAsset", name=f"t{i}", m_Script=b"x" * i) for i in range(1, n + 1)]
+
+@pytest.fixture
+def fail_write(monkeypatch):
+    """Запись файлов, чьё имя содержит одну из строк failing, падает."""
+    failing = set()
+    real = asset_extractor._write_file
+
+    def _write(out_path, data):
+        if any(part in out_path for part in failing):
+            raise OSError("диск заполнен")
+        return real(out_path, data)
+    monkeypatch.setattr(asset_extractor, "_write_file", _write)
+    return failing
+
+def test_failed_background_write_fails_only_its_object(monkeypatch, tmp_path, fail_write):
+    index = asset_extractor.build_index(fake_env(text_assets(3)))
+    monkeypatch.setattr(asset_extractor, "_worker_index", index)
+    fail_write.add("t2_")
+    results = asset_extractor._export_chunk(list(index), str(tmp_path))
+    assert [r[0] is not None for r in results] == [True, False, True]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["t1_1.bytes", "t3_3.bytes"]
+    # Несуществующий каталог — все объекты неудачны, но исключения нет
+    assert all(r[0] is None for r in asset_extractor._export_chunk(list(index), str(tmp_path / "nope")))
+
+class ThreadPool(ThreadPoolExecutor):
+    """Пул процессов в тестах заменён потоками: подменённый UnityPy.load виден воркерам."""
+    def __init__(self, max_workers=None, initializer=None, initargs=(), **kwargs):
+        super().__init__(max_workers, initializer=initializer, initargs=initargs)
+
+@pytest.fixture
+def parallel(monkeypatch):
+    env = fake_env(text_assets(6))
+    monkeypatch.setattr(asset_extractor.UnityPy, "load", lambda bundle: env)
+    monkeypatch.setattr(asset_extractor, "ProcessPoolExecutor", ThreadPool)
+    return bytearray(1)
+
+def test_parallel_export_survives_write_errors(parallel, tmp_path, fail_write):
+    fail_write.add("t4_")
+    n = asset_extractor.extract_all(parallel, str(tmp_path), workers=2, chunk_size=2, bundle_name="b")
+    assert n == 5
+    manifest = asset_extractor.load_manifest(str(tmp_path))
+    assert sorted(manifest) == [f"b:CAB-a:{i}" for i in (1, 2, 3, 5, 6)]
+    # Повторный запуск экспортирует только неудавшийся объект
+    fail_write.clear()
+    assert asset_extractor.extract_all(parallel, str(tmp_path), workers=2, chunk_size=2, bundle_name="b") == 1
+
+def test_manifest_is_saved_when_export_aborts(parallel, tmp_path, monkeypatch):
+    real = asset_extractor._export_chunk
+
+    def _chunk(keys, output_dir):
+        if ("CAB-a", 6) in keys:
+            raise RuntimeError("воркер упал")
+        return real(keys, output_dir)
+    monkeypatch.setattr(asset_extractor, "_export_chunk", _chunk)
+    with pytest.raises(RuntimeError):
+        asset_extractor.extract_all(parallel, str(tmp_path), workers=2, chunk_size=1, bundle_name="b")
+    assert os.path.exists(tmp_path / asset_extractor.MANIFEST_FILE)
+    manifest = asset_extractor.load_manifest(str(tmp_path))
+    assert manifest and "b:CAB-a:6" not in manifest
+    assert all(os.path.exists(tmp_path / e["files"][0]) for e in manifest.values())
+
+def test_pool_size_follows_the_export_budget():
+    mb = 1024 * 1024
+    # 500 МБ бандла × overhead 3 = 1.5 ГБ на воркер
+    assert asset_extractor._pool_size(8, 500 * mb, budget=16 * 1024 * mb) == 8
+    assert asset_extractor._pool_size(8, 500 * mb, budget=4 * 1024 * mb) == 2
+    assert asset_extractor._pool_size(8, 500 * mb, budget=mb) == 1
+    assert asset_extractor._pool_size(1, 1, budget=1 << 40) == 1
+
+def test_progress_reports_effective_workers(parallel, tmp_path):
+    seen = []
+    asset_extractor.extract_all(parallel, str(tmp_path), workers=4, progress=seen.append,
+                                incremental=False, memory_budget=6)
+    # Бюджет 6 байт на бандл в 1 байт × overhead 3 — два воркера
+    assert {p["workers"] for p in seen} == {2}
+
+# ------------------------------------------------------------------
+# Потоковая запись и предел памяти
+# ------------------------------------------------------------------
+def test_raw_chunks(monkeypatch):
+    monkeypatch.setattr(asset_extractor, "WRITE_CHUNK", 4)
+    obj = FakeObj(1, raw=b"0123456789")
+    assert list(asset_extractor._raw_chunks(obj)) == [b"0123", b"4567", b"89"]
+
+def test_write_file_bytes_and_fill(tmp_path, monkeypatch):
+    monkeypatch.setattr(asset_extractor, "WRITE_CHUNK", 3)
+    path = str(tmp_path / "a.bin")
+    assert asset_extractor._write_file(path, bytearray(b"abcdefg")) == 7
+    assert open(path, "rb").read() == b"abcdefg"
+    assert asset_extractor._write_file(path, lambda f: f.write(b"xyz")) == 3
+    assert open(path, "rb").read() == b"xyz"
+
+    def _broken(f):
+        f.write(b"half")
+        raise OSError("обрыв")
+    with pytest.raises(OSError):
+        asset_extractor._write_file(path, _broken)
+    assert not os.path.exists(path)
+
+def test_bounded_writer_keeps_queue_under_cap(tmp_path, monkeypatch):
+    writer = asset_extractor._BoundedWriter(cap=10)
+    peak = []
+    real = asset_extractor._write_file
+
+    def _write(out_path, data):
+        peak.append(writer.pending)
+        return real(out_path, data)
+    monkeypatch.setattr(asset_extractor, "_write_file", _write)
+    for i in range(20):
+        writer(str(tmp_path / f"{i}.bin"), b"x" * 4)
+    writer(str(tmp_path / "big.bin"), b"y" * 50)   # больше предела — в одиночку
+    writer.close()
+    assert max(peak) <= 50 and all(p <= 12 for p in peak[:20])
+    assert len(list(tmp_path.iterdir())) == 21
+
+def test_large_stream_bypasses_the_queue(tmp_path):
+    writer = asset_extractor._BoundedWriter(cap=10)
+    path = str(tmp_path / "stream.bin")
+    # Потоковые данные больше предела пишутся сразу, в вызывающем потоке
+    assert writer(path, lambda f: f.write(b"z" * 100), size=100) == 100
+    assert writer.pending == 0 and not writer.futures
+    writer(str(tmp_path / "small.bin"), lambda f: f.write(b"s"), size=1)
+    writer.close()
+    assert open(path, "rb").read() == b"z" * 100
+
+def test_raw_payload_is_streamed(tmp_path, monkeypatch):
+    monkeypatch.setattr(asset_extractor, "WRITE_CHUNK", 8)
+    sizes = []
+
+    class Spy(asset_extractor._FileWriter):
+        def __call__(self, out_path, data, size=None):
+            sizes.append((callable(data), size))
+            return super().__call__(out_path, data, size)
+    obj = FakeObj(5, "Mesh", name="mesh", raw=b"m" * 100)
+    typ, nbytes, files = asset_extractor._export_object(obj, str(tmp_path), Spy())
+    assert (typ, nbytes, sizes) == ("Mesh", 100, [(True, 100)])
+    assert open(files[0], "rb").read() == b"m" * 100
+
+# ------------------------------------------------------------------
+# Инкрементальный экспорт: хэш и манифест
+# ------------------------------------------------------------------
+def test_load_manifest_tolerates_garbage(tmp_path):
+    assert asset_extractor.load_manifest(str(tmp_path)) == {}
+    (tmp_path / asset_extractor.MANIFEST_FILE).write_text("[1, 2]", encoding="utf-8")
+    assert asset_extractor.load_manifest(str(tmp_path)) == {}
+    (tmp_path / asset_extractor.MANIFEST_FILE).write_text("{broken", encoding="utf-8")
+    assert asset_extractor.load_manifest(str(tmp_path)) == {}
+    asset_extractor.save_manifest(str(tmp_path), {"b:CAB-a:1": {"hash": "h"}})
+    assert asset_extractor.load_manifest(str(tmp_path)) == {"b:CAB-a:1": {"hash": "h"}}
+
+def test_up_to_date(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"x")
+    entry = {"hash": "h", "files": ["a.png"]}
+    assert asset_extractor._up_to_date(entry, "h", str(tmp_path))
+    assert not asset_extractor._up_to_date(entry, "other", str(tmp_path))
+    assert not asset_extractor._up_to_date(entry, "", str(tmp_path))
+    assert not asset_extractor._up_to_date({"hash": "h", "files": ["gone.png"]}, "h", str(tmp_path))
+    assert not asset_extractor._up_to_date({"hash": "h", "file": "a.png"}, "h", str(tmp_path))
+    assert not asset_extractor._up_to_date("h", "h", str(tmp_path))
+
+def streamed(res: FakeReader, **kw) -> FakeObj:
+    """Текстура, чьи пиксели лежат в CAB-a.resS со смещения 4."""
+    tree = {"m_StreamData": {"path": "archive:/CAB-a/CAB-a.resS", "offset": 4, "size": 4}}
+    return FakeObj(1, "Texture2D", name="tex", raw=b"header", tree=tree, cabs={"CAB-a.resS": res}, **kw)
+
+def test_payload_hash_covers_stream_data():
+    res = FakeReader(bytearray(b"....PIXL...."))
+    digest = asset_extractor.payload_hash(streamed(res))
+    res.data[0:4] = b"xxxx"                      # вне среза объекта
+    assert asset_extractor.payload_hash(streamed(res)) == digest
+    res.data[4:8] = b"PIXM"                      # те же размеры, другие пиксели
+    assert asset_extractor.payload_hash(streamed(res)) != digest
+    # Поток в другом бандле: хэш по сырым данным и адресу среза
+    alone = FakeObj(1, "Texture2D", raw=b"header", tree=streamed(res).tree)
+    assert asset_extractor.payload_hash(alone) not in ("", digest)
+    plain = FakeObj(1, "Texture2D", raw=b"header")
+    assert asset_extractor.payload_hash(plain) != asset_extractor.payload_hash(alone)
+
+def test_changed_audio_stream_is_exported_again(monkeypatch, tmp_path):
+    res = FakeReader(bytearray(b"SAMPLES!"))
+    tree = {"m_Resource": {"m_Source": "CAB-a.resource", "m_Offset": 0, "m_Size": 8}}
+    clip = FakeObj(3, "AudioClip", name="bgm", tree=tree, cabs={"CAB-a.resource": res},
+                   samples={"bgm": b"RIFF"})
+    env = fake_env([clip])
+    monkeypatch.setattr(asset_extractor.UnityPy, "load", lambda bundle: env)
+    bundle, out = bytearray(1), str(tmp_path)
+    assert asset_extractor.extract_all(bundle, out, bundle_name="b") == 1
+    assert asset_extractor.extract_all(bundle, out, bundle_name="b") == 0
+    res.data[:] = b"samples!"
+    assert asset_extractor.extract_all(bundle, out, bundle_name="b") == 1
+    assert (tmp_path / "bgm_3.wav").read_bytes() == b"RIFF"
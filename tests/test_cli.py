@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+import cli
+
+def events(capsys) -> list[dict]:
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+def test_emit_writes_one_json_object_per_line(capsys):
+    cli.emit("file", path="a.dat", bytes=3)
+    cli.emit("summary", text="строка\nещё", obj=object)
+    out = events(capsys)
+    assert out[0] == {"event": "file", "path": "a.dat", "bytes": 3}
+    assert out[1]["text"] == "строка\nещё"
+    assert isinstance(out[1]["obj"], str)
+
+def test_expand_inputs(tmp_path, capsys):
+    (tmp_path / "d" / "sub").mkdir(parents=True)
+    for rel in ("d/a.dat", "d/sub/b.dat", "d/sub/c.txt", "e.dat"):
+        (tmp_path / rel).write_bytes(b"x")
+    d, e = str(tmp_path / "d"), str(tmp_path / "e.dat")
+    got = cli.expand_inputs([d, str(tmp_path / "d" / "**" / "*.dat"), e, str(tmp_path / "nope")], "*.dat")
+    assert [(p.replace(str(tmp_path), ""), b.replace(str(tmp_path), "")) for p, b in got] == [
+        ("/d/a.dat", "/d"), ("/d/sub/b.dat", "/d"), ("/e.dat", "")]
+    assert events(capsys) == [{"event": "error", "path": str(tmp_path / "nope"),
+                               "error": "нет такого файла или каталога"}]
+
+def test_decrypt_command(tmp_path, capsys):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "a.dat").write_bytes(bytes(b ^ 5 for b in b"UnityFS\x00payload"))
+    (src / "a_DEC.dat").write_bytes(b"UnityFS\x00payload")
+    (src / "bad.dat").write_bytes(b"\x00" * 16)
+    status = cli.main(["decrypt", str(src), "-o", str(tmp_path / "out"), "-j", "1"])
+    out = events(capsys)
+    assert status == 1
+    files = {e["path"].rsplit("/", 1)[-1]: e for e in out if e["event"] == "file"}
+    assert set(files) == {"a.dat", "bad.dat"}          # _DEC-файлы не входят
+    assert files["a.dat"]["status"] == "ok" and files["a.dat"]["key"] == 5
+    assert files["bad.dat"]["status"] == "failed"
+    assert out[-1]["event"] == "summary" and (out[-1]["ok"], out[-1]["failed"]) == (1, 1)
+    assert (tmp_path / "out" / "a.dat").read_bytes() == b"UnityFS\x00payload"
+
+def test_csv_and_glossary_commands(tmp_path, capsys):
+    pytest.importorskip("pandas")
+    csv = tmp_path / "story.csv"
+    csv.write_text("File,StepID,Character,EnglishText,RussianTranslation\n"
+                   "s1,1,A,Vertin waits,\n"
+                   "s1,2,B,Hello,Привет\n", encoding="utf-8")
+    glossary = tmp_path / "glossary.json"
+    glossary.write_text(json.dumps({"Vertin": "Вертин"}), encoding="utf-8")
+    assert cli.main(["csv", str(csv)]) == 0
+    summary = events(capsys)[-1]
+    assert (summary["rows"], summary["translated"], summary["scenes"]) == (2, 1, 1)
+    assert cli.main(["glossary", str(csv), "-g", str(glossary), "--write-csv"]) == 0
+    assert events(capsys)[-1] == {"event": "summary", "path": str(csv), "changed": 1, "saved": True}
+    assert "Вертин waits" in csv.read_text(encoding="utf-8")
+
+def test_export_memory_options(tmp_path, monkeypatch, capsys):
+    asset_extractor = pytest.importorskip("asset_extractor")
+    calls = []
+    monkeypatch.setattr(cli, "_load_bundle", lambda path: bytearray(1))
+    monkeypatch.setattr(asset_extractor, "extract_all", lambda *a, **kw: calls.append(kw))
+    (tmp_path / "a.dat").write_bytes(b"x")
+    argv = ["export", str(tmp_path / "a.dat"), "-o", str(tmp_path / "out"), "-j", "2"]
+    assert cli.main(argv + ["--memory-cap", "64", "--memory-budget", "2048"]) == 0
+    assert calls[-1]["memory_cap"] == 64 * 2**20 and calls[-1]["memory_budget"] == 2048 * 2**20
+    assert cli.main(argv) == 0
+    assert calls[-1]["memory_cap"] == asset_extractor.MEMORY_CAP and calls[-1]["memory_budget"] is None
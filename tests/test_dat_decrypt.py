@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+import dat_decrypt
+from dat_decrypt import find_xor_key, SIGNATURES
+
+def xor(data: bytes, key: int) -> bytes:
+    return bytes(b ^ key for b in data)
+
+@pytest.fixture
+def encrypted(tmp_path):
+    plain = b"UnityFS\x00" + os.urandom(50_000)
+    path = tmp_path / "bundle.dat"
+    path.write_bytes(xor(plain, 0x3c))
+    return str(path), plain
+
+def test_decrypt_dat_round_trip(encrypted, tmp_path):
+    src, plain = encrypted
+    out = str(tmp_path / "bundle_DEC.dat")
+    assert dat_decrypt.decrypt_dat(src, out, chunk_size=4096)
+    with open(out, "rb") as f:
+        assert f.read() == plain
+
+def test_decrypt_dat_without_key(tmp_path):
+    src = tmp_path / "junk.dat"
+    src.write_bytes(b"\x01\x02junk")
+    assert not dat_decrypt.decrypt_dat(str(src), str(tmp_path / "out.dat"))
+
+def test_decrypt_tree_mirrors_and_skips(tmp_path):
+    src_dir, out_dir = tmp_path / "src", tmp_path / "out"
+    (src_dir / "sub").mkdir(parents=True)
+    (src_dir / "a.dat").write_bytes(xor(b"UnityFS\x00abc", 9))
+    (src_dir / "sub" / "b.dat").write_bytes(xor(b"UnityWeb\x00def", 200))
+    (src_dir / "bad.dat").write_bytes(b"\x00\x00\x00\x00\x00\x00\x00\x00")
+    seen = []
+    summary = dat_decrypt.decrypt_tree(str(src_dir), str(out_dir), workers=1, on_result=seen.append)
+    assert (summary["files"], summary["ok"], summary["failed"]) == (3, 2, 1)
+    assert len(seen) == 3
+    assert (out_dir / "sub" / "b.dat").read_bytes() == b"UnityWeb\x00def"
+    again = dat_decrypt.decrypt_tree(str(src_dir), str(out_dir), workers=1)
+    assert (again["ok"], again["skipped"], again["failed"]) == (0, 2, 1)
+
+def test_decrypt_to_bytes_matches_file(encrypted):
+    src, plain = encrypted
+    buf = dat_decrypt.decrypt_to_bytes(src, chunk_size=1000)
+    assert isinstance(buf, bytearray) and bytes(buf) == plain
+
+def test_decrypt_to_bytes_without_key(tmp_path):
+    src = tmp_path / "junk.dat"
+    src.write_bytes(b"\x01\x02junk")
+    assert dat_decrypt.decrypt_to_bytes(str(src)) is None
+
+@pytest.mark.parametrize("sig", SIGNATURES)
+@pytest.mark.parametrize("key", [0x00, 0x01, 0x5a, 0xff])
+def test_find_xor_key_solves_every_signature(sig, key):
+    header = xor(sig + b"\x00\x00\x00\x06 5.x.x", key)
+    assert find_xor_key(header) == key
+
+def test_plain_bundle_has_key_zero():
+    assert find_xor_key(b"UnityFS\x00\x00\x00\x00\x07") == 0
+
+def test_unknown_or_short_header():
+    assert find_xor_key(b"\x01\x02garbage bytes") is None
+    assert find_xor_key(b"Uni") is None
+    assert find_xor_key(b"") is None
+
+def test_single_signature_argument():
+    assert find_xor_key(xor(b"MAGIC!", 7), b"MAGIC!") == 7
+    assert find_xor_key(xor(b"UnityFS", 7), b"MAGIC!") is None
+
+def test_detect_key(encrypted):
+    assert dat_decrypt.detect_key(encrypted[0]) == 0x3c
@@ -0,0 +1,127 @@
+import os
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+import file_loader
+
+HEADER = "File,StepID,Character,EnglishText,RussianTranslation\n"
+
+@pytest.fixture
+def csv(tmp_path):
+    path = tmp_path / "story.csv"
+    path.write_text(HEADER + 's1,1,A,"Hello\nthere",\n'
+                             "s1,2,B,<b>Bye</b>,Пока\n"
+                             "s2,3,A,Again,\n", encoding="utf-8")
+    return str(path)
+
+def touch_later(path: str) -> None:
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+def test_load_creates_project_and_reads_it_back(csv):
+    df = file_loader.load_csv(csv)
+    assert df["EnglishText"].tolist() == ["Hello\nthere", "<b>Bye</b>", "Again"]
+    assert isinstance(df["File"].dtype, pd.CategoricalDtype)
+    assert df["StepID"].dtype.kind == "i"
+    assert os.path.exists(file_loader.project_path(csv))
+    cached = file_loader.load_csv(csv)
+    assert cached.to_dict() == df.to_dict()
+    assert isinstance(cached["File"].dtype, pd.CategoricalDtype)
+
+def test_saved_project_survives_unchanged_csv(csv):
+    df = file_loader.load_csv(csv)
+    df.iat[0, 4] = "Привет"
+    file_loader.save_project(df, csv)
+    assert file_loader.load_csv(csv)["RussianTranslation"].tolist() == ["Привет", "Пока", ""]
+
+def test_changed_csv_is_merged_not_overwritten(csv):
+    df = file_loader.load_csv(csv)
+    df.iat[0, 4] = "Привет"
+    df.iat[1, 4] = "До встречи"
+    file_loader.save_project(df, csv)
+    with open(csv, "w", encoding="utf-8") as f:
+        f.write(HEADER + 's1,1,A,"Hello\nthere",\n'
+                         "s1,2,B,<b>Bye</b>,Пока-пока\n"
+                         "s2,3,A,Again and again,\n"
+                         "s3,4,C,New line,\n")
+    touch_later(csv)
+    merged = []
+    df = file_loader.load_csv(csv, on_merge=merged.append)
+    assert df["RussianTranslation"].tolist() == ["Привет", "До встречи", "", ""]
+    assert merged == [{"merged": 2, "conflicts": 1, "orphaned": 0}]
+    # Проект не перезаписан: при следующем открытии правки снова на месте
+    assert file_loader.load_csv(csv)["RussianTranslation"].tolist()[:2] == ["Привет", "До встречи"]
+
+def test_translation_for_changed_english_is_reported(csv):
+    df = file_loader.load_csv(csv)
+    df.iat[2, 4] = "Снова"
+    file_loader.save_project(df, csv)
+    with open(csv, "w", encoding="utf-8") as f:
+        f.write(HEADER + "s2,3,A,Once more,\n")
+    touch_later(csv)
+    merged = []
+    df = file_loader.load_csv(csv, on_merge=merged.append)
+    assert df["RussianTranslation"].tolist() == [""]
+    # «Снова» — английский изменился, «Пока» — строки больше нет
+    assert merged == [{"merged": 0, "conflicts": 0, "orphaned": 2}]
+
+def test_changed_csv_replaces_synced_cache(csv):
+    file_loader.load_csv(csv)
+    with open(csv, "a", encoding="utf-8") as f:
+        f.write("s3,4,C,New,\n")
+    touch_later(csv)
+    merged = []
+    assert len(file_loader.load_csv(csv, on_merge=merged.append)) == 4
+    assert merged == []
+
+def test_save_csv_writes_csv_and_marks_project_synced(csv, tmp_path):
+    df = file_loader.load_csv(csv)
+    df.iat[2, 4] = "Снова"
+    out = str(tmp_path / "export.csv")
+    file_loader.save_csv(df, out)
+    assert pd.read_csv(out, keep_default_na=False)["RussianTranslation"].tolist() == ["", "Пока", "Снова"]
+    project = file_loader._read_project(out)
+    assert project["synced"] is True
+    assert not os.path.exists(out + ".tmp")
+
+def test_project_file_never_executes_code(csv):
+    file_loader.load_csv(csv)
+    # Подложенный pickle или мусор — просто «нет проекта», CSV читается заново
+    import pickle
+    with open(file_loader.project_path(csv), "wb") as f:
+        pickle.dump({"version": 3}, f)
+    assert file_loader._read_project(csv) is None
+    with open(file_loader.project_path(csv), "wb") as f:
+        f.write(file_loader.PROJECT_MAGIC + b"\xff" * 8)
+    assert file_loader._read_project(csv) is None
+    assert len(file_loader.load_csv(csv)) == 3
+
+def test_project_rejects_object_buffers(csv):
+    import json, struct
+    file_loader.load_csv(csv)
+    header = {"version": file_loader.PROJECT_VERSION, "rows": 1, "csv": None, "synced": True,
+              "columns": [{"name": "x", "kind": "numeric", "data": {"offset": 0, "length": 8, "dtype": "|O"}}]}
+    head = json.dumps(header).encode()
+    with open(file_loader.project_path(csv), "wb") as f:
+        f.write(file_loader.PROJECT_MAGIC + struct.pack("<Q", len(head)) + head + b"\x00" * 8)
+    assert file_loader._read_project(csv) is None
+
+def test_missing_column(tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_text("File,StepID,EnglishText\nf,1,x\n", encoding="utf-8")
+    with pytest.raises(KeyError):
+        file_loader.load_csv(str(path))
+
+def test_chunked_read_keeps_categories(csv):
+    seen = []
+    df = file_loader.read_csv_chunked(csv, chunk_rows=1,
+                                      on_chunk=lambda chunk, done, total: seen.append((len(chunk), done <= total)))
+    assert seen == [(1, True)] * 3
+    assert isinstance(df["File"].dtype, pd.CategoricalDtype)
+    assert df["File"].tolist() == ["s1", "s1", "s2"]
+
+def test_cancelled_load_writes_no_project(csv):
+    assert file_loader.load_csv(csv, chunk_rows=1, on_chunk=lambda *args: False) is None
+    assert not os.path.exists(file_loader.project_path(csv))
@@ -0,0 +1,51 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from glossary_engine import GlossaryEngine
+
+def substitute(glossary, en, ru="", whole_words=True):
+    engine = GlossaryEngine(glossary, whole_words=whole_words)
+    changed, values = engine.substitute(pd.Series([en]), pd.Series([ru]))
+    return values[0] if changed else None
+
+def test_longest_term_wins():
+    glossary = {"Ship": "Корабль", "Black Ship": "Чёрный корабль"}
+    assert substitute(glossary, "The Black Ship and a Ship") == "The Чёрный корабль and a Корабль"
+
+def test_terms_sharing_a_prefix():
+    glossary = {"Ship": "Корабль", "Ships": "Корабли", "Shipyard": "Верфь", "Sh": "Ш"}
+    assert substitute(glossary, "Ships, Shipment, Shipyard, Ship, Sh") == "Корабли, Shipment, Верфь, Корабль, Ш"
+
+def test_large_glossary_is_one_trie():
+    glossary = {f"term{i}": f"т{i}" for i in range(3000)}
+    engine = GlossaryEngine(glossary)
+    # Общий префикс «term» в выражении один раз, а не 3000
+    assert engine.regex.pattern.count("term") == 1
+    assert substitute(glossary, "term12 term1 term123x") == "т12 т1 term123x"
+
+def test_whole_words_only():
+    glossary = {"attack": "атака"}
+    assert substitute(glossary, "attacked") is None
+    assert substitute(glossary, "counterattack attack!") == "counterattack атака!"
+    assert substitute(glossary, "attacked", whole_words=False) == "атакаed"
+
+def test_boundary_checked_only_on_word_side():
+    # У термина с точкой на конце граница справа не проверяется
+    assert substitute({"Mr.": "г-н"}, "Mr.Smith") == "г-нSmith"
+
+def test_existing_translation_is_the_base():
+    assert substitute({"Vertin": "Вертин"}, "Vertin said", "Vertin сказала") == "Вертин сказала"
+
+def test_apply_writes_only_changed_rows(make_df):
+    df = make_df([("f", "1", "A", "Vertin", ""),
+                  ("f", "2", "A", "nothing here", ""),
+                  ("f", "3", "A", "Vertin", "Вертин")])
+    changed = GlossaryEngine({"Vertin": "Вертин"}).apply(df)
+    assert changed == [0]
+    assert df["RussianTranslation"].tolist() == ["Вертин", "", "Вертин"]
+
+def test_empty_glossary_changes_nothing(make_df):
+    df = make_df([("f", "1", "A", "text", "")])
+    assert GlossaryEngine({}).apply(df) == []
+    assert GlossaryEngine({"": "x"}).regex is None
@@ -0,0 +1,33 @@
+import pytest
+
+from localization import extract_tokens, RowIndex, ProgressTracker
+
+def test_extract_tokens():
+    assert extract_tokens("<color=#fff>{0}</color>\\n%s #name: x") == \
+        ["<color=#fff>", "{0}", "</color>", "\\n", "%s", "#name:"]
+    assert extract_tokens(None) == []
+
+@pytest.fixture
+def df(make_df):
+    # Сцена b разорвана строкой сцены a — индекс должен это пережить
+    return make_df([("a", "1", "X", "one", "раз"),
+                    ("a", "2", "X", "two", ""),
+                    ("b", "1", "Y", "three", ""),
+                    ("a", "3", "X", "four", "четыре")])
+
+def test_row_index(df):
+    idx = RowIndex(df)
+    assert idx.names == ["a", "b"] and idx.by_name == {"a": 0, "b": 1}
+    assert [rows.tolist() for rows in idx.rows] == [[0, 1, 3], [2]]
+    assert idx.scene_of.tolist() == [0, 0, 1, 0]
+    assert idx.offset_of.tolist() == [0, 1, 0, 2]
+
+def test_progress_tracker(df):
+    progress = ProgressTracker(df, RowIndex(df))
+    assert progress.scene_stats(0) == (3, 2, 9)
+    assert progress.status(0) == "partial" and progress.status(1) == "empty"
+    assert progress.update(2, "три") is True
+    assert progress.status(1) == "done"
+    assert progress.update(2, "три!") is False
+    assert progress.update(0, "") is True
+    assert progress.totals() == (4, 2, 10)
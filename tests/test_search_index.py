@@ -0,0 +1,44 @@
+import re
+
+import pytest
+
+from search_index import SearchIndex
+
+@pytest.fixture
+def index(make_df):
+    return SearchIndex(make_df([
+        ("f", "1", "A", "The cat sat", "Кот сидел"),
+        ("f", "2", "A", "Concatenate", ""),
+        ("f", "3", "B", "CAT!", "кот"),
+        ("f", "4", "B", "dog", "Собака"),
+    ]))
+
+def test_substring_is_case_insensitive(index):
+    assert index.search("cat") == [0, 1, 2]
+    assert index.search("cat", case_sensitive=True) == [0, 1]
+
+def test_word_mode_respects_boundaries(index):
+    assert index.search("cat", "word") == [0, 2]
+    # Граница строк склеенной колонки — тоже граница слова
+    assert index.search("sat", "word") == [0]
+
+def test_columns_filter(index):
+    assert index.search("кот", columns=("RussianTranslation",)) == [0, 2]
+    assert index.search("кот", columns=("EnglishText",)) == []
+
+def test_regex_is_checked_per_row(index):
+    assert index.search(r"^c.*t", "regex") == [1, 2]
+    assert index.search(r"sat.*Conc", "regex") == []
+    with pytest.raises(re.error):
+        index.search("(", "regex")
+
+def test_invalidate_after_edit(index):
+    assert index.search("кот-", columns=("RussianTranslation",)) == []
+    index.df.iat[3, 4] = "Кот-собака"
+    # Склеенная колонка закэширована до invalidate()
+    assert index.search("кот-", columns=("RussianTranslation",)) == []
+    index.invalidate("RussianTranslation")
+    assert index.search("кот-", columns=("RussianTranslation",)) == [3]
+
+def test_empty_pattern(index):
+    assert index.search("") == []
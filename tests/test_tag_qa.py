@@ -0,0 +1,36 @@
+import pytest
+
+from localization import extract_tokens
+from tag_qa import check_tokens
+
+def issues(en: str, ru: str) -> list[str]:
+    return check_tokens(extract_tokens(en), extract_tokens(ru), ru)
+
+def test_matching_tags_are_fine():
+    assert issues("<b>Hi</b> {0}\\n", "<b>Привет</b> {0}\\n") == []
+
+def test_missing_and_extra_tags():
+    assert issues("<b>Hi</b>", "Привет</b>") == ["нет тегов: <b>"]
+    assert issues("Hi", "<i>Привет</i>") == ["лишние теги: <i> </i>"]
+
+def test_reordered_tags():
+    assert issues("{0} and {1}", "{1} и {0}") == ["порядок тегов: {1} {0}"]
+
+@pytest.mark.parametrize("ru, broken", [("{ 0} шт.", "{ 0}"), ("{0 шт.", "{0 "), ("｛0｝ шт.", "｛0｝")])
+def test_broken_placeholders(ru, broken):
+    found = issues("{0} pcs.", ru)
+    assert found[-1] == "сломан плейсхолдер: " + broken
+
+def test_tagqa_tracks_edits(make_df):
+    from tag_qa import TagQA
+    df = make_df([("f", "1", "A", "<b>x</b>", "<b>x"),
+                  ("f", "2", "A", "{0}", ""),
+                  ("f", "3", "A", "plain", "просто")])
+    qa = TagQA(df)
+    assert [pos for pos, _ in qa.report()] == [0]
+    assert qa.check(1, "{ 0}") == ["нет тегов: {0}", "сломан плейсхолдер: { 0}"]
+    assert qa.check(1, "") == []
+    assert qa.update(0, "<b>x</b>") == []
+    assert qa.report() == []
+    assert qa.update(2, "<i>просто") != []
+    assert [pos for pos, _ in qa.report()] == [2]
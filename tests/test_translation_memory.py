@@ -0,0 +1,104 @@
+import sqlite3
+import threading
+
+import pytest
+
+import translation_memory
+from translation_memory import TranslationMemory, normalize, unmask
+
+@pytest.fixture
+def tm(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "tm.sqlite"))
+    yield memory
+    memory.close()
+
+def test_normalize_masks_tags_and_spaces():
+    assert normalize("  <b>Hi</b>   there {0} ") == normalize("<i>Hi</i> there {1}")
+    assert unmask("\x01a\x01", ["<b>", "</b>"]) == "<b>a</b>"
+    assert unmask("\x01a", ["<b>", "</b>"]) is None
+
+def test_exact_lookup_uses_the_lines_own_tags(tm):
+    tm.add("<b>Run</b>, {0}!", "<b>Беги</b>, {0}!")
+    assert tm.lookup("<color=red>Run</color>, {1}!") == "<color=red>Беги</color>, {1}!"
+    assert tm.lookup("Run, {0}!") is None      # другое число тегов — другой ключ
+    assert tm.lookup("Walk") is None
+
+def test_prefill_and_stats(tm):
+    tm.add_many([("Yes.", "Да."), ("No.", "Нет."), ("", "skip"), ("x", "")])
+    hits, rest = tm.prefill([(0, "Yes."), (1, "Maybe."), (2, "No.")])
+    assert hits == {0: "Да.", 2: "Нет."}
+    assert rest == [(1, "Maybe.")]
+    stats = tm.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 2)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+    assert stats["tokens_saved"] > 0
+
+def test_fuzzy_finds_best_match_beyond_limit(tm):
+    # Много кандидатов той же длины, лучший добавлен последним
+    tm.add_many((f"Filler line number {i:04d} here", f"Заполнитель {i}") for i in range(2000))
+    tm.add("The dragon awakens tonight", "Дракон пробуждается этой ночью")
+    score, source, target = tm.fuzzy("The dragon awakens tonight!", limit=20)
+    assert source == "The dragon awakens tonight"
+    assert target == "Дракон пробуждается этой ночью"
+    assert score > 0.9
+
+def test_fuzzy_is_deterministic_and_thresholded(tm):
+    tm.add_many([("Open the gate", "Открой ворота"), ("Open the gates", "Откройте ворота")])
+    first = tm.fuzzy("Open the gate.")
+    assert all(tm.fuzzy("Open the gate.") == first for _ in range(5))
+    assert first[1] == "Open the gate"
+    assert tm.fuzzy("Something else entirely") is None
+    assert tm.fuzzy("") is None
+
+def test_fuzzy_masks_tags_in_suggestion(tm):
+    tm.add("<b>Careful</b> now", "<b>Осторожно</b> сейчас")
+    assert tm.fuzzy("<i>Careful</i> now!")[2] == "…Осторожно… сейчас"
+
+def test_word_index_is_built_for_old_databases(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    TranslationMemory(path).close()
+    db = sqlite3.connect(path)
+    db.execute("DROP TABLE tm_words")
+    db.execute("INSERT INTO tm VALUES ('hello world', 'Hello world', 'Привет, мир', 0)")
+    db.commit()
+    db.close()
+    tm = TranslationMemory(path)
+    try:
+        assert tm.fuzzy("Hello world!")[2] == "Привет, мир"
+    finally:
+        tm.close()
+
+def test_common_words_are_pruned_from_candidates(tm, monkeypatch):
+    monkeypatch.setattr(translation_memory, "MAX_WORD_KEYS", 10)
+    tm.add_many((f"you and the other {i:03d}", f"ты и другой {i}") for i in range(100))
+    tm.add("you and the dragon", "ты и дракон")
+    assert tm.db.execute("SELECT n FROM tm_df WHERE word = 'you'").fetchone()[0] == 101
+    assert tm._selective_words(["you", "and", "the", "dragon", "unknown"]) == ["dragon"]
+    assert tm.fuzzy("You and the dragon!", limit=5)[2] == "ты и дракон"
+    # Только частые слова — отбор по самым редким из них
+    assert tm._selective_words(["you", "the", "other"]) == ["other", "the", "you"]
+    assert tm.fuzzy("you and the other 042")[2] == "ты и другой 42"
+
+def test_word_frequencies_are_built_for_old_databases(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    tm = TranslationMemory(path)
+    tm.add_many([("red fox", "рыжая лиса"), ("red sun", "красное солнце")])
+    tm.close()
+    db = sqlite3.connect(path)
+    db.execute("DROP TABLE tm_df")
+    db.commit()
+    db.close()
+    tm = TranslationMemory(path)
+    try:
+        assert dict(tm.db.execute("SELECT word, n FROM tm_df")) == {"red": 2, "fox": 1, "sun": 1}
+    finally:
+        tm.close()
+
+def test_fuzzy_from_worker_thread(tm):
+    # GUI ищет подсказки в фоновой задаче, а пишет в память из главного потока
+    tm.add("The gate is open", "Ворота открыты")
+    results = []
+    worker = threading.Thread(target=lambda: results.append(tm.fuzzy("The gate is open!")))
+    worker.start()
+    worker.join()
+    assert results[0][2] == "Ворота открыты"
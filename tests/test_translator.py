@@ -0,0 +1,145 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import translator
+from translator import Translator, PROMPT, NEWLINE_MARK
+
+class RateLimitError(Exception):
+    status_code = 429
+
+class StubClient:
+    """
+    Заглушка chat.completions.create: отвечает «N. RU:<текст>» на каждую
+    пронумерованную строку запроса. drop — исходные строки, которые
+    пропускаются в первом ответе (sticky — во всех); fail — сколько первых
+    вызовов падают с исключением error.
+    """
+    def __init__(self, drop=(), sticky=False, fail=0, error=RateLimitError):
+        self.chat = SimpleNamespace(completions=self)
+        self.drop = set(drop)
+        self.sticky = sticky
+        self.fail = fail
+        self.error = error
+        self.requests: list[list[str]] = []
+        self._lock = threading.Lock()
+
+    def create(self, model, messages, temperature):
+        with self._lock:
+            if self.fail:
+                self.fail -= 1
+                raise self.error("stub")
+            lines = messages[0]["content"][len(PROMPT):].split("\n")
+            self.requests.append(lines)
+        reply = []
+        for line in lines:
+            num, text = line.split(". ", 1)
+            if text in self.drop:
+                if not self.sticky:
+                    self.drop.discard(text)
+                continue
+            reply.append(f"{num}. RU:{text}")
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="\n".join(reply)))],
+            usage=SimpleNamespace(prompt_tokens=10, completion_tokens=7))
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    delays = []
+    monkeypatch.setattr(translator.time, "sleep", delays.append)
+    return delays
+
+def test_make_batches_respects_budget():
+    items = [(i, "x" * 30) for i in range(10)]    # 14 «токенов» на строку
+    batches = translator.make_batches(items, 50)
+    assert [len(b) for b in batches] == [3, 3, 3, 1]
+    assert [pos for b in batches for pos, _ in b] == list(range(10))
+
+def test_translate_all_lines():
+    client = StubClient()
+    done, failed = Translator(client=client, token_budget=10_000).translate([(5, "a"), (9, "b")])
+    assert done == {5: "RU:a", 9: "RU:b"}
+    assert failed == []
+    assert client.requests == [["1. a", "2. b"]]
+
+def test_missing_lines_are_retried_alone():
+    client = StubClient(drop={"b"})
+    batches = []
+    tr = Translator(client=client, token_budget=10_000)
+    done, failed = tr.translate([(0, "a"), (1, "b"), (2, "c")], on_batch=batches.append)
+    assert done == {0: "RU:a", 1: "RU:b", 2: "RU:c"}
+    assert failed == []
+    # Повторный запрос — только строка, которой не было в ответе
+    assert client.requests[1] == ["1. b"]
+    assert batches == [{0: "RU:a", 2: "RU:c"}, {1: "RU:b"}]
+    assert tr.usage == {"requests": 2, "prompt_tokens": 20, "completion_tokens": 14}
+
+def test_lines_missing_after_all_retries_are_reported():
+    client = StubClient(drop={"b"}, sticky=True)
+    done, failed = Translator(client=client, max_retries=2).translate([(0, "a"), (1, "b")])
+    assert done == {0: "RU:a"}
+    assert failed == [1]
+    assert len(client.requests) == 3
+
+def test_rate_limit_backs_off_exponentially(no_sleep):
+    client = StubClient(fail=3)
+    done, failed = Translator(client=client, backoff=1.0).translate([(0, "a")])
+    assert done == {0: "RU:a"} and failed == []
+    assert len(no_sleep) == 3
+    # Пауза удваивается, джиттер — не больше половины паузы
+    for delay, base in zip(no_sleep, (1.0, 2.0, 4.0)):
+        assert base <= delay <= base * 1.5
+
+def test_status_code_429_counts_as_rate_limit(no_sleep):
+    class HttpError(Exception):
+        status_code = 429
+    client = StubClient(fail=1, error=HttpError)
+    done, _ = Translator(client=client, backoff=0.0).translate([(0, "a")])
+    assert done == {0: "RU:a"}
+    assert len(no_sleep) == 1
+
+def test_rate_limit_gives_up_after_max_retries(no_sleep):
+    client = StubClient(fail=100)
+    tr = Translator(client=client, max_retries=2, backoff=1.0)
+    done, failed = tr.translate([(0, "a")])
+    assert done == {} and failed == [0]
+    assert isinstance(tr.last_error, RateLimitError)
+    # По 2 паузы на каждый из 3 проходов по непереведённым строкам
+    assert len(no_sleep) == 6
+
+def test_insufficient_quota_is_not_retried(no_sleep):
+    class QuotaError(RateLimitError):
+        code = "insufficient_quota"
+    client = StubClient(fail=100, error=QuotaError)
+    tr = Translator(client=client, max_retries=1)
+    done, failed = tr.translate([(0, "a")])
+    assert done == {} and failed == [0]
+    assert isinstance(tr.last_error, QuotaError)
+    assert no_sleep == []
+
+def test_other_errors_fail_the_batch_without_sleeping(no_sleep):
+    client = StubClient(fail=100, error=ValueError)
+    tr = Translator(client=client, max_retries=1)
+    done, failed = tr.translate([(0, "a"), (1, "b")])
+    assert done == {} and failed == [0, 1]
+    assert isinstance(tr.last_error, ValueError)
+    assert no_sleep == []
+
+def test_cancel_stops_before_requests():
+    client = StubClient()
+    tr = Translator(client=client)
+    tr.cancel()
+    assert tr.translate([(0, "a")]) == ({}, [0])
+    assert client.requests == []
+
+def test_multiline_source_keeps_numbering():
+    client = StubClient()
+    done, failed = Translator(client=client).translate([(0, "one\ntwo"), (1, "three\r\nfour"), (2, "x")])
+    assert client.requests[0] == [f"1. one{NEWLINE_MARK}two", f"2. three{NEWLINE_MARK}four", "3. x"]
+    assert done == {0: "RU:one\ntwo", 1: "RU:three\r\nfour", 2: "RU:x"}
+    assert failed == []
+
+def test_restore_newlines_leaves_plain_lines_alone():
+    assert translator.restore_newlines(f"a{NEWLINE_MARK}b", "ab") == f"a{NEWLINE_MARK}b"
+    assert translator.restore_newlines(f"a{NEWLINE_MARK}b", f"a{NEWLINE_MARK}\nb") == f"a{NEWLINE_MARK}b"
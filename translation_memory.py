@@ -0,0 +1,209 @@
+import re, time, sqlite3, difflib, threading
+from localization import TAG_REGEX
+from translator import estimate_tokens
+
+# Файл базы по умолчанию (рядом с glossary.json)
+TM_FILE = "translation_memory.sqlite"
+# Маска тега в ключе и сохранённом переводе
+_MASK = "\x01"
+_SPACES = re.compile(r"\s+")
+# Слова ключа для отбора кандидатов нечёткого поиска (однобуквенные не берём)
+_WORDS = re.compile(r"\w{2,}")
+# Не больше стольких слов запроса в предварительном отборе
+MAX_QUERY_WORDS = 200
+# Слово, которое есть в большем числе ключей, считается служебным («the»,
+# «you») и в отбор не идёт: иначе GROUP BY перебирает почти всю память.
+# Если служебные все слова запроса, берутся RARE_FALLBACK_WORDS самых
+# редких из них, и от каждого — не больше MAX_WORD_KEYS ключей
+MAX_WORD_KEYS = 2000
+RARE_FALLBACK_WORDS = 3
+
+def mask_tags(text: str) -> tuple[str, list[str]]:
+    """Текст с заменёнными тегами и сами теги по порядку."""
+    tags = TAG_REGEX.findall(text or "")
+    return TAG_REGEX.sub(_MASK, text or ""), tags
+
+def normalize(text: str) -> str:
+    """Ключ памяти: теги замаскированы, пробелы схлопнуты."""
+    return _SPACES.sub(" ", mask_tags(text)[0]).strip()
+
+def key_words(key: str) -> list[str]:
+    """Различные слова ключа в нижнем регистре (по алфавиту)."""
+    return sorted(set(_WORDS.findall(key.lower())))
+
+def unmask(target: str, tags: list[str]) -> str | None:
+    """Подставляет теги строки в сохранённый перевод; None, если их число не сходится."""
+    parts = target.split(_MASK)
+    if len(parts) - 1 != len(tags):
+        return None
+    out = [parts[0]]
+    for tag, part in zip(tags, parts[1:]):
+        out.append(tag)
+        out.append(part)
+    return "".join(out)
+
+class TranslationMemory:
+    """
+    Постоянная память переводов в SQLite: нормализованный исходник →
+    перевод с замаскированными тегами. Точные совпадения заполняются
+    локально до обращения к API, нечёткие (difflib, порог threshold)
+    предлагаются как подсказки; кандидатов для них отбирает индекс
+    слов tm_words (tm_df — в скольких ключах встречается слово).
+    Счётчики попаданий и сэкономленных токенов хранятся в той же базе.
+    Соединение общее для всех потоков, обращения к нему идут под lock:
+    GUI ищет подсказки в фоновой задаче, а пишет в память из главного потока.
+    """
+    def __init__(self, path: str = TM_FILE, threshold: float = 0.85):
+        self.path = path
+        self.threshold = threshold
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS tm (
+                key TEXT PRIMARY KEY, source TEXT, target TEXT, updated REAL);
+            CREATE INDEX IF NOT EXISTS tm_len ON tm (length(key));
+            CREATE TABLE IF NOT EXISTS tm_words (
+                word TEXT, key TEXT, PRIMARY KEY (word, key)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS tm_df (word TEXT PRIMARY KEY, n INTEGER) WITHOUT ROWID;
+            CREATE TRIGGER IF NOT EXISTS tm_words_df AFTER INSERT ON tm_words BEGIN
+                INSERT INTO tm_df (word, n) VALUES (new.word, 1)
+                ON CONFLICT(word) DO UPDATE SET n = n + 1;
+            END;
+            CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER);
+        """)
+        # База из версии без индекса слов — строим его один раз
+        if self.db.execute("SELECT EXISTS (SELECT 1 FROM tm) AND NOT EXISTS (SELECT 1 FROM tm_words)").fetchone()[0]:
+            with self.db:
+                self._index_words([key for (key,) in self.db.execute("SELECT key FROM tm").fetchall()])
+        # Индекс слов есть, а частот нет — считаем их по индексу
+        if self.db.execute("SELECT EXISTS (SELECT 1 FROM tm_words) AND NOT EXISTS (SELECT 1 FROM tm_df)").fetchone()[0]:
+            with self.db:
+                self.db.execute("INSERT INTO tm_df (word, n) SELECT word, COUNT(*) FROM tm_words GROUP BY word")
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+
+    # --- запись --------------------------------------------------------
+    def add(self, source: str, target: str) -> None:
+        self.add_many([(source, target)])
+
+    def add_many(self, pairs) -> None:
+        rows = []
+        now = time.time()
+        for source, target in pairs:
+            if not source or not target:
+                continue
+            rows.append((normalize(source), source, mask_tags(target)[0], now))
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT INTO tm (key, source, target, updated) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET source=excluded.source, "
+                "target=excluded.target, updated=excluded.updated", rows)
+            self._index_words(row[0] for row in rows)
+
+    def _index_words(self, keys) -> None:
+        self.db.executemany("INSERT OR IGNORE INTO tm_words (word, key) VALUES (?, ?)",
+                            ((word, key) for key in keys for word in key_words(key)))
+
+    # --- поиск ---------------------------------------------------------
+    def lookup(self, source: str) -> str | None:
+        """Точное совпадение с подставленными тегами строки source."""
+        key = normalize(source)
+        with self.lock:
+            row = self.db.execute("SELECT target FROM tm WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return unmask(row[0], mask_tags(source)[1])
+
+    def fuzzy(self, source: str, limit: int = 500) -> tuple[float, str, str] | None:
+        """
+        Лучшее нечёткое совпадение (схожесть, исходник, перевод) не ниже
+        threshold. Кандидаты — ключи подходящей длины, у которых больше
+        всего общих редких слов с запросом (при равенстве — ближе по
+        длине); из них сравниваются первые limit. Служебные слова в отбор
+        не идут (см. MAX_WORD_KEYS). Порядок детерминирован, так что
+        один и тот же запрос всегда даёт один и тот же ответ.
+        """
+        key = normalize(source)
+        if not key:
+            return None
+        lo, hi = int(len(key) * self.threshold), int(len(key) / self.threshold) + 1
+        with self.lock:
+            words = self._selective_words(key_words(key)[:MAX_QUERY_WORDS])
+            if words:
+                # От каждого слова — не больше MAX_WORD_KEYS ключей, и только потом GROUP BY
+                postings = " UNION ALL ".join(
+                    ["SELECT * FROM (SELECT key FROM tm_words WHERE word = ? "
+                     "AND length(key) BETWEEN ? AND ? LIMIT ?)"] * len(words))
+                args = [arg for word in words for arg in (word, lo, hi, MAX_WORD_KEYS)]
+                candidates = self.db.execute(
+                    f"SELECT tm.key, tm.source, tm.target FROM ({postings}) w JOIN tm ON tm.key = w.key "
+                    "GROUP BY w.key ORDER BY COUNT(*) DESC, abs(length(w.key) - ?), w.key LIMIT ?",
+                    (*args, len(key), limit)).fetchall()
+            else:
+                # Ключ без слов (знаки, теги) — только по длине
+                candidates = self.db.execute(
+                    "SELECT key, source, target FROM tm WHERE length(key) BETWEEN ? AND ? "
+                    "ORDER BY abs(length(key) - ?), key LIMIT ?", (lo, hi, len(key), limit)).fetchall()
+        best = None
+        # seq2 (ключ запроса) кэшируется SequenceMatcher-ом, меняем только seq1
+        matcher = difflib.SequenceMatcher(None, "", key)
+        for cand_key, cand_src, cand_tgt in candidates:
+            matcher.set_seq1(cand_key)
+            if matcher.real_quick_ratio() < self.threshold or matcher.quick_ratio() < self.threshold:
+                continue
+            score = matcher.ratio()
+            if score >= self.threshold and (best is None or score > best[0]):
+                best = (score, cand_src, cand_tgt.replace(_MASK, "…"))
+        return best
+
+    def _selective_words(self, words: list[str]) -> list[str]:
+        """
+        Слова запроса, по которым стоит отбирать кандидатов: есть в памяти
+        и встречаются не больше чем в MAX_WORD_KEYS ключах; если таких нет —
+        RARE_FALLBACK_WORDS самых редких.
+        """
+        if not words:
+            return []
+        marks = ",".join("?" * len(words))
+        df = dict(self.db.execute(f"SELECT word, n FROM tm_df WHERE word IN ({marks})", words))
+        rare = [w for w in words if w in df and df[w] <= MAX_WORD_KEYS]
+        return rare or sorted(df, key=lambda w: (df[w], w))[:RARE_FALLBACK_WORDS]
+
+    def prefill(self, items: list[tuple[int, str]]) -> tuple[dict[int, str], list[tuple[int, str]]]:
+        """
+        Делит (позиция, текст) на найденные в памяти и оставшиеся для API.
+        Обновляет статистику попаданий и сэкономленных токенов.
+        """
+        hits, rest = {}, []
+        saved = 0
+        for pos, text in items:
+            found = self.lookup(text)
+            if found is None:
+                rest.append((pos, text))
+            else:
+                hits[pos] = found
+                saved += estimate_tokens(text) + estimate_tokens(found)
+        self._bump(hits=len(hits), misses=len(rest), tokens_saved=saved)
+        return hits, rest
+
+    # --- статистика ------------------------------------------------------
+    def _bump(self, **counters) -> None:
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT INTO stats (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                list(counters.items()))
+
+    def stats(self) -> dict:
+        """hits, misses, hit_rate, tokens_saved, entries."""
+        with self.lock:
+            data = dict(self.db.execute("SELECT name, value FROM stats"))
+            entries = self.db.execute("SELECT COUNT(*) FROM tm").fetchone()[0]
+        hits, misses = data.get("hits", 0), data.get("misses", 0)
+        data.setdefault("tokens_saved", 0)
+        data["hits"], data["misses"] = hits, misses
+        data["hit_rate"] = hits / (hits + misses) if hits + misses else 0.0
+        data["entries"] = entries
+        return data
@@ -0,0 +1,182 @@
+import os, re, time, random, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import instrument
+
+# ------------------------------------------------------------------
+# Пакетный авто-перевод через OpenAI-совместимый API
+# ------------------------------------------------------------------
+DEFAULT_MODEL = "gpt-3.5-turbo"
+# Перенос строки внутри реплики: в запросе каждая реплика — одна строка
+NEWLINE_MARK = "⏎"
+PROMPT = ("Переведи на русский, сохрани теги и плейсхолдеры. "
+          f"Символ {NEWLINE_MARK} — перенос строки, сохрани его на своём месте. "
+          "Ответ — те же номера строк в формате «N. перевод», по одной строке на номер:\n")
+# Ответ модели: «12. текст» или «12) текст»
+_LINE_RE = re.compile(r"^\s*(\d+)[.)]\s?(.*)$")
+
+def make_client(api_key: str | None = None, base_url: str | None = None):
+    """
+    Клиент OpenAI по умолчанию. base_url (или OPENAI_BASE_URL) позволяет
+    направить запросы на локальный сервер-заглушку.
+    """
+    import openai
+    return openai.OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"),
+                         base_url=base_url or os.getenv("OPENAI_BASE_URL"))
+
+_default_client = None
+_client_lock = threading.Lock()
+
+def default_client():
+    """
+    Общий клиент make_client(), создаётся при первом запросе: openai
+    импортируется только когда перевод действительно нужен.
+    """
+    global _default_client
+    with _client_lock:
+        if _default_client is None:
+            _default_client = make_client()
+        return _default_client
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов (≈ 3 символа на токен + нумерация)."""
+    return len(text) // 3 + 4
+
+def make_batches(items: list[tuple[int, str]], token_budget: int) -> list[list[tuple[int, str]]]:
+    """Режет (позиция, текст) на пачки, каждая не больше token_budget по оценке."""
+    batches, cur, used = [], [], 0
+    for pos, text in items:
+        cost = estimate_tokens(text)
+        if cur and used + cost > token_budget:
+            batches.append(cur)
+            cur, used = [], 0
+        cur.append((pos, text))
+        used += cost
+    if cur:
+        batches.append(cur)
+    return batches
+
+def escape_newlines(text: str) -> str:
+    """Переносы (\\n, \\r\\n, \\r) → NEWLINE_MARK: многострочная реплика не ломает нумерацию."""
+    return text.replace("\r\n", NEWLINE_MARK).replace("\r", NEWLINE_MARK).replace("\n", NEWLINE_MARK)
+
+def restore_newlines(text: str, source: str) -> str:
+    """
+    NEWLINE_MARK → перенос в стиле исходной строки. Если в исходнике
+    переносов не было или NEWLINE_MARK встречался сам по себе, перевод не трогается.
+    """
+    if NEWLINE_MARK in source or not ("\n" in source or "\r" in source):
+        return text
+    newline = "\r\n" if "\r\n" in source else ("\n" if "\n" in source else "\r")
+    return text.replace(NEWLINE_MARK, newline)
+
+def _is_rate_limit(exc: Exception) -> bool:
+    """429, после которого есть смысл подождать; исчерпанная квота — тоже 429, но нет."""
+    if getattr(exc, "code", None) == "insufficient_quota":
+        return False
+    return type(exc).__name__ == "RateLimitError" or getattr(exc, "status_code", None) == 429
+
+class Translator:
+    """
+    Перевод строк пачками с нумерацией: до concurrency запросов
+    параллельно, при 429 — экспоненциальная пауза с джиттером (не больше
+    max_retries раз на запрос, затем пачка считается непереведённой). Строки,
+    которых нет в ответе (модель сбилась с числом строк), переводятся
+    повторно отдельно, до max_retries раз — пачка целиком не теряется.
+    client — любой объект с chat.completions.create(...) (OpenAI или
+    заглушка в тестах); по умолчанию default_client().
+    """
+    def __init__(self, client=None, model: str = DEFAULT_MODEL, temperature: float = 0.3,
+                 token_budget: int = 1500, concurrency: int = 4, max_retries: int = 3,
+                 backoff: float = 1.0):
+        self.client = client
+        self.model = model
+        self.temperature = temperature
+        self.token_budget = token_budget
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.cancel_event = threading.Event()
+        self.usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self.last_error: Exception | None = None
+        self._lock = threading.Lock()
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+    def _request(self, batch: list[tuple[int, str]]) -> dict[int, str]:
+        """Один запрос с повтором при rate limit (до max_retries раз); возвращает позиция → перевод."""
+        if self.client is None:
+            self.client = default_client()
+        numbered = "\n".join(f"{i}. {escape_newlines(text)}" for i, (_, text) in enumerate(batch, 1))
+        delay = self.backoff
+        retries = 0
+        t0 = time.perf_counter()
+        while True:
+            try:
+                resp = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": PROMPT + numbered}],
+                    temperature=self.temperature,
+                )
+                break
+            except Exception as e:
+                if not _is_rate_limit(e) or retries >= self.max_retries or self.cancel_event.is_set():
+                    instrument.record("api.request", time.perf_counter() - t0, t0, lines=len(batch),
+                                      retries=retries, error=type(e).__name__)
+                    raise
+                retries += 1
+                time.sleep(delay + random.uniform(0, delay / 2))
+                delay = min(delay * 2, 60.0)
+        usage = getattr(resp, "usage", None)
+        instrument.record("api.request", time.perf_counter() - t0, t0, lines=len(batch), retries=retries,
+                          bytes=len(numbered.encode("utf-8")),
+                          prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                          completion_tokens=getattr(usage, "completion_tokens", 0) or 0)
+        with self._lock:
+            self.usage["requests"] += 1
+            if usage is not None:
+                self.usage["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+                self.usage["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+        out = {}
+        for line in (resp.choices[0].message.content or "").splitlines():
+            m = _LINE_RE.match(line)
+            if m and 1 <= int(m.group(1)) <= len(batch):
+                pos, source = batch[int(m.group(1)) - 1]
+                out[pos] = restore_newlines(m.group(2).strip(), source)
+        return out
+
+    def translate(self, items: list[tuple[int, str]], on_batch=None) -> tuple[dict[int, str], list[int]]:
+        """
+        Переводит (позиция, текст). on_batch(dict) вызывается (из рабочего
+        потока) с каждой готовой порцией переводов. Возвращает
+        (все переводы, позиции, которые так и не удалось перевести).
+        """
+        done: dict[int, str] = {}
+        pending = list(items)
+        budget = self.token_budget
+        for _ in range(self.max_retries + 1):
+            if not pending or self.cancel_event.is_set():
+                break
+            failed = []
+            batches = make_batches(pending, budget)
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                futures = {pool.submit(self._request, b): b for b in batches}
+                for fut in as_completed(futures):
+                    batch = futures[fut]
+                    try:
+                        got = fut.result()
+                    except Exception as e:
+                        self.last_error = e
+                        got = {}
+                    failed.extend(item for item in batch if item[0] not in got)
+                    if got:
+                        done.update(got)
+                        if on_batch:
+                            on_batch(got)
+                    if self.cancel_event.is_set():
+                        for f in futures:
+                            f.cancel()
+            # Повтор — только для непереведённых строк, пачками поменьше
+            pending = failed
+            budget = max(budget // 2, 200)
+        return done, [pos for pos, _ in pending]
@@ -42,7 +42,7 @@ class Ui_MainWindow(object):
         self.btnFind = QtWidgets.QPushButton(parent=self.centralwidget)
         self.btnFind.setGeometry(QtCore.QRect(1090, 40, 75, 24))
         self.btnFind.setObjectName("btnFind")
-        self.tree = QtWidgets.QTreeWidget(parent=self.centralwidget)
+        self.tree = QtWidgets.QTreeView(parent=self.centralwidget)
         self.tree.setGeometry(QtCore.QRect(10, 70, 2311, 321))
         self.tree.setObjectName("tree")
         self.tree.header().setDefaultSectionSize(400)
@@ -115,7 +115,7 @@ class Ui_MainWindow(object):
         _translate = QtCore.QCoreApplication.translate
         MainWindow.setWindowTitle(_translate("MainWindow", "REVERSE 1999 Translator v.0.2.0"))
         self.btnOpen.setText(_translate("MainWindow", "Открыть CSV"))
-        self.btnSave.setText(_translate("MainWindow", "Сохранить CSV"))
+        self.btnSave.setText(_translate("MainWindow", "Сохранить проект"))
         self.comboBox.setItemText(0, _translate("MainWindow", "Все"))
         self.comboBox.setItemText(1, _translate("MainWindow", "Переведено"))
         self.comboBox.setItemText(2, _translate("MainWindow", "Не переведено"))
@@ -123,11 +123,6 @@ class Ui_MainWindow(object):
         self.btnAutoTranslate.setText(_translate("MainWindow", "Авто-перевод"))
         self.btnStats.setText(_translate("MainWindow", "Статистика"))
         self.btnFind.setText(_translate("MainWindow", "Поиск"))
-        self.tree.headerItem().setText(0, _translate("MainWindow", "File"))
-        self.tree.headerItem().setText(1, _translate("MainWindow", "Новый столбец"))
-        self.tree.headerItem().setText(2, _translate("MainWindow", "Character"))
-        self.tree.headerItem().setText(3, _translate("MainWindow", "EnglishText"))
-        self.tree.headerItem().setText(4, _translate("MainWindow", "RussianTranslation"))
         self.chkHideDone.setText(_translate("MainWindow", "Скрывать завершённые"))
         self.btnImportGlossary.setText(_translate("MainWindow", "Импорт глоссария"))
         self.btnExportGlossary.setText(_translate("MainWindow", "Экспорт глоссария"))